@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when no recording matches an agent call."""
+
+
+@dataclass
+class ReplayedRun:
+    """The parts of an agents RunResult the pipeline reads, rebuilt from a recording."""
+
+    final_output: Any
+    last_agent: Any
+    context_wrapper: Any = field(default=None)
+
+
+class CassetteConfig(BaseModel):
+    mode: str = "off"
+    """off: call the models; record: call them and store the outputs; replay: serve stored outputs"""
+    directory: str = "cassettes"
+    latency: Optional[float] = None
+    """Replay delay in seconds; None replays the recorded latency, 0 answers at once"""
+
+    @classmethod
+    def from_env(cls) -> "CassetteConfig":
+        latency = os.getenv("TAXO_CASSETTE_LATENCY", "0")
+        mode = os.getenv("TAXO_CASSETTE_MODE", "off")
+        if mode not in MODES:
+            raise ValueError(f"TAXO_CASSETTE_MODE must be one of {MODES}, got {mode!r}")
+        return cls(
+            mode=mode,
+            directory=os.getenv("TAXO_CASSETTE_DIR", "cassettes"),
+            latency=None if latency == "recorded" else float(latency),
+        )
+
+
+def cassette_key(agent, input: Any) -> str:
+    """
+    Hash of everything that determines an agent's answer: its name, model,
+    instructions, output schema and the input itself. Changing a prompt or an
+    upstream stage therefore changes the key instead of replaying stale output.
+    """
+    output_type = agent.output_type
+    payload = {
+        "agent": agent.name,
+        "model": str(agent.model),
+        "instructions": agent.instructions if isinstance(agent.instructions, str) else None,
+        "output_schema": output_type.model_json_schema() if isinstance(output_type, type) and issubclass(output_type, BaseModel) else str(output_type),
+        "input": input,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class Cassette:
+    """
+    Record/replay layer around `Runner.run`.
+
+    In record mode every call goes to the model and its structured
+    `final_output` is stored under `<directory>/<agent>/<key>.json`, keyed by
+    `cassette_key`. In replay mode the stored output is served instead, after
+    the configured (or recorded) latency, and a call without a recording
+    raises CassetteMissError rather than reaching the model.
+    """
+
+    def __init__(self, config: CassetteConfig):
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _path(self, agent, key: str) -> str:
+        return os.path.join(self.config.directory, _slug(agent.name), f"{key}.json")
+
+    async def run(self, agent, input: Any):
+        from agents import Runner
+
+        key = cassette_key(agent, input)
+        if self.config.mode == "replay":
+            return await self._replay(agent, key)
+
+        started = time.perf_counter()
+        result = await Runner.run(agent, input)
+        if self.config.mode == "record":
+            self._record(agent, key, result.final_output, time.perf_counter() - started)
+        return result
+
+    async def _replay(self, agent, key: str) -> ReplayedRun:
+        from agents import RunContextWrapper
+
+        path = self._path(agent, key)
+        try:
+            with open(path) as f:
+                recording = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            raise CassetteMissError(f"No recording of {agent.name} for input {key[:12]} in {self.config.directory}")
+
+        self.hits += 1
+        delay = recording["latency"] if self.config.latency is None else self.config.latency
+        if delay:
+            await asyncio.sleep(delay)
+        output = recording["final_output"]
+        if isinstance(agent.output_type, type) and issubclass(agent.output_type, BaseModel):
+            output = agent.output_type.model_validate(output)
+        return ReplayedRun(final_output=output, last_agent=agent, context_wrapper=RunContextWrapper(context=None))
+
+    def _record(self, agent, key: str, output: Any, latency: float) -> None:
+        path = self._path(agent, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        recording = {
+            "agent": agent.name,
+            "model": str(agent.model),
+            "latency": latency,
+            "final_output": output.model_dump(mode="json") if isinstance(output, BaseModel) else output,
+        }
+        # Write then rename so a concurrent replay never reads a partial file
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            json.dump(recording, f, indent=2)
+        os.replace(f.name, path)
+        self.recorded += 1
+
+    def stats(self) -> dict:
+        return {"mode": self.config.mode, "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette (configured from the environment on first use), or None when off."""
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(CassetteConfig.from_env())
+    return _cassette if _cassette.config.mode != "off" else None
+
+
+def set_cassette(config: CassetteConfig) -> Cassette:
+    """Replace the active cassette, e.g. from a benchmark."""
+    global _cassette
+    _cassette = Cassette(config)
+    return _cassette
@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional
+
+from api.agent_cassette import CassetteMissError, get_cassette
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv("TAXO_AGENT_TIMEOUT", "90"))
+"""Seconds an agent call may take before it is abandoned"""
+AGENT_TIMEOUTS: Dict[str, float] = {
+    "Rule Generator Agent": 180,
+    "Rule Processor Agent": 120,
+    "Classify Agent": 120,
+}
+"""Per-agent overrides of DEFAULT_TIMEOUT, keyed by agent name"""
+
+HEDGING_ENABLED = os.getenv("TAXO_HEDGING_ENABLED", "1") != "0"
+HEDGE_PERCENTILE = 0.95
+"""A duplicate request is started once a call runs past this latency percentile"""
+HEDGE_MIN_SAMPLES = 20
+"""Latency samples needed for an agent before hedging kicks in"""
+LATENCY_WINDOW = 200
+
+BREAKER_FAILURE_THRESHOLD = 5
+"""Consecutive failures of a model that open its circuit"""
+BREAKER_COOLDOWN = 30.0
+"""Seconds an open circuit fails fast before a single trial call is let through"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit breaker is open."""
+
+
+class AgentTimeoutError(TimeoutError):
+    """Raised when an agent call exceeds its deadline."""
+
+
+def _percentile(values: list, percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+class AgentStats:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        """Latency the caller saw (after hedging)"""
+        self.primary_latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        """
+        Latency of the first attempt alone (what the caller would have seen
+        without hedging). An attempt cancelled because its hedge won is
+        recorded at the time it was cancelled: a lower bound.
+        """
+        self.primary_censored = 0
+        """First attempts recorded as a lower bound"""
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        # Taken from the first attempts, not the hedged latencies: hedging lowers
+        # the latter, which would lower the threshold and hedge ever more often.
+        # Censored attempts ran past the threshold in force when they were
+        # hedged, so counting them at their lower bound keeps the percentile
+        # rank, and the hedge rate, in place.
+        if not HEDGING_ENABLED or len(self.primary_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return _percentile(list(self.primary_latencies), HEDGE_PERCENTILE)
+
+    def to_dict(self) -> dict:
+        latencies = list(self.latencies)
+        primary = list(self.primary_latencies)
+        p99 = _percentile(latencies, 0.99)
+        primary_p99 = _percentile(primary, 0.99)
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "hedges_won": self.hedges_won,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "p99": p99,
+            "primary_p99_lower_bound": primary_p99,
+            "primary_censored": self.primary_censored,
+            "p99_improvement_lower_bound": (primary_p99 - p99) if p99 is not None and primary_p99 is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after BREAKER_FAILURE_THRESHOLD consecutive failures of a model and
+    fails fast for BREAKER_COOLDOWN seconds. After that it is half-open: one
+    trial call goes through while every other call keeps failing fast; the
+    trial closes the circuit if it succeeds and re-opens it if it fails.
+    """
+
+    def __init__(self):
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.trips = 0
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        return self.trial_in_flight or time.monotonic() - self.opened_at < BREAKER_COOLDOWN
+
+    def before_call(self, model: str) -> bool:
+        """
+        Raise CircuitOpenError if the call must fail fast.
+
+        Returns:
+            True if the call is the half-open trial; the caller must then
+            report its outcome, or `end_trial` if it ends without one.
+        """
+        if self.opened_at is None:
+            return False
+        if self.is_open:
+            raise CircuitOpenError(f"Model {model} is degraded; failing fast")
+        self.trial_in_flight = True
+        return True
+
+    def end_trial(self) -> None:
+        """Let another call be the trial (this one was cancelled or ended without a verdict)."""
+        self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self, model: str) -> None:
+        self.consecutive_failures += 1
+        if self.trial_in_flight:
+            self.trial_in_flight = False
+            self.opened_at = time.monotonic()
+            logger.error(f"Trial call to model {model} failed; circuit stays open")
+        elif self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.error(f"Opening circuit for model {model} after {self.consecutive_failures} consecutive failures")
+
+
+_stats: Dict[str, AgentStats] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("taxo_agent_deadline", default=None)
+
+
+def set_deadline(deadline: Optional[float]) -> None:
+    """
+    Bound every run_agent call made from the current task (and the tasks it
+    starts afterwards) by an absolute `time.monotonic()` deadline, e.g. the
+    end-to-end deadline of the case being processed.
+    """
+    _deadline.set(deadline)
+
+
+def agent_call_stats() -> dict:
+    """Latency, hedging and breaker figures per agent and per model."""
+    return {
+        "agents": {name: stats.to_dict() for name, stats in _stats.items()},
+        "models": {
+            model: {"open": breaker.is_open, "trips": breaker.trips, "consecutive_failures": breaker.consecutive_failures}
+            for model, breaker in _breakers.items()
+        },
+    }
+
+
+async def _run_once(agent, input: Any):
+    cassette = get_cassette()
+    if cassette is not None:
+        return await cassette.run(agent, input)
+
+    from agents import Runner
+    return await Runner.run(agent, input)
+
+
+async def _hedged_run(agent, input: Any, hedge_after: Optional[float], stats: AgentStats, started: float):
+    primary = asyncio.ensure_future(_run_once(agent, input))
+    primary_elapsed: Optional[float] = None
+    tasks = {primary}
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                stats.hedges += 1
+                logger.info(f"Hedging {agent.name} after {hedge_after:.1f}s")
+                tasks.add(asyncio.ensure_future(_run_once(agent, input)))
+
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            if primary in done:
+                primary_elapsed = time.perf_counter() - started
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        stats.hedges_won += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        if primary_elapsed is not None:
+            stats.primary_latencies.append(primary_elapsed)
+        else:
+            # The first attempt lost to its hedge or was cut short: it is cancelled
+            # with the rest, and the elapsed time is all we know of its latency
+            stats.primary_latencies.append(time.perf_counter() - started)
+            stats.primary_censored += 1
+        for task in tasks:
+            task.cancel()
+
+
+async def run_agent(agent, input: Any, timeout: Optional[float] = None):
+    """
+    Drop-in replacement for `Runner.run(agent, input)` with a deadline,
+    hedging and a per-model circuit breaker. Calls go through the active
+    cassette (see api.agent_cassette) when recording or replaying.
+
+    Args:
+        agent: The agent to run
+        input: The agent input
+        timeout: Deadline in seconds (defaults to the agent's configured timeout),
+            shortened to the deadline set with `set_deadline`, if any
+
+    Raises:
+        CircuitOpenError: The agent's model is failing and the call was not attempted
+        AgentTimeoutError: The call exceeded its deadline
+        CassetteMissError: Replaying and the call was never recorded
+    """
+    model = str(agent.model)
+    stats = _stats.setdefault(agent.name, AgentStats())
+    breaker = _breakers.setdefault(model, CircuitBreaker())
+    try:
+        trial = breaker.before_call(model)
+    except CircuitOpenError:
+        stats.short_circuited += 1
+        raise
+    try:
+        return await _run_guarded(agent, input, timeout, stats, breaker, model)
+    finally:
+        if trial:
+            breaker.end_trial()
+
+
+async def _run_guarded(agent, input: Any, timeout: Optional[float], stats: AgentStats, breaker: CircuitBreaker, model: str):
+    timeout = timeout if timeout is not None else AGENT_TIMEOUTS.get(agent.name, DEFAULT_TIMEOUT)
+    deadline = _deadline.get()
+    bounded_by_deadline = deadline is not None and deadline - time.monotonic() < timeout
+    if bounded_by_deadline:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise AgentTimeoutError(f"{agent.name} not started: the case deadline has passed")
+    stats.calls += 1
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            _hedged_run(agent, input, stats.hedge_delay(), stats, started), timeout
+        )
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        if bounded_by_deadline:
+            # Cut short by the case deadline, not a sign the model is slow
+            raise AgentTimeoutError(f"{agent.name} did not answer before the case deadline")
+        breaker.record_failure(model)
+        raise AgentTimeoutError(f"{agent.name} did not answer within {timeout:.0f}s")
+    except CassetteMissError:
+        # A missing recording says nothing about the model's health
+        raise
+    except Exception:
+        stats.failures += 1
+        breaker.record_failure(model)
+        raise
+
+    breaker.record_success()
+    stats.latencies.append(time.perf_counter() - started)
+    return result
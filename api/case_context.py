@@ -0,0 +1,179 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import requests
+
+from api.convex_client import convex_client
+
+if TYPE_CHECKING:
+    from api.rule_speculation import RuleSpeculation
+
+DEFAULT_DEADLINE = float(os.getenv("TAXO_CASE_DEADLINE", "0"))
+"""Seconds a case may spend in the pipeline end to end (0, the default, disables the deadline)"""
+
+
+CASE_FETCH_CHUNK = int(os.getenv("TAXO_CASE_FETCH_CHUNK", "25"))
+"""Cases loaded per cases:getCasesWithDocuments query (keeps responses under Convex limits)"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a case runs past its end-to-end deadline."""
+
+
+async def load_cases(case_ids: List[str], chunk_size: int = CASE_FETCH_CHUNK) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Load many cases with their documents, `chunk_size` ids per query, off the
+    event loop. A chunk that fails is retried id by id, so an invalid id only
+    fails its own case.
+
+    Returns:
+        The cases by id, and an error message for every id that could not be
+        loaded (or has no documents).
+    """
+    async def fetch(ids: List[str]) -> List[dict]:
+        return await asyncio.to_thread(convex_client.query, "cases:getCasesWithDocuments", {"caseIds": ids})
+
+    async def fetch_chunk(ids: List[str]) -> Tuple[List[dict], Dict[str, str]]:
+        try:
+            return await fetch(ids), {}
+        except Exception:
+            if len(ids) == 1:
+                raise
+        cases, errors = [], {}
+        for case_id in ids:
+            try:
+                cases.extend(await fetch([case_id]))
+            except Exception as exc:
+                errors[case_id] = str(exc) or type(exc).__name__
+        return cases, errors
+
+    ids = list(dict.fromkeys(case_ids))
+    chunks = [ids[start:start + max(1, chunk_size)] for start in range(0, len(ids), max(1, chunk_size))]
+    results = await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks], return_exceptions=True)
+
+    cases_by_id: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            errors.update({case_id: str(result) or type(result).__name__ for case_id in chunk})
+            continue
+        found, failed = result
+        cases_by_id.update((case["_id"], case) for case in found)
+        errors.update(failed)
+    for case_id in ids:
+        case = cases_by_id.get(case_id)
+        if case_id not in errors and (case is None or not case["documents"]):
+            cases_by_id.pop(case_id, None)
+            errors[case_id] = "Case or documents not found"
+    return cases_by_id, errors
+
+
+class CaseContext:
+    """
+    Request-scoped view of a case.
+
+    Lazily loads and memoizes the case with its documents, the converted
+    content of its first document, its classification and its rule checks,
+    so every stage of a request shares one fetch / download / conversion.
+    Batch-level resources (HTTP session, conversion pool, taxonomy snapshot)
+    and per-request options (end-to-end deadline, rule short-circuiting)
+    ride along so stages do not need to thread them separately.
+    """
+
+    def __init__(
+        self,
+        case_id: str,
+        case: Optional[dict] = None,
+        session: Optional[requests.Session] = None,
+        executor: Optional[Executor] = None,
+        taxonomy: Optional[dict] = None,
+        deadline_seconds: Optional[float] = None,
+        short_circuit: Optional[bool] = None,
+    ):
+        self.case_id = case_id
+        self.session = session
+        self.executor = executor
+        self.taxonomy = taxonomy
+        self.deadline_seconds = DEFAULT_DEADLINE if deadline_seconds is None else deadline_seconds
+        self.deadline: Optional[float] = None
+        """Absolute time.monotonic() deadline, set by start_clock()"""
+        self.short_circuit = short_circuit
+        """Stop evaluating rules once one denies the case (None: server default)"""
+        self.conversion_reported = False
+        """Whether the `document_converted` event was emitted for this request"""
+        self.speculation: Optional["RuleSpeculation"] = None
+        """Rule evaluations started before classification finished, if any"""
+        self._case = case
+        self._rule_checks: Optional[List[dict]] = None
+        self._classification: Optional[dict] = None
+        self._file_content: Optional[asyncio.Future] = None
+
+    def start_clock(self) -> None:
+        """Start the end-to-end deadline. Only the first call counts, so nested stages share it."""
+        if self.deadline is None and self.deadline_seconds > 0:
+            self.deadline = time.monotonic() + self.deadline_seconds
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if there is none."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def get_case(self) -> dict:
+        if self._case is None:
+            self._case = convex_client.query("cases:getCaseWithDocuments", {
+                "caseId": self.case_id
+            })
+        return self._case
+
+    @property
+    def documents(self) -> List[dict]:
+        return self.get_case()["documents"]
+
+    async def get_file_content(self) -> str:
+        """
+        The converted (structure + markdown) content of the case's first document.
+        Concurrent callers share the same download and conversion.
+        """
+        from api.taxo_agents.struture_agent import get_file_as_string
+
+        async def convert() -> str:
+            case = await asyncio.to_thread(self.get_case)
+            pdf_url = case["documents"][0]["fileUrl"]
+            return await get_file_as_string(pdf_url, session=self.session, executor=self.executor)
+
+        if self._file_content is None:
+            self._file_content = asyncio.ensure_future(convert())
+        try:
+            return await asyncio.shield(self._file_content)
+        except Exception:
+            # Let a later stage retry instead of replaying the failure
+            if self._file_content.done():
+                self._file_content = None
+            raise
+
+    def get_rule_checks(self) -> List[dict]:
+        """
+        The case's rule checks, fetched on first access. Classification creates
+        rule checks, so stages must not read them before classification is done.
+        """
+        if self._rule_checks is None:
+            self._rule_checks = convex_client.query("cases:getCaseRuleChecks", {
+                "caseId": self.case_id
+            })
+        return self._rule_checks
+
+    def get_classification(self) -> Optional[dict]:
+        """
+        The case's classification with its specialty, treatment type and
+        procedure documents (None if unclassified), fetched on first access.
+        Like rule checks, only valid once classification is done.
+        """
+        if self._classification is None:
+            self._classification = convex_client.query("case_classifications:getCaseClassificationWithRuleChecks", {
+                "caseId": self.case_id
+            })
+        return self._classification
@@ -0,0 +1,63 @@
+import logging
+import os
+from typing import Optional
+
+from api.code_extraction import ExtractedCodes, normalize_procedure_name, procedure_signature
+from api.convex_client import convex_client
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_SIGNATURE_CACHE_ENABLED", "1") != "0"
+MIN_HITS = int(os.getenv("TAXO_SIGNATURE_CACHE_MIN_HITS", "2"))
+"""Agreeing AI classifications needed before a signature is trusted"""
+MIN_CONFIDENCE = float(os.getenv("TAXO_SIGNATURE_CACHE_MIN_CONFIDENCE", "0.9"))
+"""Minimum hits / (hits + conflicts) before a signature is trusted"""
+
+
+def lookup_classification(codes: ExtractedCodes) -> Optional[dict]:
+    """
+    Return the stored classification for the referral's procedure codes if it
+    is confident enough to skip the LLM, else None.
+
+    The returned entry carries `specialty`, `treatmentType` and `procedure`
+    documents and a `confidence` in [0, 1].
+    """
+    signature = procedure_signature(codes)
+    if not ENABLED or signature is None:
+        return None
+    try:
+        entry = convex_client.query("procedure_signatures:getBySignature", {"signature": signature})
+    except Exception as exc:
+        logger.error(f"Failed to look up procedure signature {signature}: {exc}")
+        return None
+    if entry is None:
+        return None
+
+    confidence = entry["hits"] / (entry["hits"] + entry["conflicts"])
+    if entry["hits"] < MIN_HITS or confidence < MIN_CONFIDENCE:
+        logger.info(f"Procedure signature {signature} not confident yet (hits={entry['hits']}, confidence={confidence:.2f})")
+        return None
+    return {**entry, "confidence": confidence}
+
+
+def record_classification(
+    codes: ExtractedCodes,
+    procedure_name: str,
+    specialty_id: str,
+    treatment_type_id: str,
+    procedure_id: str,
+) -> None:
+    """Remember an AI classification for the referral's procedure signature."""
+    signature = procedure_signature(codes)
+    if not ENABLED or signature is None:
+        return
+    try:
+        convex_client.mutation("procedure_signatures:recordClassification", {
+            "signature": signature,
+            "procedureName": normalize_procedure_name(procedure_name),
+            "specialtyId": specialty_id,
+            "treatmentTypeId": treatment_type_id,
+            "procedureId": procedure_id,
+        })
+    except Exception as exc:
+        logger.error(f"Failed to record procedure signature {signature}: {exc}")
@@ -0,0 +1,84 @@
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+# Labels that introduce a list of codes; codes are searched in the text that
+# follows a label up to the next blank line (covers "CPT: 66170, 66180",
+# bullet lists and small tables under a "CPT" header).
+PROCEDURE_LABEL_RE = re.compile(r"\b(?:CPT|HCPCS|procedure\s+codes?)\b", re.IGNORECASE)
+DIAGNOSIS_LABEL_RE = re.compile(r"\b(?:ICD[-\s]?10(?:[-\s]?CM)?|ICD|diagnosis\s+codes?|dx)\b", re.IGNORECASE)
+LABEL_WINDOW = 300
+
+CPT_RE = re.compile(r"(?<![\w.-])\d{4}[0-9FTU](?![\w-])")
+HCPCS_RE = re.compile(r"(?<![\w.-])[A-V]\d{4}(?![\w-])")
+ICD10_RE = re.compile(r"(?<![\w.-])[A-TV-Z]\d[0-9AB](?:\.?[0-9A-TV-Z]{1,4})?(?![\w-])")
+# A dotted ICD-10 code ("H40.1131") is distinctive enough to accept without a label
+DOTTED_ICD10_RE = re.compile(r"(?<![\w.-])[A-TV-Z]\d[0-9AB]\.[0-9A-TV-Z]{1,4}(?![\w-])")
+
+
+class ExtractedCodes(BaseModel):
+    cpt: List[str] = []
+    """CPT codes (5 digits, or 4 digits + F/T/U for category II/III)"""
+    hcpcs: List[str] = []
+    """HCPCS Level II codes (letter + 4 digits)"""
+    icd10: List[str] = []
+    """ICD-10-CM diagnosis codes, normalized with a dot after the category"""
+
+    @property
+    def procedure_codes(self) -> List[str]:
+        return sorted(set(self.cpt) | set(self.hcpcs))
+
+    def is_empty(self) -> bool:
+        return not (self.cpt or self.hcpcs or self.icd10)
+
+
+def normalize_icd10(code: str) -> str:
+    code = code.upper().replace(".", "")
+    return code if len(code) <= 3 else f"{code[:3]}.{code[3:]}"
+
+
+def _label_windows(text: str, label_re: re.Pattern) -> List[str]:
+    windows = []
+    for match in label_re.finditer(text):
+        window = text[match.end():match.end() + LABEL_WINDOW]
+        windows.append(window.split("\n\n", 1)[0])
+    return windows
+
+
+def extract_codes(text: str) -> ExtractedCodes:
+    """
+    Extract CPT, HCPCS and ICD-10 codes from referral markdown without an LLM.
+
+    Bare 5-digit numbers are only taken as CPT codes next to a procedure code
+    label so ZIP codes, phone fragments and member ids are not picked up.
+    """
+    cpt, hcpcs, icd10 = set(), set(), set()
+
+    for window in _label_windows(text, PROCEDURE_LABEL_RE):
+        cpt.update(code.upper() for code in CPT_RE.findall(window))
+        hcpcs.update(code.upper() for code in HCPCS_RE.findall(window))
+
+    for window in _label_windows(text, DIAGNOSIS_LABEL_RE):
+        icd10.update(normalize_icd10(code) for code in ICD10_RE.findall(window))
+    icd10.update(normalize_icd10(code) for code in DOTTED_ICD10_RE.findall(text))
+
+    return ExtractedCodes(cpt=sorted(cpt), hcpcs=sorted(hcpcs), icd10=sorted(icd10))
+
+
+def normalize_procedure_name(name: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def procedure_signature(codes: ExtractedCodes) -> Optional[str]:
+    """
+    Signature used to look up previous classifications.
+
+    Only procedure codes (CPT/HCPCS) are part of it: diagnosis codes vary per
+    patient while the requested procedure, and so its classification, does not.
+    Returns None when the referral carries no procedure codes.
+    """
+    procedure_codes = codes.procedure_codes
+    if not procedure_codes:
+        return None
+    return "proc:" + ",".join(procedure_codes)
@@ -1,3 +1,43 @@
-from convex import ConvexClient
 import os
-convex_client = ConvexClient(os.getenv("NEXT_PUBLIC_CONVEX_URL"))
\ No newline at end of file
+from functools import lru_cache
+
+ENV_FILE = os.getenv("TAXO_ENV_FILE", ".env.local")
+
+_override = None
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Load environment variables from ENV_FILE (once)."""
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
+
+@lru_cache(maxsize=None)
+def get_convex_client():
+    """Build the Convex client on first use so importing this module stays cheap."""
+    load_env()
+    from convex import ConvexClient
+    return ConvexClient(os.getenv("NEXT_PUBLIC_CONVEX_URL"))
+
+
+def set_convex_client(client) -> None:
+    """
+    Route every `convex_client` call to `client` (e.g. an
+    `api.local_convex.InMemoryConvex` for offline runs); None restores the
+    real deployment.
+    """
+    global _override
+    _override = client
+
+
+class _LazyConvexClient:
+    """Proxy that defers building the ConvexClient until a method is accessed."""
+
+    def __getattr__(self, name):
+        if _override is not None:
+            return getattr(_override, name)
+        return getattr(get_convex_client(), name)
+
+
+convex_client = _LazyConvexClient()
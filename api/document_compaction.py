@@ -0,0 +1,148 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+# At most 3 digits so bare codes and MRNs ("99213", "4482913") never look like page numbers
+PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$", re.IGNORECASE)
+TABLE_SEPARATOR_CELL_RE = re.compile(r"^:?-+:?$")
+DIGITS_RE = re.compile(r"\d+")
+SPACES_RE = re.compile(r"[ \t]{2,}")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class CompactionConfig(BaseModel):
+    enabled: bool = True
+    """Whether to compact documents at all"""
+    strip_repeated_lines: bool = True
+    """Remove header/footer lines repeated across pages (the first occurrence is kept)"""
+    edge_lines: int = 2
+    """Number of non-empty lines at the top and bottom of a page considered header/footer"""
+    repeat_ratio: float = 0.5
+    """Fraction of pages a line must appear on to count as a repeated header/footer"""
+    drop_page_numbers: bool = True
+    """Remove header/footer lines that only carry a page number ("3", "Page 3 of 7", "3/7")"""
+    collapse_whitespace: bool = True
+    """Collapse runs of spaces and blank lines"""
+    compact_tables: bool = True
+    """Strip cell padding from markdown tables"""
+    max_tokens: Optional[int] = None
+    """Truncate the document to this many (estimated) tokens"""
+
+    @classmethod
+    def from_env(cls) -> "CompactionConfig":
+        max_tokens = os.getenv("TAXO_COMPACTION_MAX_TOKENS")
+        return cls(
+            enabled=os.getenv("TAXO_COMPACTION_ENABLED", "1") != "0",
+            max_tokens=int(max_tokens) if max_tokens else None,
+        )
+
+
+class CompactionReport(BaseModel):
+    tokens_before: int
+    tokens_after: int
+    repeated_lines_removed: int = 0
+    page_number_lines_removed: int = 0
+    truncated: bool = False
+
+    @property
+    def saved_ratio(self) -> float:
+        if not self.tokens_before:
+            return 0.0
+        return 1 - self.tokens_after / self.tokens_before
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/markdown)."""
+    return math.ceil(len(text) / 4)
+
+
+def _normalize(line: str) -> str:
+    # Fax stamps and footers differ only in page numbers / times between pages
+    return DIGITS_RE.sub("#", line.strip().lower())
+
+
+def _edge_indices(lines: List[str], edge_lines: int) -> List[int]:
+    non_empty = [i for i, line in enumerate(lines) if line.strip()]
+    # On short pages only the very first/last line can be a header/footer
+    if len(non_empty) <= 2 * edge_lines:
+        edge_lines = 1
+    return sorted(set(non_empty[:edge_lines] + non_empty[-edge_lines:]))
+
+
+def _compact_table_row(line: str) -> str:
+    cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+    if all(TABLE_SEPARATOR_CELL_RE.match(cell) for cell in cells if cell):
+        cells = ["-" if cell else cell for cell in cells]
+    return "|" + "|".join(cells) + "|"
+
+
+def compact_pages(pages: List[str], config: Optional[CompactionConfig] = None) -> tuple[str, CompactionReport]:
+    """
+    Compact per-page markdown into a single document.
+
+    Args:
+        pages: The markdown of each page, in order
+        config: Compaction settings (defaults to CompactionConfig.from_env())
+
+    Returns:
+        The compacted markdown and a report of what was removed.
+    """
+    config = config or CompactionConfig.from_env()
+    # Counted per page so the raw document is never joined into one more copy
+    report = CompactionReport(tokens_before=math.ceil(sum(len(page) for page in pages) / 4), tokens_after=0)
+    if not config.enabled:
+        report.tokens_after = report.tokens_before
+        return "".join(pages), report
+
+    page_lines = [page.split("\n") for page in pages]
+
+    repeated = set()
+    if config.strip_repeated_lines and len(pages) > 1:
+        counts = Counter()
+        for lines in page_lines:
+            counts.update({_normalize(lines[i]) for i in _edge_indices(lines, config.edge_lines)})
+        threshold = max(2, math.ceil(config.repeat_ratio * len(pages)))
+        repeated = {line for line, count in counts.items() if count >= threshold}
+
+    seen_repeated = set()
+    compacted_pages = []
+    for lines in page_lines:
+        edges = set(_edge_indices(lines, config.edge_lines))
+        kept = []
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if config.drop_page_numbers and i in edges and PAGE_NUMBER_RE.match(stripped):
+                report.page_number_lines_removed += 1
+                continue
+            if i in edges and _normalize(line) in repeated:
+                key = _normalize(line)
+                if key in seen_repeated:
+                    report.repeated_lines_removed += 1
+                    continue
+                seen_repeated.add(key)
+            if config.compact_tables and stripped.startswith("|") and stripped.endswith("|"):
+                line = _compact_table_row(line)
+            elif config.collapse_whitespace:
+                line = SPACES_RE.sub(" ", line.rstrip())
+            kept.append(line)
+        compacted_pages.append("\n".join(kept).strip())
+
+    text = "\n\n".join(page for page in compacted_pages if page)
+    if config.collapse_whitespace:
+        text = BLANK_LINES_RE.sub("\n\n", text)
+
+    if config.max_tokens is not None and estimate_tokens(text) > config.max_tokens:
+        text = text[:config.max_tokens * 4].rstrip() + "\n\n[... document truncated to fit token budget ...]"
+        report.truncated = True
+
+    report.tokens_after = estimate_tokens(text)
+    return text, report
+
+
+def compact_markdown(markdown: str, config: Optional[CompactionConfig] = None) -> tuple[str, CompactionReport]:
+    """Compact a single markdown string (no per-page header/footer detection)."""
+    return compact_pages([markdown], config)
@@ -0,0 +1,199 @@
+"""
+Pull-based worker for uploaded documents.
+
+Instead of Convex pushing one /api/process-pdf request per upload, the worker
+claims queued documents in batches under a lease (documents:claimDocuments),
+runs the full pipeline for their cases with bounded concurrency and shared
+resources (HTTP session, conversion pool, taxonomy snapshot), renews the leases
+while a case runs (documents:renewLeases) and records the outcome
+(documents:completeDocument). The pipeline reads a case's first document only;
+other claimed documents of the case are recorded as skipped.
+
+Set DOCUMENT_PROCESSING_MODE=worker in the Convex deployment: uploads are then
+no longer pushed, and cases:scheduleDocumentProcessing queues a case's
+documents once all of them are uploaded. A claim takes all of a case's queued
+documents, so each case runs once. Documents still "uploaded" from before the
+switch are never claimed.
+
+Usage:
+    python -m api.document_worker [--concurrency 4] [--poll-interval 2] [--once]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from api.case_context import CaseContext, load_cases
+from api.convex_client import convex_client
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("TAXO_WORKER_CONCURRENCY", "4"))
+"""Cases processed at the same time"""
+POLL_INTERVAL = float(os.getenv("TAXO_WORKER_POLL_INTERVAL", "2"))
+"""Seconds between claims while idle"""
+LEASE_SECONDS = float(os.getenv("TAXO_WORKER_LEASE_SECONDS", "120"))
+"""How long a claim lasts before another worker may take the document over; renewed every third of it while the case runs"""
+MAX_ATTEMPTS = int(os.getenv("TAXO_WORKER_MAX_ATTEMPTS", "3"))
+"""Claims of a document before it is marked failed"""
+
+
+class DocumentWorker:
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: int = CONCURRENCY,
+        poll_interval: float = POLL_INTERVAL,
+        lease_seconds: float = LEASE_SECONDS,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.processed = 0
+        self.failed = 0
+        self._active: Set[asyncio.Task] = set()
+
+    def claim(self, limit: int) -> List[dict]:
+        """Claim up to `limit` documents; returns the claimed documents."""
+        try:
+            return convex_client.mutation("documents:claimDocuments", {
+                "workerId": self.worker_id,
+                "limit": limit,
+                "leaseMs": int(self.lease_seconds * 1000),
+                "maxAttempts": MAX_ATTEMPTS,
+            })
+        except Exception as exc:
+            logger.error(f"Worker {self.worker_id} failed to claim documents: {exc}")
+            return []
+
+    def renew(self, documents: List[dict]) -> List[str]:
+        """Extend the leases on `documents`; returns the ids still held."""
+        try:
+            return convex_client.mutation("documents:renewLeases", {
+                "documentIds": [document["_id"] for document in documents],
+                "workerId": self.worker_id,
+                "leaseMs": int(self.lease_seconds * 1000),
+            })
+        except Exception as exc:
+            # Try again next round; the lease has two more thirds to run
+            logger.error(f"Worker {self.worker_id} failed to renew leases: {exc}")
+            return [document["_id"] for document in documents]
+
+    async def _hold_leases(self, documents: List[dict]) -> None:
+        """Renew the leases on `documents` until cancelled."""
+        while documents:
+            await asyncio.sleep(self.lease_seconds / 3)
+            held = set(await asyncio.to_thread(self.renew, documents))
+            for document in documents:
+                if document["_id"] not in held:
+                    logger.warning(f"Worker {self.worker_id} lost the lease on document {document['_id']}")
+            documents = [document for document in documents if document["_id"] in held]
+
+    def complete(self, document: dict, error: Optional[str] = None, status: Optional[str] = None) -> None:
+        """Record a claimed document as processed, or failed with `error` (or another `status`)."""
+        status = status or ("failed" if error else "processed")
+        try:
+            kept = convex_client.mutation("documents:completeDocument", {
+                "documentId": document["_id"],
+                "workerId": self.worker_id,
+                "status": status,
+                **({"error": error} if error else {}),
+            })
+        except Exception as exc:
+            logger.error(f"Worker {self.worker_id} failed to complete document {document['_id']}: {exc}")
+            return
+        if not kept:
+            logger.warning(f"Worker {self.worker_id} lost the lease on document {document['_id']}")
+
+    async def _process_case(self, context: CaseContext, documents: List[dict]) -> None:
+        from api.index import _process_pdf, _run_in_flight
+
+        lease = asyncio.ensure_future(self._hold_leases(documents))
+        try:
+            await _run_in_flight("process-pdf", context, _process_pdf)
+            error = None
+            self.processed += 1
+        except Exception as exc:
+            logger.error(f"Worker {self.worker_id} failed processing case {context.case_id}: {exc}")
+            error = str(exc) or type(exc).__name__
+            self.failed += 1
+        finally:
+            lease.cancel()
+        # The pipeline only reads the case's first document (see CaseContext.get_file_content)
+        read_id = context.documents[0]["_id"]
+        for document in documents:
+            if document["_id"] == read_id:
+                await asyncio.to_thread(self.complete, document, error)
+            else:
+                await asyncio.to_thread(self.complete, document, "Only the case's first document is processed", "skipped")
+
+    async def _start_batch(self, documents: List[dict], session: requests.Session, executor: ThreadPoolExecutor) -> None:
+        from api.taxo_agents.classify_agent import load_taxonomy
+
+        by_case: Dict[str, List[dict]] = {}
+        for document in documents:
+            by_case.setdefault(document["caseId"], []).append(document)
+        (cases_by_id, errors), taxonomy = await asyncio.gather(load_cases(list(by_case)), asyncio.to_thread(load_taxonomy))
+
+        for case_id, case_documents in by_case.items():
+            case = cases_by_id.get(case_id)
+            if case is None:
+                for document in case_documents:
+                    await asyncio.to_thread(self.complete, document, errors.get(case_id, "Case or documents not found"))
+                continue
+            context = CaseContext(case_id, case=case, session=session, executor=executor, taxonomy=taxonomy)
+            task = asyncio.ensure_future(self._process_case(context, case_documents))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+
+    async def run(self, stop: Optional[asyncio.Event] = None, once: bool = False) -> None:
+        """
+        Claim and process documents until `stop` is set. With `once`, return
+        after the first claim that finds nothing (once in-flight cases finish).
+        """
+        stop = stop or asyncio.Event()
+        logger.info(f"Worker {self.worker_id} started (concurrency {self.concurrency})")
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while not stop.is_set():
+                    free = self.concurrency - len(self._active)
+                    claimed = await asyncio.to_thread(self.claim, free) if free > 0 else []
+                    if claimed:
+                        logger.info(f"Worker {self.worker_id} claimed {len(claimed)} documents")
+                        await self._start_batch(claimed, session, executor)
+                        continue
+                    if once and not self._active:
+                        break
+                    # Idle or at capacity: wait for a slot, a stop, or the next poll
+                    waiters = set(self._active) | {asyncio.ensure_future(stop.wait())}
+                    _, pending = await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                    for waiter in pending - self._active:
+                        waiter.cancel()
+            finally:
+                # Unfinished documents keep their lease and are reclaimed once it expires
+                if self._active:
+                    await asyncio.gather(*self._active, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped: {self.processed} cases processed, {self.failed} failed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="exit once no queued documents are left")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    worker = DocumentWorker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    asyncio.run(worker.run(once=args.once))
+
+
+if __name__ == "__main__":
+    main()
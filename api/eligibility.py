@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from api.case_context import CaseContext
+from api.convex_client import convex_client
+from api.single_flight import SingleFlight
+from api.taxo_agents.classify_agent import ProcedureOutput
+from api.taxo_agents.conditions import ConditionCheckOutput, Conditions, condition_check
+from api.taxo_agents.condtion_status import ConditionsStatus, condition_status
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_ELIGIBILITY_ENABLED", "0") == "1"
+"""Decide each classified case's eligibility after classification"""
+BATCH_SIZE = int(os.getenv("TAXO_ELIGIBILITY_BATCH_SIZE", "5"))
+"""Conditions evaluated per condition_status call; batches run in parallel"""
+CACHE_SIZE = 256
+"""Condition checks kept in process, in front of the Convex cache"""
+
+PENDING = "pending"
+ELIGIBLE = "eligible"
+NOT_ELIGIBLE = "not-eligible"
+NEEDS_REVIEW = "needs-review"
+
+_condition_checks: "OrderedDict[Tuple[str, str], ConditionCheckOutput]" = OrderedDict()
+_condition_check_flight = SingleFlight()
+
+
+class EligibilityResult(BaseModel):
+    status: str
+    """The case eligibilityStatus: eligible, not-eligible or needs-review"""
+    conditions: List[ConditionsStatus] = []
+    """Per-condition evaluation against the referral"""
+    cached: bool = False
+    """Whether the policy conditions came from the cache"""
+
+
+def policy_text(rule_checks: List[dict]) -> str:
+    """
+    The policy a procedure's eligibility is judged against: its rules, in a
+    stable order so the same rule set always hashes the same.
+    """
+    rules = sorted((check["ruleTitle"], check.get("ruleDescription") or "") for check in rule_checks)
+    return "\n".join(f"- {title}: {description}" for title, description in rules)
+
+
+def policy_hash(policy: str) -> str:
+    return hashlib.sha256(policy.encode()).hexdigest()
+
+
+def _remember(key: Tuple[str, str], check: ConditionCheckOutput) -> None:
+    _condition_checks[key] = check
+    _condition_checks.move_to_end(key)
+    while len(_condition_checks) > CACHE_SIZE:
+        _condition_checks.popitem(last=False)
+
+
+def _load_condition_check(procedure_id: str, digest: str) -> Optional[ConditionCheckOutput]:
+    try:
+        entry = convex_client.query("eligibility_conditions:getConditions", {
+            "procedureId": procedure_id,
+            "policyHash": digest,
+        })
+    except Exception as exc:
+        logger.error(f"Failed to look up eligibility conditions for procedure {procedure_id}: {exc}")
+        return None
+    if entry is None:
+        return None
+    return ConditionCheckOutput(
+        is_eligible=entry["isEligible"],
+        conditions=[Conditions(**condition) for condition in entry["conditions"]],
+    )
+
+
+def _save_condition_check(procedure_id: str, digest: str, check: ConditionCheckOutput) -> None:
+    try:
+        convex_client.mutation("eligibility_conditions:saveConditions", {
+            "procedureId": procedure_id,
+            "policyHash": digest,
+            "isEligible": check.is_eligible,
+            "conditions": [condition.model_dump() for condition in check.conditions],
+        })
+    except Exception as exc:
+        logger.error(f"Failed to store eligibility conditions for procedure {procedure_id}: {exc}")
+
+
+async def get_condition_check(procedure: dict, policy: str) -> Tuple[ConditionCheckOutput, bool]:
+    """
+    The eligibility conditions of a procedure under a policy, analysed once per
+    (procedure, policy text) and cached in process and in Convex. Concurrent
+    cases with the same procedure share one analysis.
+
+    Args:
+        procedure: The procedure document
+        policy: The policy text
+
+    Returns:
+        The conditions and whether they came from the cache.
+    """
+    key = (procedure["_id"], policy_hash(policy))
+    if key in _condition_checks:
+        _condition_checks.move_to_end(key)
+        return _condition_checks[key], True
+
+    async def analyse() -> Tuple[ConditionCheckOutput, bool]:
+        stored = await asyncio.to_thread(_load_condition_check, *key)
+        if stored is not None:
+            _remember(key, stored)
+            return stored, True
+        check = await condition_check(ProcedureOutput(
+            procedure_name=procedure["name"],
+            description=procedure.get("description") or "",
+            relevant_details="",
+        ), policy)
+        await asyncio.to_thread(_save_condition_check, *key, check)
+        _remember(key, check)
+        return check, False
+
+    return await _condition_check_flight.do(key, analyse)
+
+
+async def evaluate_conditions(referral: str, conditions: List[Conditions], batch_size: int = BATCH_SIZE) -> List[ConditionsStatus]:
+    """
+    Evaluate the conditions against the referral in parallel batches. A batch
+    that fails marks its conditions as requiring clarification.
+    """
+    batches = [conditions[start:start + batch_size] for start in range(0, len(conditions), max(1, batch_size))]
+    results = await asyncio.gather(*[condition_status(referral, batch) for batch in batches], return_exceptions=True)
+
+    statuses = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed evaluating {len(batch)} eligibility conditions: {result}")
+            statuses += [
+                ConditionsStatus(condition=condition.condition, status="requires_clarification", description=f"Evaluation failed: {result}")
+                for condition in batch
+            ]
+        else:
+            statuses += result.conditions
+    return statuses
+
+
+def eligibility_status(check: ConditionCheckOutput, statuses: List[ConditionsStatus]) -> str:
+    if not check.is_eligible:
+        return NOT_ELIGIBLE
+    normalized = {status.status.strip().lower().replace("_", " ") for status in statuses}
+    if "not met" in normalized:
+        return NOT_ELIGIBLE
+    if normalized - {"met"}:
+        return NEEDS_REVIEW
+    return ELIGIBLE
+
+
+def _set_eligibility_status(case_id: str, status: str) -> None:
+    convex_client.mutation("cases:updateCase", {
+        "caseId": case_id,
+        "updates": {
+            "eligibilityStatus": status
+        }
+    })
+
+
+async def check_eligibility(context: CaseContext) -> Optional[EligibilityResult]:
+    """
+    Decide the case's eligibility from its classified procedure and write it to
+    the case's eligibilityStatus.
+
+    The procedure's rules are its policy text. The conditions derived from
+    that policy are cached per (procedure, policy hash); the case's referral is
+    then checked against them in parallel batches. Must run after
+    classification.
+
+    Failures, including Convex ones, mark the case needs-review instead of
+    failing it; Convex calls run off the event loop.
+
+    Returns:
+        The result, or None if the stage is disabled or the case is not
+        classified.
+    """
+    if not ENABLED:
+        return None
+    case_id = context.case_id
+    try:
+        classification = await asyncio.to_thread(context.get_classification)
+        procedure = (classification or {}).get("procedure")
+        if procedure is None:
+            logger.info(f"Case {case_id} has no classified procedure; skipping eligibility")
+            return None
+
+        await asyncio.to_thread(_set_eligibility_status, case_id, PENDING)
+        policy = policy_text(await asyncio.to_thread(context.get_rule_checks))
+        if not policy:
+            result = EligibilityResult(status=NEEDS_REVIEW)
+        else:
+            check, cached = await get_condition_check(procedure, policy)
+            statuses = await evaluate_conditions(await context.get_file_content(), check.conditions) if check.is_eligible else []
+            result = EligibilityResult(status=eligibility_status(check, statuses), conditions=statuses, cached=cached)
+    except Exception as exc:
+        logger.error(f"Eligibility check failed for case {case_id}: {exc}")
+        result = EligibilityResult(status=NEEDS_REVIEW)
+
+    try:
+        await asyncio.to_thread(_set_eligibility_status, case_id, result.status)
+    except Exception as exc:
+        logger.error(f"Failed to store eligibility status {result.status} for case {case_id}: {exc}")
+    logger.info(f"Case {case_id} eligibility: {result.status} ({len(result.conditions)} conditions, cached={result.cached})")
+    return result
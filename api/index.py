@@ -1,73 +1,430 @@
-from dotenv import load_dotenv
-load_dotenv("/Users/sergioaraujo/Personal/taxo/.env.local")
+import asyncio
+import functools
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
+import requests
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from api.taxo_agents.classify_agent import classify_referral
-from api.taxo_agents.patient_extractor_agent import extract_patient_info
-from api.taxo_agents.struture_agent import get_file_as_string
-from api.taxo_agents.rule_processor_agent import process_rule_against_document
-from api.taxo_agents.provider_extractor_agent import extract_provider_name
-import asyncio
-from api.convex_client import convex_client
+from api import rule_short_circuit
+from api.agent_runner import set_deadline
+from api.case_context import CaseContext, DeadlineExceededError, load_cases
+from api.convex_client import convex_client, load_env
+from api.loop_watchdog import ENABLED as WATCHDOG_ENABLED, set_current_case, watchdog
+from api.rule_check_writer import NOT_EVALUATED, RuleCheckWriter
+from api.rule_speculation import ENABLED as SPECULATION_ENABLED, RuleSpeculation, stats as speculation_stats
+from api.single_flight import EventFanout, SingleFlight, documents_fingerprint
+
+# Agent modules (and the agents SDK / pymupdf4llm behind them) are imported
+# inside the handlers that need them so a cold start only pays for FastAPI.
+load_env()
 
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
 
+@app.middleware("http")
+async def watch_event_loop(request, call_next):
+    # Started lazily: serverless runtimes may not run lifespan events
+    if not WATCHDOG_ENABLED:
+        return await call_next(request)
+    watchdog.start()
+    stalls_before = watchdog.stall_count
+    response = await call_next(request)
+    watchdog.check(since=stalls_before)
+    return response
+
+
 class Request(BaseModel):
     case_id: str
+    force: bool = False
+    """Bypass single-flight coalescing and start a fresh run"""
+    deadline_seconds: Optional[float] = None
+    """End-to-end deadline for the case (defaults to TAXO_CASE_DEADLINE)"""
+    short_circuit: Optional[bool] = None
+    """Stop evaluating rules once one denies the case (defaults to TAXO_RULE_SHORT_CIRCUIT)"""
+
+    def context(self) -> CaseContext:
+        return CaseContext(self.case_id, deadline_seconds=self.deadline_seconds, short_circuit=self.short_circuit)
+
+
+class BatchRequest(BaseModel):
+    case_ids: List[str]
+    concurrency: int = 4
+    """Maximum number of cases processed at the same time"""
+    force: bool = False
+    deadline_seconds: Optional[float] = None
+    """End-to-end deadline per case, counted from when the case starts"""
+    short_circuit: Optional[bool] = None
+
+
+# Receives (event name, payload) as pipeline stages complete
+Emit = Callable[[str, dict], None]
+
+
+# Duplicate runs for the same (endpoint, case, documents) attach to the one in flight
+pipeline_flight = SingleFlight()
+# Stage events of each run in flight, shared by every caller attached to it
+_flight_events: Dict[tuple, EventFanout] = {}
+
+
+def _flight_key(endpoint: str, context: CaseContext) -> tuple:
+    return (endpoint, context.case_id, documents_fingerprint(context.documents))
+
+
+def _no_emit(event: str, data: dict) -> None:
+    pass
+
+
+async def _run_in_flight(
+    endpoint: str,
+    context: CaseContext,
+    stage: Callable[..., Awaitable[Any]],
+    force: bool = False,
+    emit: Emit = _no_emit,
+) -> Any:
+    """
+    Run `stage(context, emit=...)` through `pipeline_flight`, or attach to the
+    run in flight for the same key. Either way `emit` receives every event of
+    the run, including the ones emitted before this caller attached.
+    """
+    key = _flight_key(endpoint, context)
+    if force or not pipeline_flight.is_running(key):
+        _flight_events[key] = EventFanout()
+    fanout = _flight_events.setdefault(key, EventFanout())
+
+    async def run_stage() -> Any:
+        # Released by the run itself: it outlives its callers if they all disconnect
+        try:
+            return await stage(context, emit=fanout.emit)
+        finally:
+            if _flight_events.get(key) is fanout:
+                del _flight_events[key]
+
+    unsubscribe = fanout.subscribe(emit)
+    try:
+        return await pipeline_flight.do(key, run_stage, force=force)
+    finally:
+        unsubscribe()
+
+
+async def _emit_when_done(awaitable: Awaitable[Any], emit: Emit, event: str, to_data: Callable[[Any], dict]) -> Any:
+    result = await awaitable
+    emit(event, to_data(result))
+    return result
+
+
+def _case_stage(stage: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Run a pipeline stage within the case's end-to-end deadline.
+
+    The outermost stage starts the clock, bounds the whole run and hands the
+    deadline to every agent call beneath it (see agent_runner.set_deadline);
+    stages it calls in turn run inside that same budget.
+    """
+    @functools.wraps(stage)
+    async def run(context: CaseContext, *args, **kwargs):
+        if context.deadline is not None:
+            return await stage(context, *args, **kwargs)
+        set_current_case(context.case_id)
+        context.start_clock()
+        remaining = context.remaining()
+        if remaining is None:
+            return await stage(context, *args, **kwargs)
+        set_deadline(context.deadline)
+        try:
+            return await asyncio.wait_for(stage(context, *args, **kwargs), remaining)
+        except asyncio.TimeoutError:
+            if context.remaining():
+                raise
+            raise DeadlineExceededError(f"Case {context.case_id} did not finish within {context.deadline_seconds:.0f}s")
+    return run
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_events(run: Callable[[Emit], Awaitable[Any]]) -> AsyncIterator[str]:
+    """
+    Run a pipeline and yield its stage events as server-sent events.
+    A final `done` (or `error`) event closes the stream.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def runner():
+        try:
+            await run(lambda event, data: queue.put_nowait((event, data)))
+            queue.put_nowait(("done", {}))
+        except Exception as exc:
+            queue.put_nowait(("error", {"error": str(exc)}))
+        finally:
+            queue.put_nowait(finished)
+
+    task = asyncio.ensure_future(runner())
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            yield _sse(*item)
+    finally:
+        task.cancel()
+
+
+@app.get("/api/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/api/agent-stats")
+async def agent_stats():
+    """Per-agent latency percentiles, hedge rates and circuit breaker state."""
+    from api.agent_runner import agent_call_stats
+
+    return agent_call_stats()
+
+
+@app.get("/api/loop-stats")
+async def loop_stats():
+    """Event-loop lag histogram and the most recent stalls with their stacks."""
+    return watchdog.stats()
+
 
+@app.get("/api/speculation-stats")
+async def speculation_stats_endpoint():
+    """How often speculative rule evaluation predicted the classified procedure."""
+    return speculation_stats.to_dict()
 
 
 @app.post("/api/process-pdf")
 async def handle_chat_data(request: Request):
-    case = convex_client.query("cases:getCaseWithDocuments", {
-        "caseId": request.case_id
-    })
-    pdf_url = case["documents"][0]["fileUrl"]
-    file_content = await get_file_as_string(pdf_url)
-  
-    await asyncio.gather(extract_patient_info(file_content, request.case_id), classify_referral(file_content, request.case_id),extract_provider_name(file_content, request.case_id))
-    convex_client.mutation("cases:updateCase", {
-        "caseId": request.case_id,
-        "updates": {
-            "status": "new"
-        }
-    })
-    await _process_rules(request.case_id)
+    context = request.context()
+    await _run_in_flight("process-pdf", context, _process_pdf, force=request.force)
+
+
+@app.post("/api/process-pdf/stream")
+async def handle_chat_data_stream(request: Request):
+    """Same as /api/process-pdf, streaming stage and rule results as server-sent events."""
+    context = request.context()
+
+    async def run(emit: Emit):
+        await _run_in_flight("process-pdf", context, _process_pdf, force=request.force, emit=emit)
+
+    return StreamingResponse(_stream_events(run), media_type="text/event-stream")
+
+
+async def _converted_content(context: CaseContext, emit: Emit) -> str:
+    """The case's converted document, emitting `document_converted` once per request."""
+    file_content = await context.get_file_content()
+    if not context.conversion_reported:
+        context.conversion_reported = True
+        emit("document_converted", {"characters": len(file_content)})
+    return file_content
+
+
+@_case_stage
+async def _process_pdf(context: CaseContext, emit: Emit = _no_emit):
+    from api.taxo_agents.classify_agent import classify_referral
+    from api.taxo_agents.patient_extractor_agent import extract_patient_info
+    from api.taxo_agents.provider_extractor_agent import extract_provider_name
+
+    case_id = context.case_id
+    file_content = await _converted_content(context, emit)
+
+    # Rules of the likely procedure start evaluating alongside classification
+    if SPECULATION_ENABLED:
+        first_batch = rule_short_circuit.CONCURRENCY if rule_short_circuit.is_enabled(context.short_circuit) else None
+        context.speculation = RuleSpeculation.start(case_id, file_content, context.taxonomy, first_batch=first_batch)
+    try:
+        await asyncio.gather(
+            _emit_when_done(extract_patient_info(file_content, case_id), emit, "patient_extracted", lambda info: info.model_dump()),
+            _emit_when_done(classify_referral(file_content, case_id, taxonomy=context.taxonomy), emit, "classification_done", lambda result: {
+                "specialty": result.specialty,
+                "treatment_type": result.treatment_type,
+                "procedure": result.procedure,
+            }),
+            _emit_when_done(extract_provider_name(file_content, case_id), emit, "provider_extracted", lambda name: {"provider": name}),
+        )
+        convex_client.mutation("cases:updateCase", {
+            "caseId": case_id,
+            "updates": {
+                "status": "new"
+            }
+        })
+        await asyncio.gather(
+            _process_rules(context, emit=emit),
+            _emit_when_done(_process_eligibility(context), emit, "eligibility_checked", _eligibility_event),
+        )
+    finally:
+        if context.speculation is not None:
+            context.speculation.close()
     
 @app.post("/api/classify-referral")
 async def classify(request: Request):
-    case = convex_client.query("cases:getCaseWithDocuments", {
-        "caseId": request.case_id
-    })
-    pdf_url = case["documents"][0]["fileUrl"]
-    file_content = await get_file_as_string(pdf_url)
+    from api.taxo_agents.classify_agent import classify_referral
+
+    context = request.context()
+    file_content = await context.get_file_content()
 
     await classify_referral(file_content, request.case_id)
-    await _process_rules(request.case_id)
+    await _process_rules(context)
 
 @app.post("/api/process-rules")
 async def process_rules(request: Request):
-    await _process_rules(request.case_id)
+    context = request.context()
+    await _run_in_flight("process-rules", context, _process_rules, force=request.force)
+
+
+@app.post("/api/process-rules/stream")
+async def process_rules_stream(request: Request):
+    """Same as /api/process-rules, streaming each rule result as it completes."""
+    context = request.context()
+
+    async def run(emit: Emit):
+        await _run_in_flight("process-rules", context, _process_rules, force=request.force, emit=emit)
+
+    return StreamingResponse(_stream_events(run), media_type="text/event-stream")
+
+
+@app.post("/api/process-eligibility")
+async def process_eligibility(request: Request):
+    context = request.context()
+    result = await pipeline_flight.do(
+        _flight_key("process-eligibility", context),
+        lambda: _process_eligibility(context),
+        force=request.force,
+    )
+    return _eligibility_event(result)
+
+
+@_case_stage
+async def _process_eligibility(context: CaseContext):
+    from api.eligibility import check_eligibility
+
+    return await check_eligibility(context)
+
 
+def _eligibility_event(result) -> dict:
+    if result is None:
+        return {"status": "skipped"}
+    return result.model_dump(mode="json")
 
 
-async def _process_rules(case_id: str):
-    case = convex_client.query("cases:getCaseWithDocuments", {
-        "caseId": case_id
-    })
-    rule_checks = convex_client.query("cases:getCaseRuleChecks", {
-        "caseId": case_id
-    })
+@app.post("/api/process-batch")
+async def process_batch(request: BatchRequest):
+    return StreamingResponse(_process_batch(request), media_type="application/x-ndjson")
 
-    pdf_url = case["documents"][0]["fileUrl"]
-    file_content = await get_file_as_string(pdf_url)
-    await asyncio.gather( *[process_rule(file_content, case_id, rule_check) for rule_check in rule_checks])
 
-async def process_rule(file_content: str, case_id: str, rule_check: dict):
+async def _process_batch(request: BatchRequest) -> AsyncIterator[str]:
+    """
+    Run the full pipeline for many cases, yielding one NDJSON line per case as it completes.
+
+    Cases are fetched in chunks (see load_cases) and share a taxonomy
+    snapshot, an HTTP session for downloads and a thread pool for
+    downloads/conversion. A case that cannot be loaded gets a `failed` line.
+    """
+    from api.taxo_agents.classify_agent import load_taxonomy
+
+    (cases_by_id, load_errors), taxonomy = await asyncio.gather(
+        load_cases(request.case_ids),
+        asyncio.to_thread(load_taxonomy),
+    )
+    semaphore = asyncio.Semaphore(max(1, request.concurrency))
+
+    async def run_case(case_id: str) -> dict:
+        if case_id in load_errors:
+            return {"case_id": case_id, "status": "failed", "error": load_errors[case_id]}
+        case = cases_by_id[case_id]
+        context = CaseContext(
+            case_id, case=case, session=session, executor=executor, taxonomy=taxonomy,
+            deadline_seconds=request.deadline_seconds, short_circuit=request.short_circuit,
+        )
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await _run_in_flight("process-pdf", context, _process_pdf, force=request.force)
+                status, error = "processed", None
+            except Exception as exc:
+                status, error = "failed", str(exc)
+            elapsed_ms = round((time.perf_counter() - started) * 1000)
+            return {"case_id": case_id, "status": status, "error": error, "elapsed_ms": elapsed_ms}
+
+    executor = ThreadPoolExecutor(max_workers=max(1, request.concurrency))
+    try:
+        with requests.Session() as session:
+            tasks = [asyncio.ensure_future(run_case(case_id)) for case_id in dict.fromkeys(request.case_ids)]
+            try:
+                for completed in asyncio.as_completed(tasks):
+                    yield json.dumps(await completed) + "\n"
+            finally:
+                # The client went away (or a case raised): stop the remaining cases
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        # Never wait on the loop thread for downloads/conversions already running
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@_case_stage
+async def _process_rules(context: CaseContext, emit: Emit = _no_emit):
+    case_id = context.case_id
+    rule_checks = await asyncio.to_thread(context.get_rule_checks)
+    file_content = await _converted_content(context, emit)
+
+    speculation = context.speculation
+    if speculation is not None:
+        classification = await asyncio.to_thread(context.get_classification)
+        await speculation.resolve(classification.get("procedureId") if classification else None)
+
+    async def evaluate(rule_check: dict) -> Any:
+        precomputed = await speculation.result_for(rule_check) if speculation is not None else None
+        return await _emit_when_done(
+            process_rule(file_content, case_id, rule_check, writer, precomputed), emit, "rule_result", _rule_event(rule_check)
+        )
+
+    short_circuit = rule_short_circuit.is_enabled(context.short_circuit)
+    # Results are written in bulk as they land (and on exit, even on errors)
+    async with RuleCheckWriter(case_id) as writer:
+        if not short_circuit:
+            await asyncio.gather(*[evaluate(rule_check) for rule_check in rule_checks])
+            return
+
+        # Ordering reads the rules' outcome history from Convex
+        ordered = await asyncio.to_thread(rule_short_circuit.order_rules, rule_checks)
+        denied, skipped = await rule_short_circuit.evaluate_until_deny(ordered, evaluate)
+        if denied is None:
+            return
+        reason = f"Not evaluated: the case was already denied by rule '{denied.get('ruleTitle', '')}'"
+        for rule_check in skipped:
+            writer.skip(rule_check.get("ruleTitle", ""), reason)
+            emit("rule_result", {"rule_title": rule_check.get("ruleTitle", ""), "status": NOT_EVALUATED, "reasoning": reason})
+        logger.info(f"Case {case_id} denied by '{denied.get('ruleTitle', '')}'; skipped {len(skipped)} rules")
+
+
+def _rule_event(rule_check: dict) -> Callable[[Any], dict]:
+    def to_data(result) -> dict:
+        data = {"rule_title": rule_check.get("ruleTitle", "")}
+        if result is None:
+            return {**data, "status": "skipped"}
+        return {**data, **result.model_dump(mode="json")}
+    return to_data
+
+async def process_rule(
+    file_content: str,
+    case_id: str,
+    rule_check: dict,
+    writer: Optional[RuleCheckWriter] = None,
+    precomputed: Any = None,
+):
     """
     Process a single rule against the document content.
 
@@ -75,7 +432,14 @@ async def process_rule(file_content: str, case_id: str, rule_check: dict):
         file_content: The text content of the document
         case_id: The case ID
         rule_check: The rule check object containing rule information
+        writer: Optional write-behind buffer for the result
+        precomputed: A speculative result to record instead of evaluating the rule
+
+    Returns:
+        The RuleProcessingOutput, or None if the rule could not be processed
     """
+    from api.taxo_agents.rule_processor_agent import process_rule_against_document
+
     try:
         # Rule data is now embedded directly in the rule check
         rule_name = rule_check.get("ruleTitle", "")
@@ -89,7 +453,9 @@ async def process_rule(file_content: str, case_id: str, rule_check: dict):
             file_content=file_content,
             case_id=case_id,
             rule_name=rule_name,
-            rule_description=rule_description
+            rule_description=rule_description,
+            writer=writer,
+            precomputed=precomputed,
         )
 
         print(f"Rule '{rule_name}' processed for case {case_id}: {result.status}")
@@ -98,5 +464,7 @@ async def process_rule(file_content: str, case_id: str, rule_check: dict):
         if result.required_additional_info:
             print(f"Required additional info: {result.required_additional_info}")
 
+        return result
+
     except Exception as e:
         print(f"Error processing rule for case {case_id}: {str(e)}")
\ No newline at end of file
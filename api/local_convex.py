@@ -0,0 +1,395 @@
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class InMemoryConvex:
+    """
+    In-process stand-in for the Convex deployment, for offline runs.
+
+    Implements the queries and mutations the Python pipeline calls, with the
+    same arguments and return shapes as the functions in `convex/`, over
+    plain dicts. Install it with `api.convex_client.set_convex_client`.
+
+    Document URLs are not backed by storage: `add_case` takes the URL each
+    document is served from.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, dict]] = {}
+        self._ids = itertools.count(1)
+        self._last_creation_time = 0.0
+        self._lock = threading.RLock()
+        self._queries: Dict[str, Callable[[dict], object]] = {
+            "cases:getCaseWithDocuments": lambda args: self._case_with_documents(args["caseId"]),
+            "cases:getCasesWithDocuments": self._get_cases_with_documents,
+            "cases:getCaseRuleChecks": self._get_case_rule_checks,
+            "cases:getRuleOutcomeStats": self._get_rule_outcome_stats,
+            "specialties:getSpecialties": lambda args: self.all("specialties"),
+            "treatments:getTreatmentTypes": lambda args: self._filter("treatmentTypes", args, "specialtyId"),
+            "procedures:getProcedures": lambda args: self._filter("procedures", args, "treatmentTypeId"),
+            "patients:findPatientByEmail": lambda args: self._first("patients", email=args["email"]),
+            "patients:findPatientByPhone": lambda args: self._first("patients", phone=args["phone"]),
+            "patients:findPatientByMRN": self._find_patient_by_mrn,
+            "patients:getPatient": lambda args: self.get(args["patientId"]),
+            "patients:getPatientsUpdatedSince": self._get_patients_updated_since,
+            "rules:getRulesByProcedure": self._get_rules_by_procedure,
+            "procedure_signatures:getBySignature": self._get_by_signature,
+            "case_classifications:getCaseClassificationWithRuleChecks": self._get_case_classification,
+            "eligibility_conditions:getConditions": lambda args: self._first("eligibilityConditions", **args),
+        }
+        self._mutations: Dict[str, Callable[[dict], object]] = {
+            "cases:updateCase": self._update_case,
+            "cases:updateRuleCheck": self._update_rule_check,
+            "cases:updateRuleChecks": self._update_rule_checks,
+            "cases:scheduleDocumentProcessing": self._schedule_document_processing,
+            "specialties:createSpecialty": lambda args: self.insert("specialties", args),
+            "treatments:createTreatmentType": lambda args: self.insert("treatmentTypes", args),
+            "procedures:createProcedure": lambda args: self.insert("procedures", args),
+            "patients:createPatient": lambda args: self.insert("patients", args),
+            "rules:createRule": lambda args: self.insert("rules", args),
+            "rules:addRuleToProcedure": lambda args: self.insert("procedureRules", args),
+            "case_classifications:classifyCaseWithProcedure": self._classify_case_with_procedure,
+            "procedure_signatures:recordClassification": self._record_classification,
+            "eligibility_conditions:saveConditions": self._save_conditions,
+            "documents:claimDocuments": self._claim_documents,
+            "documents:renewLeases": self._renew_leases,
+            "documents:completeDocument": self._complete_document,
+        }
+
+    # ConvexClient interface
+
+    def query(self, name: str, args: Optional[dict] = None):
+        with self._lock:
+            return self._call(self._queries, name, args)
+
+    def mutation(self, name: str, args: Optional[dict] = None):
+        with self._lock:
+            return self._call(self._mutations, name, args)
+
+    def _call(self, functions: Dict[str, Callable[[dict], object]], name: str, args: Optional[dict]):
+        if name not in functions:
+            raise NotImplementedError(f"{name} is not available in the in-memory Convex")
+        # Round-trip through JSON like the real client, so enums arrive as strings
+        return functions[name](json.loads(json.dumps(args or {})))
+
+    # Tables
+
+    def insert(self, table: str, document: dict) -> str:
+        document_id = f"{table}:{next(self._ids)}"
+        now = _now()
+        # Unique and increasing, like Convex's
+        self._last_creation_time = max(time.time() * 1000, self._last_creation_time + 0.001)
+        self.tables.setdefault(table, {})[document_id] = {
+            "createdAt": now, "updatedAt": now, **document, "_id": document_id, "_creationTime": self._last_creation_time,
+        }
+        return document_id
+
+    def get(self, document_id: str) -> Optional[dict]:
+        table = document_id.split(":", 1)[0]
+        return self.tables.get(table, {}).get(document_id)
+
+    def patch(self, document_id: str, updates: dict) -> None:
+        document = self.get(document_id)
+        if document is None:
+            raise ValueError(f"Document {document_id} not found")
+        document.update(updates, updatedAt=_now())
+
+    def all(self, table: str) -> List[dict]:
+        return [dict(document) for document in self.tables.get(table, {}).values()]
+
+    def where(self, table: str, **fields) -> List[dict]:
+        return [
+            document for document in self.tables.get(table, {}).values()
+            if all(document.get(name) == value for name, value in fields.items())
+        ]
+
+    def _first(self, table: str, **fields) -> Optional[dict]:
+        matches = self.where(table, **fields)
+        return dict(matches[0]) if matches else None
+
+    def _filter(self, table: str, args: dict, field: str) -> List[dict]:
+        if args.get(field):
+            return [dict(document) for document in self.where(table, **{field: args[field]})]
+        return self.all(table)
+
+    def _log(self, case_id: str, action: str, details: str, performed_by: str = "system") -> None:
+        self.insert("activityLogs", {
+            "caseId": case_id, "action": action, "details": details,
+            "performedBy": performed_by, "timestamp": _now(),
+        })
+
+    # Seeding
+
+    def add_case(self, document_urls: List[str], **fields) -> str:
+        """Create a case with one uploaded document per URL."""
+        with self._lock:
+            case_id = self.insert("cases", {"referralSource": "fax", "status": "processing", **fields})
+            for number, url in enumerate(document_urls):
+                self.insert("documents", {
+                    "caseId": case_id,
+                    "fileName": url.rsplit("/", 1)[-1],
+                    "fileUrl": url,
+                    "storageId": f"_storage:{case_id}:{number}",
+                    "fileType": "application/pdf",
+                    "fileSize": 0,
+                    "uploadedAt": _now(),
+                    "status": "uploaded",
+                })
+            return case_id
+
+    # Cases
+
+    def _case_with_documents(self, case_id: str) -> Optional[dict]:
+        case = self.get(case_id)
+        if case is None:
+            return None
+        patient = self.get(case["patientId"]) if case.get("patientId") else None
+        return {
+            **case,
+            "patient": patient,
+            "documents": [dict(document) for document in self.where("documents", caseId=case_id)],
+            "activityLogs": [dict(log) for log in self.where("activityLogs", caseId=case_id)],
+        }
+
+    def _get_cases_with_documents(self, args: dict) -> List[dict]:
+        cases = [self._case_with_documents(case_id) for case_id in args["caseIds"]]
+        return [case for case in cases if case is not None]
+
+    def _update_case(self, args: dict) -> None:
+        self.patch(args["caseId"], args["updates"])
+        self._log(args["caseId"], "case_updated", f"Case updated: {', '.join(args['updates'])}")
+
+    def _get_case_rule_checks(self, args: dict) -> List[dict]:
+        checks = [
+            {**check, "rule": {"_id": check.get("originalRuleId"), "title": check["ruleTitle"], "description": check["ruleDescription"]}}
+            for check in self.where("ruleChecks", caseId=args["caseId"])
+        ]
+        return sorted(checks, key=lambda check: check["ruleTitle"])
+
+    def _get_rule_outcome_stats(self, args: dict) -> List[dict]:
+        stats = []
+        for title in args["ruleTitles"]:
+            checks = self.where("ruleChecks", ruleTitle=title)[-args.get("window", 200):]
+            evaluated = [check for check in checks if check["status"] in ("valid", "needs_more_information", "deny")]
+            stats.append({
+                "ruleTitle": title,
+                "evaluated": len(evaluated),
+                "denied": sum(check["status"] == "deny" for check in evaluated),
+            })
+        return stats
+
+    def _apply_rule_result(self, case_id: str, result: dict) -> Optional[str]:
+        check = next((check for check in self.where("ruleChecks", caseId=case_id) if check["ruleTitle"] == result["ruleTitle"]), None)
+        if check is None:
+            return None
+        now = _now()
+        self.patch(check["_id"], {
+            "status": result["status"],
+            "reasoning": result["reasoning"],
+            "requiredAdditionalInfo": result.get("requiredAdditionalInfo") or [],
+            "processedAt": now,
+        })
+        self._log(case_id, "rule_processed", f'Rule "{result["ruleTitle"]}" processed with status: {result["status"]}', "ai_agent")
+        return check["_id"]
+
+    def _update_rule_check(self, args: dict) -> str:
+        case_id = args.pop("caseId")
+        check_id = self._apply_rule_result(case_id, args)
+        if check_id is None:
+            raise ValueError(f'Rule check not found for case {case_id} and rule "{args["ruleTitle"]}"')
+        return check_id
+
+    def _update_rule_checks(self, args: dict) -> dict:
+        updated, missing = [], []
+        for result in args["results"]:
+            check_id = self._apply_rule_result(args["caseId"], result)
+            if check_id is None:
+                missing.append(result["ruleTitle"])
+            else:
+                updated.append(check_id)
+        return {"updated": updated, "missing": missing}
+
+    # Patients
+
+    def _find_patient_by_mrn(self, args: dict) -> Optional[dict]:
+        for patient in self.tables.get("patients", {}).values():
+            for data in patient.get("additionalData") or []:
+                if "medical record" in data["name"].lower() and data["value"] == args["medicalRecordNumber"]:
+                    return dict(patient)
+        return None
+
+    def _get_patients_updated_since(self, args: dict) -> List[dict]:
+        after = (args["since"], args["afterCreationTime"]) if "afterCreationTime" in args else None
+        patients = sorted(self.all("patients"), key=lambda patient: (patient["updatedAt"], patient["_creationTime"]))
+        return [
+            patient for patient in patients
+            if (after is None and patient["updatedAt"] >= args["since"])
+            or (after is not None and (patient["updatedAt"], patient["_creationTime"]) > after)
+        ][:args["limit"]]
+
+    # Rules
+
+    def _get_rules_by_procedure(self, args: dict) -> List[dict]:
+        rules = [self.get(link["ruleId"]) for link in self.where("procedureRules", procedureId=args["procedureId"])]
+        return sorted((dict(rule) for rule in rules if rule), key=lambda rule: rule.get("title", ""))
+
+    # Classification
+
+    def _classify_case_with_procedure(self, args: dict) -> dict:
+        case_id = args["caseId"]
+        fields = {key: args.get(key) for key in ("specialtyId", "treatmentTypeId", "procedureId", "confidence", "classifiedBy")}
+        existing = self.where("caseClassifications", caseId=case_id)
+        if existing:
+            classification_id = existing[0]["_id"]
+            self.patch(classification_id, {**fields, "classifiedAt": _now()})
+        else:
+            classification_id = self.insert("caseClassifications", {"caseId": case_id, **fields, "classifiedAt": _now()})
+
+        procedure_rules = self.where("procedureRules", procedureId=args["procedureId"])
+        existing_rule_ids = {check.get("originalRuleId") for check in self.where("ruleChecks", caseId=case_id)}
+        rule_check_ids = []
+        for procedure_rule in procedure_rules:
+            rule = self.get(procedure_rule["ruleId"])
+            if rule is None or procedure_rule["ruleId"] in existing_rule_ids:
+                continue
+            rule_check_ids.append(self.insert("ruleChecks", {
+                "caseId": case_id,
+                "ruleTitle": rule["title"],
+                "ruleDescription": rule["description"],
+                "originalRuleId": rule["_id"],
+                "status": "pending",
+                "checkedBy": "system",
+                "checkedAt": _now(),
+                "createdForClassificationId": classification_id,
+            }))
+        self._log(case_id, "case_classified", f"Case classified with procedure and {len(procedure_rules)} rules to check", args["classifiedBy"])
+        return {"classificationId": classification_id, "ruleCheckIds": rule_check_ids}
+
+    def _get_case_classification(self, args: dict) -> Optional[dict]:
+        classification = self._first("caseClassifications", caseId=args["caseId"])
+        if classification is None:
+            return None
+        related = {
+            name: self.get(classification[field]) if classification.get(field) else None
+            for name, field in (("specialty", "specialtyId"), ("treatmentType", "treatmentTypeId"), ("procedure", "procedureId"))
+        }
+        return {
+            **classification,
+            **{name: dict(document) if document else None for name, document in related.items()},
+            "ruleChecks": self._get_case_rule_checks(args),
+        }
+
+    def _get_by_signature(self, args: dict) -> Optional[dict]:
+        entry = self._first("procedureSignatures", signature=args["signature"])
+        if entry is None:
+            return None
+        specialty, treatment_type, procedure = (
+            self.get(entry["specialtyId"]), self.get(entry["treatmentTypeId"]), self.get(entry["procedureId"])
+        )
+        if not specialty or not treatment_type or not procedure:
+            return None
+        return {**entry, "specialty": dict(specialty), "treatmentType": dict(treatment_type), "procedure": dict(procedure)}
+
+    def _record_classification(self, args: dict) -> str:
+        entries = self.where("procedureSignatures", signature=args["signature"])
+        if not entries:
+            return self.insert("procedureSignatures", {**args, "hits": 1, "conflicts": 0})
+
+        entry = entries[0]
+        if entry["procedureId"] == args["procedureId"] and entry["procedureName"] == args["procedureName"]:
+            self.patch(entry["_id"], {"hits": entry["hits"] + 1})
+        elif entry["conflicts"] + 1 > entry["hits"]:
+            self.patch(entry["_id"], {**args, "hits": 1, "conflicts": 0})
+        else:
+            self.patch(entry["_id"], {"conflicts": entry["conflicts"] + 1})
+        return entry["_id"]
+
+    # Eligibility
+
+    def _save_conditions(self, args: dict) -> str:
+        existing = self._first("eligibilityConditions", procedureId=args["procedureId"], policyHash=args["policyHash"])
+        if existing is not None:
+            self.patch(existing["_id"], {"isEligible": args["isEligible"], "conditions": args["conditions"]})
+            return existing["_id"]
+        return self.insert("eligibilityConditions", args)
+
+    # Documents
+
+    def _schedule_document_processing(self, args: dict) -> None:
+        # As in worker mode (DOCUMENT_PROCESSING_MODE=worker): queue the case's uploads for the worker
+        for document in self.where("documents", caseId=args["caseId"], status="uploaded"):
+            self.patch(document["_id"], {"status": "queued"})
+
+    def _claim_documents(self, args: dict) -> List[dict]:
+        now = time.time() * 1000
+        max_attempts = args.get("maxAttempts", 3)
+
+        def reclaimable(document: dict) -> bool:
+            return (
+                document["status"] == "processing"
+                and document.get("leaseExpiresAt") is not None
+                and document["leaseExpiresAt"] <= now
+                and document.get("attempts", 0) < max_attempts
+            )
+
+        candidates = self.where("documents", status="queued")[:args["limit"]]
+        for document in self.where("documents", status="processing"):
+            if len(candidates) >= args["limit"]:
+                break
+            if document.get("leaseExpiresAt") is None or document["leaseExpiresAt"] > now:
+                continue
+            if document.get("attempts", 0) >= max_attempts:
+                self.patch(document["_id"], {
+                    "status": "failed", "error": f"Lease expired {document['attempts']} times",
+                    "leaseOwner": None, "leaseExpiresAt": None,
+                })
+                continue
+            candidates.append(document)
+
+        # Whole cases: the rest of each claimed case's queued or reclaimable documents
+        picked = {document["_id"] for document in candidates}
+        for case_id in dict.fromkeys(document["caseId"] for document in candidates):
+            for document in self.where("documents", caseId=case_id):
+                if document["_id"] not in picked and (document["status"] == "queued" or reclaimable(document)):
+                    candidates.append(document)
+                    picked.add(document["_id"])
+
+        for document in candidates:
+            self.patch(document["_id"], {
+                "status": "processing",
+                "leaseOwner": args["workerId"],
+                "leaseExpiresAt": now + args["leaseMs"],
+                "attempts": document.get("attempts", 0) + 1,
+            })
+        return [dict(document) for document in candidates]
+
+    def _renew_leases(self, args: dict) -> List[str]:
+        lease_expires_at = time.time() * 1000 + args["leaseMs"]
+        renewed = []
+        for document_id in args["documentIds"]:
+            document = self.get(document_id)
+            if document is None or document["status"] != "processing" or document.get("leaseOwner") != args["workerId"]:
+                continue
+            self.patch(document_id, {"leaseExpiresAt": lease_expires_at})
+            renewed.append(document_id)
+        return renewed
+
+    def _complete_document(self, args: dict) -> bool:
+        document = self.get(args["documentId"])
+        if document is None or document.get("leaseOwner") != args["workerId"]:
+            return False
+        self.patch(document["_id"], {
+            "status": args["status"], "error": args.get("error"),
+            "leaseOwner": None, "leaseExpiresAt": None, "processedAt": _now(),
+        })
+        details = f"Document {document['fileName']} {args['status']}: {args['error']}" if args.get("error") else f"Document processed: {document['fileName']}"
+        self._log(document["caseId"], f"document_{args['status']}", details)
+        return True
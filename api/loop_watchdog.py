@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_LOOP_WATCHDOG", "0") == "1"
+"""Watch the event loop of the API process (off by default; it only observes and logs)"""
+INTERVAL = float(os.getenv("TAXO_LOOP_WATCHDOG_INTERVAL_MS", "50")) / 1000
+"""How often the loop is probed"""
+STALL_THRESHOLD = float(os.getenv("TAXO_LOOP_STALL_THRESHOLD_MS", "100")) / 1000
+"""Loop lag that counts as a stall and gets its stack captured"""
+STRICT = os.getenv("TAXO_LOOP_WATCHDOG_STRICT", "0") == "1"
+"""Fail requests (e.g. in tests) during which the loop stalled; see LoopWatchdog.check"""
+
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+"""Upper bounds of the lag histogram buckets; larger lags go to the overflow bucket"""
+RECENT_STALLS = 20
+
+current_case: ContextVar[Optional[str]] = ContextVar("taxo_current_case", default=None)
+_task_cases: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+"""Case each task works for, so a stall seen from another thread can name it"""
+
+
+class LoopStallError(RuntimeError):
+    """Raised in strict mode when the event loop was blocked past the threshold."""
+
+
+class LagHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        index = next((i for i, bound in enumerate(LAG_BUCKETS_MS) if lag_ms <= bound), len(LAG_BUCKETS_MS))
+        self.counts[index] += 1
+        self.samples += 1
+        self.total_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{bound}ms" for bound in LAG_BUCKETS_MS] + [f"gt_{LAG_BUCKETS_MS[-1]}ms"]
+        return {
+            "samples": self.samples,
+            "mean_ms": self.total_ms / self.samples if self.samples else 0.0,
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LoopWatchdog:
+    """
+    Measures event-loop lag continuously and reports stalls.
+
+    A heartbeat task on the loop wakes every `interval` and records how late it
+    woke (the loop lag) in a histogram. A monitor thread watches the heartbeat:
+    once the loop has not come back for `threshold`, it captures the loop
+    thread's stack (the code blocking the loop) and the case the running task
+    belongs to, and logs them. The case comes from `current_case`, which the
+    pipeline sets with `set_current_case`.
+    """
+
+    def __init__(self, interval: float = INTERVAL, threshold: float = STALL_THRESHOLD, strict: bool = STRICT):
+        self.interval = interval
+        self.threshold = threshold
+        self.strict = strict
+        self.histogram = LagHistogram()
+        self.stalls: Deque[dict] = deque(maxlen=RECENT_STALLS)
+        self.stall_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_beat = time.monotonic()
+        self._open_stall: Optional[dict] = None
+        self._previous_factory = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done() and self._loop is not None and self._loop.is_running()
+
+    def start(self) -> None:
+        """Start watching the running loop (a no-op if already watching it)."""
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self.stop()
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._install_task_factory(loop)
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat = loop.create_task(self._beat())
+        self._monitor = threading.Thread(target=self._watch, args=(loop, self._stop), name="loop-watchdog", daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._loop is not None and not self._loop.is_closed():
+            if self._heartbeat is not None and not self._heartbeat.done():
+                self._heartbeat.cancel()
+            self._loop.set_task_factory(self._previous_factory)
+        self._heartbeat = None
+        self._loop = None
+
+    def _install_task_factory(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Child tasks inherit the creating context, so they inherit its case too
+        previous = self._previous_factory = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            case_id = current_case.get()
+            if case_id is not None:
+                _task_cases[task] = case_id
+            return task
+
+        loop.set_task_factory(factory)
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.histogram.record(lag * 1000)
+            stall, self._open_stall = self._open_stall, None
+            if stall is not None:
+                stall["duration_ms"] = round(lag * 1000 + self.interval * 1000, 1)
+                logger.warning(f"Event loop recovered after a {stall['duration_ms']:.0f}ms stall (case {stall['case_id']})")
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, stop: threading.Event) -> None:
+        reported_beat = None
+        while not stop.wait(self.interval):
+            if loop.is_closed():
+                return
+            if not loop.is_running():
+                # A loop that is not running is idle, not stalled
+                reported_beat = self._last_beat = time.monotonic()
+                continue
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self._capture(blocked)
+
+    def _capture(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        stall = {
+            "at": time.time(),
+            "case_id": _task_cases.get(task) if task is not None else None,
+            "task": task.get_name() if task is not None else None,
+            "blocked_ms": round(blocked * 1000, 1),
+            "duration_ms": None,
+            "stack": stack,
+        }
+        self._open_stall = stall
+        self.stalls.append(stall)
+        self.stall_count += 1
+        logger.error(
+            f"Event loop blocked for {stall['blocked_ms']:.0f}ms+ (case {stall['case_id']}, task {stall['task']}):\n{stack}"
+        )
+
+    def check(self, since: int = 0) -> None:
+        """
+        In strict mode, raise LoopStallError if stalls were seen after the
+        first `since` ones, e.g. `since=stall_count` read when a request
+        started judges that request alone. The loop is shared, so a stall
+        caused by a concurrent request fails this one too.
+        """
+        stalls = self.stall_count - since
+        if self.strict and stalls > 0:
+            last = self.stalls[-1]
+            raise LoopStallError(
+                f"{stalls} event loop stall(s) over {self.threshold * 1000:.0f}ms; "
+                f"last blocked {last['blocked_ms']:.0f}ms+ in case {last['case_id']}:\n{last['stack']}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": self.histogram.to_dict(),
+            "stalls": self.stall_count,
+            "recent_stalls": list(self.stalls),
+        }
+
+
+watchdog = LoopWatchdog()
+
+
+def set_current_case(case_id: str) -> None:
+    """Attribute the current task, and the tasks it starts from now on, to `case_id`."""
+    current_case.set(case_id)
+    task = asyncio.current_task()
+    if task is not None:
+        _task_cases[task] = case_id
+
+
+class strict_loop:
+    """
+    Fail if the event loop is blocked for more than `threshold_ms` inside the block.
+
+    Usage (in a test):
+        async with strict_loop(threshold_ms=50):
+            await _process_pdf(context)
+    """
+
+    def __init__(self, threshold_ms: float = 50, interval_ms: float = 10):
+        self.watchdog = LoopWatchdog(interval=interval_ms / 1000, threshold=threshold_ms / 1000, strict=True)
+
+    async def __aenter__(self) -> LoopWatchdog:
+        self.watchdog.start()
+        return self.watchdog
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # Let the heartbeat observe a stall that ended right before exit
+        await asyncio.sleep(self.watchdog.interval * 2)
+        self.watchdog.stop()
+        if exc_type is None:
+            self.watchdog.check()
+
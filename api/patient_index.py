@@ -0,0 +1,423 @@
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from api.convex_client import convex_client
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_PATIENT_INDEX", "0") == "1"
+"""
+Match extracted patients against the in-process index before the exact Convex
+lookups. Each process loads the whole patients table, so enable it where
+processes are long-lived (e.g. the document worker) rather than serverless.
+"""
+REFRESH_INTERVAL = float(os.getenv("TAXO_PATIENT_INDEX_REFRESH", "5"))
+"""Seconds between pulls of patients created or updated elsewhere"""
+RESYNC_INTERVAL = float(os.getenv("TAXO_PATIENT_INDEX_RESYNC", "600"))
+"""Seconds between full reloads of the table, which drop deleted patients"""
+MATCH_SCORE = float(os.getenv("TAXO_PATIENT_MATCH_SCORE", "9"))
+"""Minimum score for a candidate to be taken as the same patient"""
+PAGE_SIZE = 1000
+
+# Points a field adds when both sides agree / removes when both are present
+# and differ. A matching MRN is enough on its own; name and date of birth are
+# enough together; a different date of birth rules a candidate out. Emails and
+# phones change over time, so a different one is not held against a candidate.
+WEIGHTS: Dict[str, Tuple[float, float]] = {
+    "mrn": (10, -2),
+    "email": (8, 0),
+    "phone": (6, 0),
+    "dob": (5, -6),
+    "name": (4, -3),
+}
+NAME_AGREE = 0.85
+"""Name similarity from which names count as agreeing"""
+NAME_DISAGREE = 0.6
+"""Name similarity below which names count as different"""
+
+NAME_TITLES = {"mr", "mrs", "ms", "miss", "dr", "jr", "sr", "ii", "iii", "iv", "md", "phd"}
+DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%m/%d/%y", "%Y/%m/%d", "%m.%d.%Y",
+    "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y",
+)
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+    "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+@lru_cache(maxsize=65536)
+def soundex(word: str) -> str:
+    """American Soundex code of a word ("Robert" -> "R163")."""
+    letters = [c for c in word.lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code, previous = letters[0].upper(), SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def normalize_name(name: Optional[str]) -> List[str]:
+    """
+    Lowercase ASCII name tokens without titles or suffixes, first name first
+    ("SMITH, John A., Jr." -> ["john", "a", "smith"]).
+    """
+    if not name:
+        return []
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    if "," in name:
+        last, _, rest = name.partition(",")
+        name = f"{rest} {last}"
+    return [token for token in re.findall(r"[a-z]+", name) if token not in NAME_TITLES]
+
+
+@lru_cache(maxsize=65536)
+def normalize_dob(value: Optional[str]) -> Optional[str]:
+    """ISO date of a date of birth in any of the usual formats, else None."""
+    if not value:
+        return None
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    """The last 10 digits of a phone number (no country code), else None."""
+    digits = re.sub(r"\D", "", value or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def normalize_mrn(value: Optional[str]) -> Optional[str]:
+    mrn = re.sub(r"[^0-9A-Za-z]", "", value or "").upper()
+    return mrn or None
+
+
+def _additional_value(patient: dict, *labels: str) -> Optional[str]:
+    for data in patient.get("additionalData") or []:
+        name = data.get("name", "").lower()
+        if any(label in name for label in labels):
+            return data.get("value")
+    return None
+
+
+@dataclass(frozen=True)
+class PatientRecord:
+    """The normalized fields of a patient that matching looks at."""
+
+    patient_id: str
+    name: Tuple[str, ...] = ()
+    dob: Optional[str] = None
+    phone: Optional[str] = None
+    mrn: Optional[str] = None
+    email: Optional[str] = None
+
+    @classmethod
+    def from_patient(cls, patient: dict) -> "PatientRecord":
+        """From a Convex patients document (DOB and MRN live in additionalData)."""
+        return cls(
+            patient_id=patient["_id"],
+            name=tuple(normalize_name(patient.get("name"))),
+            dob=normalize_dob(_additional_value(patient, "date of birth", "dob")),
+            phone=normalize_phone(patient.get("phone")),
+            mrn=normalize_mrn(_additional_value(patient, "medical record", "mrn")),
+            email=(patient.get("email") or "").strip().lower() or None,
+        )
+
+    @classmethod
+    def from_info(cls, info, patient_id: str = "") -> "PatientRecord":
+        """From an extracted PatientInfo."""
+        return cls(
+            patient_id=patient_id,
+            name=tuple(normalize_name(info.name)),
+            dob=normalize_dob(info.date_of_birth),
+            phone=normalize_phone(info.phone),
+            mrn=normalize_mrn(info.medical_record_number),
+            email=(info.email or "").strip().lower() or None,
+        )
+
+    @property
+    def phonetic_name(self) -> Optional[str]:
+        """Soundex of the first and last name, order-insensitive so swapped names still block together."""
+        if not self.name:
+            return None
+        return "-".join(sorted({soundex(self.name[0]), soundex(self.name[-1])}))
+
+    def blocking_keys(self) -> List[str]:
+        keys = []
+        if self.phonetic_name and self.dob:
+            keys.append(f"name_dob:{self.phonetic_name}:{self.dob}")
+        if self.phone:
+            keys.append(f"phone4:{self.phone[-4:]}")
+        if self.mrn:
+            keys.append(f"mrn:{self.mrn}")
+        if self.email:
+            keys.append(f"email:{self.email}")
+        return keys
+
+
+class PatientMatch(BaseModel):
+    patient_id: str
+    score: float
+    """Sum of the field weights; MATCH_SCORE or more is taken as the same patient"""
+    agreeing: List[str] = []
+    """Fields that agree"""
+    conflicting: List[str] = []
+    """Fields present on both sides that differ"""
+
+
+def name_similarity(a: Tuple[str, ...], b: Tuple[str, ...]) -> float:
+    """
+    Similarity of two normalized names in [0, 1], comparing first and last
+    names only (middle names are often missing) in either order.
+    """
+    if not a or not b:
+        return 0.0
+    a_key, b_key = " ".join(sorted({a[0], a[-1]})), " ".join(sorted({b[0], b[-1]}))
+    if a_key == b_key:
+        return 1.0
+    matcher = SequenceMatcher(None, a_key, b_key)
+    if matcher.real_quick_ratio() < NAME_DISAGREE:
+        return matcher.real_quick_ratio()
+    similarity = matcher.ratio()
+    # Sounds alike ("Jon Smyth" / "John Smith"): typos and OCR slips
+    if similarity >= NAME_DISAGREE and soundex(a[0]) == soundex(b[0]) and soundex(a[-1]) == soundex(b[-1]):
+        similarity = max(similarity, NAME_AGREE)
+    return similarity
+
+
+def _phones_agree(a: str, b: str) -> bool:
+    # A 7-digit number matches the same number with an area code
+    length = min(len(a), len(b))
+    return a[-length:] == b[-length:]
+
+
+def score_candidate(query: PatientRecord, candidate: PatientRecord, floor: Optional[float] = None) -> PatientMatch:
+    """
+    Score how likely `candidate` is the patient described by `query`.
+
+    With `floor`, a candidate that cannot reach it whatever its name skips the
+    (comparatively slow) name comparison and is scored without it.
+    """
+    score = 0.0
+    agreeing, conflicting = [], []
+
+    def weigh(field: str, agrees: Optional[bool], fraction: float = 1.0) -> None:
+        nonlocal score
+        if agrees is None:
+            return
+        agree, disagree = WEIGHTS[field]
+        score += agree * fraction if agrees else disagree
+        (agreeing if agrees else conflicting).append(field)
+
+    for field in ("mrn", "email", "dob"):
+        mine, theirs = getattr(query, field), getattr(candidate, field)
+        weigh(field, mine == theirs if mine and theirs else None)
+    if query.phone and candidate.phone:
+        weigh("phone", _phones_agree(query.phone, candidate.phone))
+    if query.name and candidate.name and (floor is None or score + WEIGHTS["name"][0] >= floor):
+        similarity = name_similarity(query.name, candidate.name)
+        if similarity >= NAME_AGREE:
+            weigh("name", True, similarity)
+        elif similarity < NAME_DISAGREE:
+            weigh("name", False)
+    return PatientMatch(patient_id=candidate.patient_id, score=score, agreeing=agreeing, conflicting=conflicting)
+
+
+class PatientIndex:
+    """
+    In-process blocking index over the patients table for fuzzy deduplication.
+
+    Each patient is filed under a few blocking keys: phonetic name plus date of
+    birth, the last four digits of the phone, the MRN and the email. A lookup
+    only scores the patients that share a key with the query, so it costs a
+    handful of comparisons whatever the size of the table.
+
+    The index loads the table from Convex in the background on first use (see
+    `warm_up`) and then stays current incrementally: patients created here are
+    added immediately, and patients created or updated elsewhere are pulled by
+    `(updatedAt, _creationTime)` at most every `refresh_interval` seconds.
+    Deleted patients are dropped when a match turns out to be gone (see
+    `find_matching_patient`) and by the full reload every `resync_interval`.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = REFRESH_INTERVAL,
+        match_score: float = MATCH_SCORE,
+        resync_interval: float = RESYNC_INTERVAL,
+    ):
+        self.refresh_interval = refresh_interval
+        self.match_score = match_score
+        self.resync_interval = resync_interval
+        self._records: Dict[str, PatientRecord] = {}
+        self._blocks: Dict[str, Set[str]] = {}
+        self._cursor: Tuple[str, Optional[float]] = ("", None)
+        """(updatedAt, _creationTime) of the last patient pulled"""
+        self._refreshed_at: Optional[float] = None
+        self._resynced_at: Optional[float] = None
+        self._lock = threading.RLock()
+        """Guards the index structures; never held across a Convex call"""
+        self._refreshing = threading.Lock()
+        self._warm_up: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def synced(self) -> bool:
+        """Whether the index has been filled from Convex at least once."""
+        return self._refreshed_at is not None
+
+    def _unblock(self, record: PatientRecord) -> None:
+        for key in record.blocking_keys():
+            block = self._blocks.get(key)
+            if block is not None:
+                block.discard(record.patient_id)
+                if not block:
+                    del self._blocks[key]
+
+    def upsert(self, record: PatientRecord) -> None:
+        with self._lock:
+            previous = self._records.get(record.patient_id)
+            if previous is not None:
+                self._unblock(previous)
+            self._records[record.patient_id] = record
+            for key in record.blocking_keys():
+                self._blocks.setdefault(key, set()).add(record.patient_id)
+
+    def remove(self, patient_id: str) -> None:
+        with self._lock:
+            record = self._records.pop(patient_id, None)
+            if record is not None:
+                self._unblock(record)
+
+    def add_patients(self, patients: Iterable[dict]) -> None:
+        for patient in patients:
+            self.upsert(PatientRecord.from_patient(patient))
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Pull patients created or updated since the last refresh, or reload the
+        whole table if a full resync is due. Blocking: call it off the event
+        loop. Returns at once if another thread is already refreshing.
+        """
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            full = self._resynced_at is None or now - self._resynced_at >= self.resync_interval
+            # A full reload fills a fresh index and swaps it in, so lookups keep
+            # using the current one meanwhile
+            target = PatientIndex(self.refresh_interval, self.match_score, self.resync_interval) if full else self
+            since, after = ("", None) if full else self._cursor
+            while True:
+                page = convex_client.query("patients:getPatientsUpdatedSince", {
+                    "since": since,
+                    "limit": PAGE_SIZE,
+                    **({"afterCreationTime": after} if after is not None else {}),
+                })
+                target.add_patients(page)
+                if page:
+                    since, after = page[-1]["updatedAt"], page[-1]["_creationTime"]
+                if len(page) < PAGE_SIZE:
+                    break
+            if full:
+                with self._lock:
+                    self._records, self._blocks = target._records, target._blocks
+                self._resynced_at = now
+            self._cursor = (since, after)
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refreshing.release()
+
+    def warm_up(self) -> None:
+        """Load the table on a background thread (a no-op while one is loading)."""
+        with self._lock:
+            if self._warm_up is not None and self._warm_up.is_alive():
+                return
+            self._warm_up = threading.Thread(target=self._load, name="patient-index-warm-up", daemon=True)
+            self._warm_up.start()
+
+    def _load(self) -> None:
+        try:
+            self.refresh(force=True)
+            logger.info(f"Patient index loaded: {len(self)} patients")
+        except Exception as exc:
+            logger.error(f"Failed to load the patient index: {exc}")
+
+    def candidates(self, query: PatientRecord) -> Set[str]:
+        """Ids of the patients sharing at least one blocking key with `query`."""
+        found: Set[str] = set()
+        for key in query.blocking_keys():
+            found.update(self._blocks.get(key, ()))
+        return found
+
+    def match(self, query: PatientRecord, floor: Optional[float] = None) -> List[PatientMatch]:
+        """Candidates scored against `query`, best first (see `score_candidate` for `floor`)."""
+        with self._lock:
+            scored = [score_candidate(query, self._records[patient_id], floor) for patient_id in self.candidates(query)]
+        return sorted(scored, key=lambda match: (-match.score, match.patient_id))
+
+    def best_match(self, query: PatientRecord) -> Optional[PatientMatch]:
+        """The best candidate scoring at least `match_score`, else None."""
+        matches = self.match(query, floor=self.match_score)
+        if matches and matches[0].score >= self.match_score:
+            return matches[0]
+        return None
+
+
+patient_index = PatientIndex()
+
+
+def find_matching_patient(patient_info) -> Optional[PatientMatch]:
+    """
+    Best indexed match for an extracted PatientInfo, refreshing the index
+    first if it is due. Blocking: call it off the event loop.
+
+    Returns None when disabled, when the refresh fails, or while the index is
+    still loading (it loads in the background on first use, so the request
+    falls back to the exact Convex lookups instead of waiting for the table).
+    """
+    if not ENABLED:
+        return None
+    if not patient_index.synced:
+        patient_index.warm_up()
+        return None
+    try:
+        patient_index.refresh()
+        query = PatientRecord.from_info(patient_info)
+        match = patient_index.best_match(query)
+        # Deletions only reach the index on a full resync; confirm the patient still exists
+        while match is not None and convex_client.query("patients:getPatient", {"patientId": match.patient_id}) is None:
+            logger.info(f"Indexed patient {match.patient_id} no longer exists; dropping it")
+            patient_index.remove(match.patient_id)
+            match = patient_index.best_match(query)
+        return match
+    except Exception as exc:
+        logger.error(f"Failed to match against the patient index: {exc}")
+        return None
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from api.convex_client import convex_client
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("TAXO_RULE_CHECK_FLUSH_INTERVAL", "0.5"))
+"""Seconds a buffered result may wait before it is written"""
+NOT_EVALUATED = "not_evaluated"
+"""Rule check status for rules skipped because the case was already decided"""
+
+
+class RuleCheckWriter:
+    """
+    Write-behind buffer for the rule-check results of one case.
+
+    Results are collected with `add` and written with a single
+    `cases:updateRuleChecks` mutation, either when the flush timer fires or
+    when the writer is closed. A failed flush keeps its results buffered for
+    the next attempt; on close, anything the bulk mutation could not write is
+    retried one rule at a time with `cases:updateRuleCheck`.
+
+    Usage:
+        async with RuleCheckWriter(case_id) as writer:
+            writer.add(rule_name, output)
+    """
+
+    def __init__(self, case_id: str, flush_interval: float = FLUSH_INTERVAL):
+        self.case_id = case_id
+        self.flush_interval = flush_interval
+        self._buffer: Dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.flushes = 0
+
+    async def __aenter__(self) -> "RuleCheckWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def add(self, rule_name: str, output) -> None:
+        """Buffer a RuleProcessingOutput for `rule_name` (a newer result replaces an older one)."""
+        self._buffer[rule_name] = {
+            "ruleTitle": rule_name,
+            "status": output.status,
+            "reasoning": output.reasoning,
+            "requiredAdditionalInfo": output.required_additional_info or [],
+        }
+        self._schedule()
+
+    def skip(self, rule_name: str, reason: str) -> None:
+        """Buffer `rule_name` as not evaluated, with the reason it was skipped."""
+        self._buffer[rule_name] = {
+            "ruleTitle": rule_name,
+            "status": NOT_EVALUATED,
+            "reasoning": reason,
+            "requiredAdditionalInfo": [],
+        }
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        # Shielded so close() cancelling the timer cannot interrupt a write
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> bool:
+        """
+        Write everything buffered so far in one mutation.
+
+        Returns:
+            True if the buffer was written, False if it was kept for a retry.
+        """
+        async with self._lock:
+            if not self._buffer:
+                return True
+            pending, self._buffer = self._buffer, {}
+            try:
+                response = await asyncio.to_thread(convex_client.mutation, "cases:updateRuleChecks", {
+                    "caseId": self.case_id,
+                    "results": list(pending.values()),
+                })
+            except Exception as exc:
+                logger.error(f"Failed flushing {len(pending)} rule results for case {self.case_id}: {exc}")
+                # Results added meanwhile are newer than the failed ones
+                self._buffer = {**pending, **self._buffer}
+                return False
+
+            self.flushes += 1
+            missing = (response or {}).get("missing") or []
+            if missing:
+                logger.error(f"Rule checks not found for case {self.case_id}: {missing}")
+            logger.info(f"Updated case {self.case_id} with {len(pending) - len(missing)} rule results")
+            return True
+
+    async def close(self) -> None:
+        """Cancel the timer and write whatever is still buffered."""
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        if await self.flush():
+            return
+
+        # Bulk write failed: fall back to one mutation per rule so no result is lost
+        pending, self._buffer = self._buffer, {}
+        for result in pending.values():
+            try:
+                await asyncio.to_thread(convex_client.mutation, "cases:updateRuleCheck", {
+                    "caseId": self.case_id,
+                    **result,
+                })
+            except Exception as exc:
+                logger.error(f"Failed updating case {self.case_id} with rule result {result['ruleTitle']}: {exc}")
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from api.convex_client import convex_client
+from api.document_compaction import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_RULE_SHORT_CIRCUIT", "0") == "1"
+"""Stop evaluating a case's rules once one of them denies it"""
+CONCURRENCY = int(os.getenv("TAXO_RULE_SHORT_CIRCUIT_CONCURRENCY", "3"))
+"""Rules evaluated at once in short-circuit mode; the rest wait their turn"""
+HISTORY_WINDOW = 200
+"""Most recent checks per rule used to estimate its deny likelihood"""
+DENY_PRIOR = 0.1
+"""Deny likelihood assumed for a rule without history"""
+PRIOR_WEIGHT = 2
+"""How many observed checks the prior is worth"""
+
+DENY = "deny"
+
+
+def is_enabled(override: Optional[bool] = None) -> bool:
+    """Whether to short-circuit: the per-request `override` if given, else ENABLED."""
+    return ENABLED if override is None else override
+
+
+def rule_deny_likelihoods(rule_titles: List[str]) -> Dict[str, float]:
+    """
+    Smoothed share of recent checks of each rule that denied the case.
+    Rules without history (or when the lookup fails) get DENY_PRIOR.
+    """
+    likelihoods = {title: DENY_PRIOR for title in rule_titles}
+    try:
+        stats = convex_client.query("cases:getRuleOutcomeStats", {
+            "ruleTitles": rule_titles,
+            "window": HISTORY_WINDOW,
+        })
+    except Exception as exc:
+        logger.error(f"Failed to load rule outcome history: {exc}")
+        return likelihoods
+    for entry in stats:
+        likelihoods[entry["ruleTitle"]] = (entry["denied"] + DENY_PRIOR * PRIOR_WEIGHT) / (entry["evaluated"] + PRIOR_WEIGHT)
+    return likelihoods
+
+
+def order_rules(rule_checks: List[dict]) -> List[dict]:
+    """
+    Order rule checks so the ones most likely to deny per unit of cost run
+    first. Cost is the rule's own text: every evaluation also sends the same
+    document, which would swamp the differences between rules.
+    """
+    titles = [check.get("ruleTitle", "") for check in rule_checks]
+    likelihoods = rule_deny_likelihoods(titles)
+
+    def priority(check: dict) -> float:
+        cost = estimate_tokens(check.get("ruleTitle", "") + check.get("ruleDescription", ""))
+        return likelihoods[check.get("ruleTitle", "")] / max(1, cost)
+
+    # Ties are broken by title so the same rules always come out in the same order
+    return sorted(rule_checks, key=lambda check: (-priority(check), check.get("ruleTitle", "")))
+
+
+async def evaluate_until_deny(
+    rule_checks: List[dict],
+    evaluate: Callable[[dict], Awaitable[Any]],
+    concurrency: int = CONCURRENCY,
+) -> Tuple[Optional[dict], List[dict]]:
+    """
+    Evaluate rule checks in order, `concurrency` at a time, until one returns
+    a deny. Evaluations still running at that point are cancelled.
+
+    Args:
+        rule_checks: Rule checks, in the order they should be evaluated
+        evaluate: Evaluates one rule check; returns its RuleProcessingOutput or None
+        concurrency: Maximum evaluations running at once
+
+    Returns:
+        The rule check that denied (None if none did) and the rule checks that
+        were cancelled or never started.
+    """
+    waiting = list(rule_checks)
+    running: Dict[asyncio.Future, dict] = {}
+    denied: Optional[dict] = None
+    try:
+        while (waiting or running) and denied is None:
+            while waiting and len(running) < max(1, concurrency):
+                rule_check = waiting.pop(0)
+                running[asyncio.ensure_future(evaluate(rule_check))] = rule_check
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                rule_check = running.pop(task)
+                result = None if task.exception() is not None else task.result()
+                if result is not None and result.status == DENY and denied is None:
+                    denied = rule_check
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return denied, list(running.values()) + waiting
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from api.classification_cache import ENABLED as SIGNATURE_CACHE_ENABLED
+from api.code_extraction import extract_codes, normalize_procedure_name, procedure_signature
+from api.convex_client import convex_client
+from api.rule_short_circuit import order_rules
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TAXO_RULE_SPECULATION", "0") == "1"
+"""Start evaluating the rules of the predicted procedure while classification runs"""
+MIN_PHRASE_WORDS = 2
+"""Words a procedure name needs before a verbatim mention of it counts as a prediction"""
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.cases = 0
+        self.predicted = 0
+        self.hits = 0
+        self.misses = 0
+        self.rules_reused = 0
+        self.rules_discarded = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "cases": self.cases,
+            "predicted": self.predicted,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+            "rules_reused": self.rules_reused,
+            "rules_discarded": self.rules_discarded,
+        }
+
+
+stats = SpeculationStats()
+
+
+def predict_procedure(file_content: str, procedures: List[dict]) -> Optional[Tuple[str, str]]:
+    """
+    Guess the procedure a referral will be classified as, without an LLM.
+
+    A previous classification of the same procedure codes wins (even one not
+    yet trusted enough to skip classification); otherwise the longest known
+    procedure name the referral mentions verbatim, if no other procedure name
+    of the same length is mentioned too.
+
+    Returns:
+        The procedure id and how it was predicted ("codes" or "name"), or None.
+    """
+    signature = procedure_signature(extract_codes(file_content))
+    if SIGNATURE_CACHE_ENABLED and signature is not None:
+        try:
+            entry = convex_client.query("procedure_signatures:getBySignature", {"signature": signature})
+        except Exception as exc:
+            logger.error(f"Failed to look up procedure signature {signature}: {exc}")
+            entry = None
+        if entry is not None and entry["hits"] > entry["conflicts"]:
+            return entry["procedureId"], "codes"
+
+    text = f" {normalize_procedure_name(file_content)} "
+    mentioned: Dict[int, List[str]] = {}
+    for procedure in procedures:
+        name = normalize_procedure_name(procedure["name"])
+        words = len(name.split())
+        if words >= MIN_PHRASE_WORDS and f" {name} " in text:
+            mentioned.setdefault(words, []).append(procedure["_id"])
+    if not mentioned:
+        return None
+    best = mentioned[max(mentioned)]
+    return (best[0], "name") if len(best) == 1 else None
+
+
+def _first_batch(rules: List[dict], size: int) -> List[dict]:
+    """The `size` rules short-circuiting evaluates first."""
+    checks = [{"ruleTitle": rule["title"], "ruleDescription": rule["description"], "rule": rule} for rule in rules]
+    return [check["rule"] for check in order_rules(checks)[:max(1, size)]]
+
+
+class RuleSpeculation:
+    """
+    Rule evaluations started before a case is classified.
+
+    `start` predicts the procedure from the referral (see `predict_procedure`),
+    fetches its rules and starts evaluating them against the document right
+    away, so the rule fan-out overlaps the classification LLM calls. Results
+    are not recorded.
+
+    With short-circuiting, only the first batch in evaluation order (see
+    rule_short_circuit.order_rules) is started: later rules may never be
+    evaluated once one denies the case, so speculating on them would spend
+    the model calls short-circuiting saves. The overlap is smaller in
+    exchange. Once the case is classified, `resolve` keeps them if the
+    classification agrees with the prediction and cancels them otherwise;
+    `result_for` then hands a kept result to the rule check it belongs to.
+    """
+
+    def __init__(self, case_id: str, first_batch: Optional[int] = None):
+        self.case_id = case_id
+        self.first_batch = first_batch
+        self.procedure_id: Optional[str] = None
+        self.source: Optional[str] = None
+        self._rules: Dict[str, dict] = {}
+        self._results: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._resolved = False
+
+    @classmethod
+    def start(
+        cls,
+        case_id: str,
+        file_content: str,
+        taxonomy: Optional[dict] = None,
+        first_batch: Optional[int] = None,
+    ) -> "RuleSpeculation":
+        """
+        Predict the procedure and start evaluating its rules in the background.
+
+        Args:
+            first_batch: Evaluate only this many rules, the first in
+                short-circuit order; None evaluates them all
+        """
+        speculation = cls(case_id, first_batch)
+        stats.cases += 1
+        speculation._task = asyncio.ensure_future(speculation._run(file_content, taxonomy))
+        return speculation
+
+    async def _run(self, file_content: str, taxonomy: Optional[dict]) -> None:
+        from api.taxo_agents.rule_processor_agent import evaluate_rule
+
+        try:
+            procedures = taxonomy["procedures"] if taxonomy else await asyncio.to_thread(convex_client.query, "procedures:getProcedures")
+            prediction = await asyncio.to_thread(predict_procedure, file_content, procedures)
+            if prediction is None:
+                return
+            self.procedure_id, self.source = prediction
+            stats.predicted += 1
+            rules = await asyncio.to_thread(convex_client.query, "rules:getRulesByProcedure", {"procedureId": self.procedure_id})
+            if self.first_batch is not None:
+                rules = await asyncio.to_thread(_first_batch, rules, self.first_batch)
+        except Exception as exc:
+            logger.error(f"Rule speculation failed for case {self.case_id}: {exc}")
+            self.procedure_id = None
+            return
+        if self._resolved:
+            return
+        for rule in rules:
+            self._rules[rule["_id"]] = rule
+            self._results[rule["_id"]] = asyncio.ensure_future(evaluate_rule(file_content, rule["title"], rule["description"]))
+        logger.info(f"Speculatively evaluating {len(rules)} rules of procedure {self.procedure_id} ({self.source}) for case {self.case_id}")
+
+    async def resolve(self, procedure_id: Optional[str]) -> bool:
+        """
+        Compare the prediction with the classified procedure; keep the
+        speculative results on a match and discard them otherwise.
+        Returns whether they were kept.
+        """
+        if self._task is not None:
+            await self._task
+        self._resolved = True
+        if self.procedure_id is None:
+            return False
+        if procedure_id == self.procedure_id:
+            stats.hits += 1
+            logger.info(f"Rule speculation hit for case {self.case_id}")
+            return True
+        stats.misses += 1
+        logger.info(f"Rule speculation missed for case {self.case_id}: predicted {self.procedure_id}, classified {procedure_id}")
+        self.close()
+        return False
+
+    async def result_for(self, rule_check: dict):
+        """
+        The kept speculative result for a rule check, or None if there is none
+        (or the rule changed since it was fetched, or its evaluation failed).
+        """
+        rule_id = rule_check.get("originalRuleId")
+        task = self._results.get(rule_id)
+        rule = self._rules.get(rule_id)
+        if task is None or rule["title"] != rule_check.get("ruleTitle") or rule["description"] != rule_check.get("ruleDescription"):
+            return None
+        del self._results[rule_id]
+        try:
+            output = await task
+        except Exception as exc:
+            logger.error(f"Speculative evaluation of rule '{rule['title']}' failed for case {self.case_id}: {exc}")
+            return None
+        stats.rules_reused += 1
+        return output
+
+    def close(self) -> None:
+        """Cancel whatever was not used."""
+        self._resolved = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for task in self._results.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # retrieved, so a failure is not reported as unhandled
+        stats.rules_discarded += len(self._results)
+        self._results.clear()
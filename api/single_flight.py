@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent executions that share the same key.
+
+    The first caller for a key starts the execution; every caller that arrives
+    while it is still running attaches to it and receives the same result (or
+    exception). Once the execution finishes the key is released, so the next
+    call starts a fresh run.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], force: bool = False) -> Any:
+        """
+        Run `fn` for `key`, or attach to the execution already in flight.
+
+        Args:
+            key: The coalescing key
+            fn: Zero-argument coroutine factory performing the work
+            force: Start a new execution even if one is in flight. Later
+                duplicates attach to the forced run.
+
+        Returns:
+            The result of the (possibly shared) execution.
+        """
+        existing: Optional[asyncio.Future] = self._inflight.get(key)
+        if existing is not None and not force:
+            logger.info(f"Attaching to in-flight execution for {key}")
+            # Shield so a disconnecting caller does not cancel the shared run
+            return await asyncio.shield(existing)
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Future) -> None:
+        # A forced run may have replaced this entry; only drop our own task
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"In-flight execution for {key} failed: {task.exception()}")
+
+
+class EventFanout:
+    """
+    Delivers the events of one execution to every caller attached to it.
+
+    Pass `emit` to the execution and let each caller `subscribe` its own
+    callback; a caller that attaches late first receives the events emitted
+    so far, so it sees the same stream as the caller that started the run.
+    """
+
+    def __init__(self):
+        self._history: List[Tuple[str, dict]] = []
+        self._subscribers: List[Callable[[str, dict], None]] = []
+
+    def emit(self, event: str, data: dict) -> None:
+        self._history.append((event, data))
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber(event, data)
+            except Exception as exc:
+                logger.error(f"Event subscriber failed on {event}: {exc}")
+
+    def subscribe(self, subscriber: Callable[[str, dict], None]) -> Callable[[], None]:
+        """Replay past events to `subscriber` and add it; returns a function that removes it."""
+        for event, data in self._history:
+            subscriber(event, data)
+        self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+        return unsubscribe
+
+
+def documents_fingerprint(documents: list) -> str:
+    """
+    Stable hash identifying the set of documents attached to a case.
+    """
+    digest = hashlib.sha256()
+    for document in sorted(documents, key=lambda d: d.get("_id", "")):
+        digest.update(str(document.get("_id", "")).encode())
+        digest.update(str(document.get("storageId", "")).encode())
+        digest.update(str(document.get("fileSize", "")).encode())
+    return digest.hexdigest()[:16]
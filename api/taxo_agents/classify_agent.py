@@ -1,8 +1,11 @@
 import logging
-from agents import Agent, Runner
+from agents import Agent
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
+from api.agent_runner import run_agent
+from api.classification_cache import lookup_classification, record_classification
+from api.code_extraction import ExtractedCodes, extract_codes
 from api.convex_client import convex_client
 
 client = convex_client
@@ -133,32 +136,83 @@ process_extractor = Agent(
     output_type=ProcedureOutput,
     model="gpt-4.1-mini"
 )
-async def classify_referral(referral: str, case_id: str) -> ClassifyOutput:
-    requested_procedure = (await Runner.run(process_extractor, input=referral)).final_output
-    specialties = list_specialties()
-
-    treatment_types = list_treatment_types()
-    procedures = list_procedures()
-    for specialty in specialties:
-        specialty['treatmentTypes'] = []
+def load_taxonomy() -> dict:
+    """
+    Fetch a snapshot of the specialty / treatment type / procedure hierarchy.
+    A snapshot can be shared across many classify_referral calls (e.g. a batch).
+    """
+    return {
+        "specialties": list_specialties(),
+        "treatment_types": list_treatment_types(),
+        "procedures": list_procedures(),
+    }
 
-    for treatment_type in treatment_types:
-        treatment_type['procedures'] = []
-        specialty = next((s for s in specialties if s['_id'] == treatment_type['specialtyId']), None)
-        specialty['treatmentTypes'].append(treatment_type)
+def format_taxonomy(taxonomy: dict) -> str:
+    treatment_types_by_specialty = {}
+    for treatment_type in taxonomy["treatment_types"]:
+        treatment_types_by_specialty.setdefault(treatment_type['specialtyId'], []).append(treatment_type)
 
-    for procedure in procedures:
-        treatment_type = next((t for t in treatment_types if t['_id'] == procedure['treatmentTypeId']), None)
-        treatment_type['procedures'].append(procedure)
+    procedures_by_treatment_type = {}
+    for procedure in taxonomy["procedures"]:
+        procedures_by_treatment_type.setdefault(procedure['treatmentTypeId'], []).append(procedure)
 
     result_string = ""
-    for specialty in specialties:
-        result_string += f"{specialty['name']} - {specialty['description']}\n"
-        for treatment_type in specialty['treatmentTypes']:
-            result_string += f"\t{treatment_type['name']} - {treatment_type['description']}\n"
-            for procedure in treatment_type['procedures']:
-                result_string += f"\t\t{procedure['name']} - {procedure['description']}\n"
-    result = (await Runner.run(classify_agent, 
+    for specialty in taxonomy["specialties"]:
+        result_string += f"{specialty['name']} - {specialty.get('description')}\n"
+        for treatment_type in treatment_types_by_specialty.get(specialty['_id'], []):
+            result_string += f"\t{treatment_type['name']} - {treatment_type.get('description')}\n"
+            for procedure in procedures_by_treatment_type.get(treatment_type['_id'], []):
+                result_string += f"\t\t{procedure['name']} - {procedure.get('description')}\n"
+    return result_string
+
+def classify_from_signature(codes: ExtractedCodes, case_id: str) -> Optional[ClassifyOutput]:
+    """
+    Classify the case from a previous classification of the same procedure codes.
+    Returns None (and the caller falls back to the LLM) on a miss.
+    """
+    entry = lookup_classification(codes)
+    if entry is None:
+        return None
+    try:
+        convex_client.mutation("case_classifications:classifyCaseWithProcedure", {
+            "caseId": case_id,
+            "specialtyId": entry["specialtyId"],
+            "treatmentTypeId": entry["treatmentTypeId"],
+            "procedureId": entry["procedureId"],
+            "classifiedBy": "ai",
+            "confidence": entry["confidence"],
+        })
+    except Exception as exc:
+        logger.error(f"Failed to classify case {case_id} from procedure signature: {exc}")
+        return None
+
+    logger.info(f"Classified case {case_id} from procedure signature {entry['signature']}")
+    return ClassifyOutput(
+        specialty=entry["specialty"]["name"],
+        specialty_description=entry["specialty"].get("description") or "",
+        treatment_type=entry["treatmentType"]["name"],
+        treatment_type_description=entry["treatmentType"].get("description") or "",
+        procedure=entry["procedure"]["name"],
+        procedure_description=entry["procedure"].get("description") or "",
+        evidence=[f"Procedure codes: {', '.join(codes.procedure_codes)}"],
+        notes=f"Reused classification of {entry['hits']} previous referrals with the same procedure codes",
+    )
+
+async def classify_referral(referral: str, case_id: str, taxonomy: Optional[dict] = None) -> ClassifyOutput:
+    codes = extract_codes(referral)
+    cached = classify_from_signature(codes, case_id)
+    if cached is not None:
+        return cached
+
+    requested_procedure = (await run_agent(process_extractor, input=referral)).final_output
+    if taxonomy is None:
+        taxonomy = load_taxonomy()
+    specialties = taxonomy["specialties"]
+    treatment_types = taxonomy["treatment_types"]
+    procedures = taxonomy["procedures"]
+
+    result_string = format_taxonomy(taxonomy)
+    result = (await run_agent(classify_agent, 
                              f"Existing classifications: {result_string}\n"+
                              "--------------------------------\n"+
                              f"Procedure Requested:\n {requested_procedure.procedure_name}\n"
@@ -170,6 +224,8 @@ async def classify_referral(referral: str, case_id: str) -> ClassifyOutput:
     if matched_specialty is None:
         specialty = create_specialty(result.specialty, result.specialty_description)
         matched_specialty = specialty
+        # Keep a shared snapshot current so later cases reuse the new entry
+        specialties.append({"_id": specialty, "name": result.specialty, "description": result.specialty_description})
     else:
         matched_specialty = matched_specialty["_id"]
     
@@ -177,6 +233,7 @@ async def classify_referral(referral: str, case_id: str) -> ClassifyOutput:
     if matched_treatment_type is None:
         treatment_type = create_treatment_type(matched_specialty, result.treatment_type, result.treatment_type_description)
         matched_treatment_type = treatment_type
+        treatment_types.append({"_id": treatment_type, "specialtyId": matched_specialty, "name": result.treatment_type, "description": result.treatment_type_description})
     else:
         matched_treatment_type = matched_treatment_type["_id"]
 
@@ -186,6 +243,7 @@ async def classify_referral(referral: str, case_id: str) -> ClassifyOutput:
         procedure_id = create_procedure(matched_treatment_type, result.procedure, result.procedure_description)
         matched_procedure = procedure_id
         procedure_is_new = True
+        procedures.append({"_id": procedure_id, "treatmentTypeId": matched_treatment_type, "name": result.procedure, "description": result.procedure_description})
     else:
         matched_procedure = matched_procedure["_id"]
     # Generate rules for new procedures
@@ -211,6 +269,7 @@ async def classify_referral(referral: str, case_id: str) -> ClassifyOutput:
         "procedureId": matched_procedure,
         "classifiedBy": "ai",
     })
+    record_classification(codes, result.procedure, matched_specialty, matched_treatment_type, matched_procedure)
     
 
     return result
\ No newline at end of file
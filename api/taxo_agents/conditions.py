@@ -1,8 +1,9 @@
 from typing import List
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
 
-from taxo_agents.procedure import ProcedureOutput
+from api.agent_runner import run_agent
+from api.taxo_agents.classify_agent import ProcedureOutput
 
 class Conditions(BaseModel):
     condition: str
@@ -29,7 +30,7 @@ eligibility_agent = Agent(
 )
 
 async def condition_check(procedure: ProcedureOutput, policy: str) -> ConditionCheckOutput:
-    return (await Runner.run(eligibility_agent, input=
+    return (await run_agent(eligibility_agent, input=
                             f"Procedure: {procedure.procedure_name}\n"
                             f"Procedure Description: {procedure.description}\n"
                             f"ProcedureRelevant Details: {procedure.relevant_details}\n"
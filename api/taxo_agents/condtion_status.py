@@ -1,8 +1,9 @@
 from typing import List
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
 
-from taxo_agents.conditions import Conditions
+from api.agent_runner import run_agent
+from api.taxo_agents.conditions import Conditions
 
 class ConditionsStatus(BaseModel):
     condition: str
@@ -29,4 +30,5 @@ process_extractor = Agent(
 )
 
 async def condition_status(context: str, conditions: List[Conditions]) -> EligibilityRequestOutput:
-    return (await Runner.run(process_extractor, input=f"Context: {context}\nConditions: {conditions}")).final_output
+    formatted = "\n".join(f"- {condition.condition}: {condition.description}" for condition in conditions)
+    return (await run_agent(process_extractor, input=f"Context: {context}\nConditions:\n{formatted}")).final_output
@@ -1,10 +1,13 @@
 
+import asyncio
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-from agents import Agent, Runner
+from agents import Agent
 from pydantic import BaseModel
+from api.agent_runner import run_agent
 from api.convex_client import convex_client
+from api.patient_index import ENABLED as PATIENT_INDEX_ENABLED, PatientRecord, find_matching_patient, patient_index
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +65,12 @@ def find_or_create_patient(patient_info: PatientInfo) -> str:
     Returns the patient ID.
     """
     try:
+        # Fuzzy match against the blocking index (typos, swapped names, reformatted phones)
+        match = find_matching_patient(patient_info)
+        if match:
+            logger.info(f"Found existing patient by index match: {match.patient_id} (score {match.score:.1f}, {', '.join(match.agreeing)})")
+            return match.patient_id
+
         # First, try to find existing patient by email check if
         if patient_info.email:
             print(f"Finding patient by email: {patient_info.email}")
@@ -77,8 +86,8 @@ def find_or_create_patient(patient_info: PatientInfo) -> str:
                 logger.info(f"Found existing patient by phone: {existing_patient['_id']}")
                 return existing_patient["_id"]
         
-        # Try to find by medical record number
-        if patient_info.medical_record_number:
+        # Try to find by medical record number (a full table scan; the index covers MRNs)
+        if patient_info.medical_record_number and not (PATIENT_INDEX_ENABLED and patient_index.synced):
             existing_patient = convex_client.query("patients:findPatientByMRN", {"medicalRecordNumber": patient_info.medical_record_number})
             if existing_patient:
                 logger.info(f"Found existing patient by MRN: {existing_patient['_id']}")
@@ -172,6 +181,8 @@ def find_or_create_patient(patient_info: PatientInfo) -> str:
 
         # Create new patient
         patient_id = convex_client.mutation("patients:createPatient", patient)
+        if PATIENT_INDEX_ENABLED:
+            patient_index.upsert(PatientRecord.from_patient({**patient, "_id": patient_id}))
         
         logger.info(f"Created new patient: {patient_id}")
         return patient_id
@@ -203,16 +214,16 @@ async def extract_patient_info(file_content: str, case_id: str) -> PatientInfo:
     try:
         # Extract patient information using AI
         logger.info(f"Extracting patient info for case: {case_id}")
-        extraction_result = await Runner.run(patient_info_extractor, file_content)
+        extraction_result = await run_agent(patient_info_extractor, file_content)
         patient_info = extraction_result.final_output
         
         logger.info(f"Extracted patient info: {patient_info}")
         
-        # Find or create patient
-        patient_id = find_or_create_patient(patient_info)
+        # Find or create patient (blocking Convex calls, kept off the event loop)
+        patient_id = await asyncio.to_thread(find_or_create_patient, patient_info)
         
         # Update case with patient ID
-        update_case_with_patient(case_id, patient_id)
+        await asyncio.to_thread(update_case_with_patient, case_id, patient_id)
         
         return patient_info
         
@@ -2,7 +2,8 @@ import logging
 from typing import Optional
 
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
+from api.agent_runner import run_agent
 from api.convex_client import convex_client
 
 
@@ -44,7 +45,7 @@ async def extract_provider_name(file_content: str, case_id: str) -> Optional[str
         The provider name as a string, or None if not found.
     """
     try:
-        result = await Runner.run(provider_name_extractor, file_content)
+        result = await run_agent(provider_name_extractor, file_content)
         info: ProviderInfo = result.final_output
         provider_name = info.name.strip() if info and info.name else None
         logger.info(f"Extracted provider name: {provider_name}")
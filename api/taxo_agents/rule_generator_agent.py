@@ -1,7 +1,8 @@
 import logging
 from typing import List
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
+from api.agent_runner import run_agent
 from api.convex_client import convex_client
 
 logger = logging.getLogger(__name__)
@@ -153,7 +154,7 @@ async def generate_rules_for_procedure(
         Please generate essential eligibility and safety rules that must be checked before approving referrals for this procedure.
         """
 
-        result = await Runner.run(rule_generator_agent, input_text)
+        result = await run_agent(rule_generator_agent, input_text)
         output: RuleGenerationOutput = result.final_output
 
         logger.info(f"Generated {len(output.rules)} rules for procedure: {procedure_name}")
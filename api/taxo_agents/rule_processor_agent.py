@@ -1,10 +1,14 @@
 import logging
-from typing import Optional
+import os
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from enum import Enum
 
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
+from api.agent_runner import run_agent
 from api.convex_client import convex_client
+from api.rule_check_writer import RuleCheckWriter
 
 logger = logging.getLogger(__name__)
 
@@ -54,11 +58,122 @@ rule_processor_agent = Agent(
 )
 
 
+def build_rule_input(file_content: str, rule_name: str, rule_description: str) -> str:
+    # Combine rule information with document content for analysis
+    return f"""
+        RULE TO EVALUATE:
+        Name: {rule_name}
+        Description: {rule_description}
+
+        DOCUMENT CONTENT:
+        {file_content}
+        """
+
+
+CASCADE_ENABLED = os.getenv("TAXO_RULE_CASCADE_ENABLED", "0") == "1"
+"""Evaluate rules with a cheap model first and escalate only uncertain results"""
+DEFAULT_CASCADE_MODELS = ["gpt-4.1-mini", "gpt-5-mini"]
+
+
+def parse_cascade_models(setting: str) -> List[str]:
+    """Comma-separated model names; DEFAULT_CASCADE_MODELS if there are none."""
+    return [model.strip() for model in setting.split(",") if model.strip()] or list(DEFAULT_CASCADE_MODELS)
+
+
+CASCADE_MODELS = parse_cascade_models(os.getenv("TAXO_RULE_CASCADE_MODELS", ""))
+"""Cascade tiers, cheapest first; the last tier's answer is final"""
+CASCADE_MIN_CONFIDENCE = float(os.getenv("TAXO_RULE_CASCADE_MIN_CONFIDENCE", "0.8"))
+"""Results below this confidence are escalated to the next tier"""
+CASCADE_ESCALATE_STATUSES = {RuleStatus.DENY, RuleStatus.NEEDS_MORE_INFO}
+"""Statuses that are always confirmed by the next tier"""
+
+
+class ScoredRuleProcessingOutput(RuleProcessingOutput):
+    confidence: float
+    """Confidence in the chosen status, from 0.0 (guess) to 1.0 (certain)"""
+
+
+CONFIDENCE_INSTRUCTIONS = """
+    Also return a confidence between 0.0 and 1.0 for the chosen status. Use a high confidence only when the
+    document states the relevant facts explicitly; use a low confidence when you had to infer or assume.
+    """
+
+
+@lru_cache(maxsize=None)
+def cascade_agents(models: Tuple[str, ...]) -> List[Agent]:
+    """Agents for each cascade tier; every tier but the last also reports a confidence."""
+    agents = []
+    for model in models[:-1]:
+        agents.append(rule_processor_agent.clone(
+            name=f"Rule Processor Agent ({model})",
+            model=model,
+            instructions=rule_processor_agent.instructions + CONFIDENCE_INSTRUCTIONS,
+            output_type=ScoredRuleProcessingOutput,
+        ))
+    final_model = models[-1]
+    if final_model == rule_processor_agent.model:
+        agents.append(rule_processor_agent)
+    else:
+        agents.append(rule_processor_agent.clone(name=f"Rule Processor Agent ({final_model})", model=final_model))
+    return agents
+
+
+def should_escalate(output: RuleProcessingOutput, min_confidence: float) -> bool:
+    confidence = getattr(output, "confidence", None)
+    return output.status in CASCADE_ESCALATE_STATUSES or confidence is None or confidence < min_confidence
+
+
+async def run_rule_cascade(
+    rule_input: str,
+    models: Optional[List[str]] = None,
+    min_confidence: Optional[float] = None,
+) -> Tuple[RuleProcessingOutput, list]:
+    """
+    Evaluate a rule tier by tier until a tier is confident, or the last tier answers.
+    A tier that fails escalates to the next one.
+
+    Returns:
+        The deciding output and the run results of every tier that answered.
+    """
+    agents = cascade_agents(tuple(models or CASCADE_MODELS))
+    min_confidence = CASCADE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    attempts = []
+    for tier, agent in enumerate(agents):
+        is_final = tier == len(agents) - 1
+        try:
+            result = await run_agent(agent, rule_input)
+        except Exception as exc:
+            if is_final:
+                raise
+            logger.warning(f"{agent.name} failed, escalating: {exc}")
+            continue
+        attempts.append(result)
+        output: RuleProcessingOutput = result.final_output
+        if is_final or not should_escalate(output, min_confidence):
+            logger.info(f"Rule decided by {agent.name} at tier {tier}")
+            return output, attempts
+
+
+async def evaluate_rule(file_content: str, rule_name: str, rule_description: str) -> RuleProcessingOutput:
+    """
+    Evaluate a rule against document content without recording the result.
+    Raises on failure.
+    """
+    rule_input = build_rule_input(file_content, rule_name, rule_description)
+    if CASCADE_ENABLED:
+        output, _ = await run_rule_cascade(rule_input)
+        return output
+    result = await run_agent(rule_processor_agent, rule_input)
+    return result.final_output
+
+
 async def process_rule_against_document(
     file_content: str,
     case_id: str,
     rule_name: str,
-    rule_description: str
+    rule_description: str,
+    writer: Optional[RuleCheckWriter] = None,
+    precomputed: Optional[RuleProcessingOutput] = None,
 ) -> RuleProcessingOutput:
     """
     Processes a rule against document content and updates the case with the result.
@@ -68,26 +183,23 @@ async def process_rule_against_document(
         case_id: The ID of the case to update with the rule processing result.
         rule_name: The name/title of the rule being evaluated.
         rule_description: The detailed description of the rule requirements.
+        writer: Optional write-behind buffer; when given the result is queued on
+            it instead of being written with its own mutation.
+        precomputed: A result evaluated ahead of time (see rule_speculation);
+            recorded as is instead of calling the model.
 
     Returns:
         The rule processing output containing status, reasoning, and any required additional info.
     """
     try:
-        # Combine rule information with document content for analysis
-        input_text = f"""
-        RULE TO EVALUATE:
-        Name: {rule_name}
-        Description: {rule_description}
-
-        DOCUMENT CONTENT:
-        {file_content}
-        """
-
-        result = await Runner.run(rule_processor_agent, input_text)
-        output: RuleProcessingOutput = result.final_output
+        output = precomputed or await evaluate_rule(file_content, rule_name, rule_description)
 
         logger.info(f"Rule processing result for case {case_id}: {output.status}")
 
+        if writer is not None:
+            writer.add(rule_name, output)
+            return output
+
         # Update the case with the rule processing result
         try:
             convex_client.mutation("cases:updateRuleCheck", {
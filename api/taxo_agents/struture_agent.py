@@ -1,9 +1,26 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import Executor
+from typing import List, Optional
 
 from pydantic import BaseModel
-from agents import Agent, Runner
+from agents import Agent
 import tempfile
 import requests
-import pymupdf4llm
+
+from api.agent_runner import run_agent
+from api.document_compaction import compact_pages
+
+logger = logging.getLogger(__name__)
+
+MAX_DOCUMENT_BYTES = int(os.getenv("TAXO_MAX_DOCUMENT_BYTES", str(50 * 1024 * 1024)))
+"""Documents larger than this are rejected"""
+SPOOL_THRESHOLD = int(os.getenv("TAXO_DOCUMENT_SPOOL_THRESHOLD", str(4 * 1024 * 1024)))
+"""Downloads larger than this are spooled to a temporary file instead of memory"""
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+
 
 class FileStructure(BaseModel):
     structure: str
@@ -29,14 +46,91 @@ Root
     output_type=FileStructure,
     model="gpt-4o"
 )
-async def get_file_as_string(pdf_path: str) -> str:
-    response = requests.get(pdf_path)
-    response.raise_for_status()
-    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp_file:
-        tmp_file.write(response.content)
-        tmp_pdf_path = tmp_file.name
-        pdf_markdown = pymupdf4llm.to_markdown(tmp_pdf_path)
-        structure = await Runner.run(file_structure_agent, pdf_markdown)
-        structure = structure.final_output.structure
-        print(structure)
-        return f"Structure:\n{structure}\nContent:\n{pdf_markdown}"
\ No newline at end of file
+class DocumentTooLargeError(ValueError):
+    """Raised when a document exceeds MAX_DOCUMENT_BYTES."""
+
+
+def _download_pages(pdf_path: str, session: Optional[requests.Session] = None) -> List[str]:
+    """
+    Stream a PDF and convert it to per-page markdown.
+
+    The download is held in memory up to SPOOL_THRESHOLD bytes and spooled to a
+    temporary file beyond that, so a large scan never sits in memory whole.
+    """
+    # Imported lazily: pymupdf4llm is the heaviest import of the service
+    import pymupdf
+    import pymupdf4llm
+
+    http = session or requests
+    with http.get(pdf_path, stream=True) as response:
+        response.raise_for_status()
+        declared_size = int(response.headers.get("Content-Length") or 0)
+        if declared_size > MAX_DOCUMENT_BYTES:
+            raise DocumentTooLargeError(f"Document is {declared_size} bytes, limit is {MAX_DOCUMENT_BYTES}")
+
+        buffer: Optional[io.BytesIO] = io.BytesIO()
+        spool_file = None
+        size = 0
+        try:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_DOCUMENT_BYTES:
+                    raise DocumentTooLargeError(f"Document exceeds the {MAX_DOCUMENT_BYTES} byte limit")
+                if spool_file is None and size > SPOOL_THRESHOLD:
+                    spool_file = tempfile.NamedTemporaryFile(suffix=".pdf")
+                    spool_file.write(buffer.getbuffer())
+                    buffer = None
+                (spool_file or buffer).write(chunk)
+
+            if spool_file is not None:
+                spool_file.flush()
+                document = pymupdf.open(spool_file.name)
+            else:
+                document = pymupdf.open(stream=buffer.getbuffer(), filetype="pdf")
+            with document:
+                return [chunk["text"] for chunk in pymupdf4llm.to_markdown(document, page_chunks=True)]
+        finally:
+            if spool_file is not None:
+                spool_file.close()
+
+
+async def load_document_markdown(
+    pdf_path: str,
+    session: Optional[requests.Session] = None,
+    executor: Optional[Executor] = None,
+) -> str:
+    """Download, convert and compact a PDF to markdown (without the structure agent)."""
+    loop = asyncio.get_running_loop()
+    pages = await loop.run_in_executor(executor, _download_pages, pdf_path, session)
+    pdf_markdown, report = compact_pages(pages)
+    logger.info(
+        f"Compacted {pdf_path}: {report.tokens_before} -> {report.tokens_after} tokens "
+        f"({report.saved_ratio:.0%} saved, truncated={report.truncated})"
+    )
+    return pdf_markdown
+
+
+async def get_file_as_string(
+    pdf_path: str,
+    session: Optional[requests.Session] = None,
+    executor: Optional[Executor] = None,
+) -> str:
+    """
+    Download a PDF and convert it to markdown prefixed with its structure.
+
+    Args:
+        pdf_path: URL of the PDF
+        session: Optional shared HTTP session (connection pool) for the download
+        executor: Optional pool the blocking download and conversion run on;
+            the loop's default executor is used when omitted
+    """
+    pdf_markdown = await load_document_markdown(pdf_path, session=session, executor=executor)
+    try:
+        structure = await run_agent(file_structure_agent, pdf_markdown)
+    except Exception as exc:
+        # The structure is an aid for the other agents; carry on with the content alone
+        logger.error(f"Failed to extract structure of {pdf_path}: {exc}")
+        return f"Content:\n{pdf_markdown}"
+    structure = structure.final_output.structure
+    print(structure)
+    return f"Structure:\n{structure}\nContent:\n{pdf_markdown}"
@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the serverless API.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so the
+numbers match what a new Vercel function instance pays before serving its
+first request.
+
+Usage:
+    python -m benchmarks.cold_start [--top 15] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "api.index",
+    "api.convex_client",
+    "fastapi",
+    "requests",
+    "convex",
+    "agents",
+    "pymupdf4llm",
+    "api.taxo_agents.struture_agent",
+    "api.taxo_agents.classify_agent",
+    "api.taxo_agents.rule_processor_agent",
+]
+
+# Cold path for the health endpoint: import the app and serve one request
+HEALTH_SNIPPET = """
+import asyncio, sys
+import api.index as index
+asyncio.run(index.health())
+heavy = [m for m in ("agents", "pymupdf4llm", "convex") if m in sys.modules]
+print(",".join(heavy))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("NEXT_PUBLIC_CONVEX_URL", "https://example.convex.cloud")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_time(module: str) -> Tuple[float, List[Tuple[int, str]]]:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        The cumulative import time in ms and the (cumulative_us, name) entries
+        reported by -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT, env=_env(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), name[1:].rstrip()))
+        if name.strip() == module:
+            total_us = int(cumulative)
+    return total_us / 1000, entries
+
+
+def health_cold_start() -> Tuple[float, str]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", HEALTH_SNIPPET],
+        capture_output=True, text=True, cwd=ROOT, env=_env(),
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Health cold start failed:\n{result.stderr[-2000:]}")
+    return elapsed_ms, result.stdout.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="heaviest imports of api.index to list")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (median is reported)")
+    args = parser.parse_args()
+
+    print(f"{'module':<45}{'import ms (median)':>20}")
+    for module in MODULES:
+        timings = [import_time(module)[0] for _ in range(args.repeat)]
+        print(f"{module:<45}{statistics.median(timings):>20.1f}")
+
+    _, entries = import_time("api.index")
+    # Direct children of api.index are indented by exactly one level
+    direct = [(us, name) for us, name in entries if name.startswith("  ") and not name.startswith("    ")]
+    print("\nHeaviest direct imports of api.index:")
+    for us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {name.strip():<43}{us / 1000:>20.1f}")
+
+    elapsed_ms, heavy = health_cold_start()
+    print(f"\nProcess start to first /api/health response: {elapsed_ms:.1f} ms")
+    print(f"Heavy modules loaded by the health path: {heavy or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
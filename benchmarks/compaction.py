@@ -0,0 +1,74 @@
+"""
+Measure document compaction on sample referral PDFs.
+
+Reports estimated tokens before/after compaction for every PDF. With
+--extract, the patient and provider extractors are run on both the raw and
+the compacted markdown (requires OPENAI_API_KEY) and differing fields are
+listed, so the effect of compaction on extraction accuracy can be checked.
+
+Usage:
+    python -m benchmarks.compaction path/to/referral.pdf [...] [--max-tokens N] [--extract]
+"""
+import argparse
+import asyncio
+import sys
+from typing import List
+
+import pymupdf4llm
+from agents import Runner
+
+from api.document_compaction import CompactionConfig, compact_pages
+
+
+async def compare_extraction(raw: str, compacted: str) -> List[str]:
+    from api.taxo_agents.patient_extractor_agent import patient_info_extractor
+    from api.taxo_agents.provider_extractor_agent import provider_name_extractor
+
+    differences = []
+    for agent in (patient_info_extractor, provider_name_extractor):
+        raw_output, compacted_output = await asyncio.gather(
+            Runner.run(agent, raw), Runner.run(agent, compacted)
+        )
+        raw_fields = raw_output.final_output.model_dump()
+        compacted_fields = compacted_output.final_output.model_dump()
+        for field, value in raw_fields.items():
+            if value != compacted_fields.get(field):
+                differences.append(f"{agent.name}.{field}: {value!r} -> {compacted_fields.get(field)!r}")
+    return differences
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--extract", action="store_true", help="compare extractor output on raw vs compacted")
+    args = parser.parse_args()
+
+    config = CompactionConfig(max_tokens=args.max_tokens)
+    total_before = total_after = 0
+    mismatches = 0
+    print(f"{'document':<40}{'tokens before':>15}{'tokens after':>15}{'saved':>8}{'repeated':>10}{'page #':>8}")
+    for path in args.pdfs:
+        pages = [chunk["text"] for chunk in pymupdf4llm.to_markdown(path, page_chunks=True)]
+        compacted, report = compact_pages(pages, config)
+        total_before += report.tokens_before
+        total_after += report.tokens_after
+        print(
+            f"{path[-40:]:<40}{report.tokens_before:>15}{report.tokens_after:>15}{report.saved_ratio:>8.0%}"
+            f"{report.repeated_lines_removed:>10}{report.page_number_lines_removed:>8}"
+        )
+        if args.extract:
+            differences = await compare_extraction("".join(pages), compacted)
+            mismatches += len(differences)
+            for difference in differences:
+                print(f"    {difference}")
+
+    if total_before:
+        print(f"\nTotal: {total_before} -> {total_after} tokens ({1 - total_after / total_before:.0%} saved)")
+    if args.extract:
+        print(f"Extraction fields that differ: {mismatches}")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Peak memory per case against document size.
+
+Synthetic referral PDFs of increasing page counts (text plus a noise image per
+page, like a scan) are served from a local HTTP server. For each one, a fresh
+interpreter downloads, converts and compacts the document, then runs a rule
+fan-out of --rules concurrent evaluations through run_agent. The model is
+replaced by a stub that holds the JSON request body the OpenAI client would
+send for the call until every evaluation is in flight, so the per-request
+copies of the document are counted. It reports the tracemalloc peak (Python
+heap) and the process max RSS (including MuPDF's native allocations).
+
+--legacy downloads the whole PDF into memory before converting it, as before
+streaming; conversion, compaction and the fan-out are the same on both sides.
+
+Usage:
+    python -m benchmarks.memory [--pages 5,20,80] [--rules 10] [--legacy]
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import importlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_pdf(path: str, pages: int) -> None:
+    import pymupdf
+
+    rng = random.Random(pages)
+    document = pymupdf.open()
+    for number in range(pages):
+        page = document.new_page()
+        page.insert_text((50, 40), "FAX FROM: Referring Clinic  (555) 010-2000")
+        for line in range(40):
+            words = " ".join(rng.choice(["patient", "history", "glaucoma", "pressure", "visual", "field", "mmHg", "left", "right"]) for _ in range(12))
+            page.insert_text((50, 80 + line * 16), words, fontsize=9)
+        noise = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 300, 300), False)
+        noise.set_rect(noise.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        page.insert_image(pymupdf.Rect(350, 600, 550, 800), pixmap=noise)
+        page.insert_text((280, 820), f"Page {number + 1} of {pages}")
+    document.save(path)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _legacy_pages(url: str) -> list:
+    """Download the whole PDF into memory, then convert it page by page."""
+    import pymupdf
+    import pymupdf4llm
+    import requests
+
+    response = requests.get(url)
+    with pymupdf.open(stream=response.content, filetype="pdf") as document:
+        return [chunk["text"] for chunk in pymupdf4llm.to_markdown(document, page_chunks=True)]
+
+
+async def _fan_out(content: str, rules: int) -> None:
+    import api.agent_runner as agent_runner
+    rpa = importlib.import_module("api.taxo_agents.rule_processor_agent")
+
+    in_flight = asyncio.Barrier(rules)
+
+    async def serialized_call(agent, input):
+        # Held (by this frame) until every evaluation has built its own
+        body = json.dumps({"model": agent.model, "instructions": agent.instructions, "input": [{"role": "user", "content": input}]})
+        await in_flight.wait()
+        del body
+        return SimpleNamespace(final_output=rpa.RuleProcessingOutput(status=rpa.RuleStatus.VALID, reasoning="stub"))
+
+    agent_runner._run_once = serialized_call
+    await asyncio.gather(*[rpa.evaluate_rule(content, f"Rule {rule}", "description") for rule in range(rules)])
+
+
+def measure(url: str, rules: int, legacy: bool) -> dict:
+    """Runs inside a fresh interpreter; see main()."""
+    # Import everything first so only the per-case allocations are traced
+    import pymupdf4llm  # noqa: F401
+    import requests  # noqa: F401
+
+    import api.taxo_agents  # noqa: F401
+    from api.document_compaction import compact_pages
+    from api.taxo_agents.struture_agent import _download_pages
+
+    tracemalloc.start()
+    pages = _legacy_pages(url) if legacy else _download_pages(url)
+    markdown, _ = compact_pages(pages)
+    del pages
+    content = f"Structure:\n(structure)\nContent:\n{markdown}"
+    del markdown
+    asyncio.run(_fan_out(content, rules))
+    _, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracemalloc_peak_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="5,20,80")
+    parser.add_argument("--rules", type=int, default=10)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.rules, args.legacy)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        handler = functools.partial(QuietHandler, directory=directory)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            print(f"{'pages':>6}{'pdf MB':>10}{'heap peak MB':>15}{'max RSS MB':>13}")
+            for pages in (int(count) for count in args.pages.split(",")):
+                name = f"referral-{pages}.pdf"
+                make_pdf(os.path.join(directory, name), pages)
+                size_mb = os.path.getsize(os.path.join(directory, name)) / 2**20
+                command = [
+                    sys.executable, "-m", "benchmarks.memory",
+                    "--measure", f"http://127.0.0.1:{server.server_port}/{name}",
+                    "--rules", str(args.rules),
+                ] + (["--legacy"] if args.legacy else [])
+                output = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{pages:>6}{size_mb:>10.1f}{result['tracemalloc_peak_mb']:>15.1f}{result['max_rss_mb']:>13.1f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Patient matching index: lookup latency and match quality at scale.
+
+Builds the blocking index (api/patient_index.py) over a synthetic patients
+table, then looks up two kinds of extracted patients:
+
+    known   an indexed patient as a referral might describe them: typos,
+            "Last, First" order, reformatted phone and date of birth,
+            missing email or MRN
+    novel   patients that are not in the table
+
+and reports candidate lookup and scoring latency, candidates per lookup,
+how many known patients are matched to the right record, and the wrong-match
+rate: known patients matched to another record and novel patients matched to
+an existing one (a wrong match merges two people's cases). A full scan comparing names, like
+patients:findPotentialDuplicatePatients does, is timed for reference.
+
+Usage:
+    python -m benchmarks.patient_index [--patients 100000] [--queries 2000] [--seed 7]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from api.patient_index import PatientIndex, PatientRecord
+from api.taxo_agents.patient_extractor_agent import PatientInfo
+
+FIRST_NAMES = (
+    "james mary robert patricia john jennifer michael linda david elizabeth william barbara richard susan "
+    "joseph jessica thomas sarah charles karen christopher lisa daniel nancy matthew betty anthony margaret "
+    "mark sandra donald ashley steven kimberly paul emily andrew donna joshua michelle kenneth carol kevin "
+    "amanda brian dorothy george melissa timothy deborah ronald stephanie edward rebecca jason sharon jeffrey "
+    "laura ryan cynthia jacob kathleen gary amy nicholas angela eric shirley jonathan anna stephen brenda "
+    "larry pamela justin emma scott nicole brandon helen benjamin samantha samuel katherine gregory christine"
+).split()
+LAST_NAMES = (
+    "smith johnson williams brown jones garcia miller davis rodriguez martinez hernandez lopez gonzalez "
+    "wilson anderson thomas taylor moore jackson martin lee perez thompson white harris sanchez clark "
+    "ramirez lewis robinson walker young allen king wright scott torres nguyen hill flores green adams "
+    "nelson baker hall rivera campbell mitchell carter roberts gomez phillips evans turner diaz parker cruz "
+    "edwards collins reyes stewart morris morales murphy cook rogers gutierrez ortiz morgan cooper peterson "
+    "bailey reed kelly howard ramos kim cox ward richardson watson brooks chavez wood james bennett gray"
+).split()
+
+
+def synthetic_patient(rng: random.Random, number: int) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    dob = date(1930, 1, 1) + timedelta(days=rng.randrange(365 * 90))
+    additional = [{"name": "Date of Birth", "value": dob.isoformat()}]
+    if rng.random() < 0.7:
+        additional.append({"name": "Medical Record Number", "value": f"MRN{rng.randrange(10**8):08d}"})
+    patient = {
+        "_id": f"patients:{number}",
+        "name": f"{first.title()} {last.title()}",
+        "phone": f"{rng.randrange(200, 999)}{rng.randrange(10**7):07d}",
+        "additionalData": additional,
+    }
+    if rng.random() < 0.5:
+        patient["email"] = f"{first}.{last}{rng.randrange(1000)}@example.com"
+    return patient
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    if len(word) < 4:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+
+def describe(rng: random.Random, patient: dict) -> PatientInfo:
+    """How a referral might describe `patient`."""
+    first, last = patient["name"].split()
+    if rng.random() < 0.3:
+        last = _typo(rng, last)
+    name = f"{last.upper()}, {first}" if rng.random() < 0.3 else f"{first} {last}"
+    dob = date.fromisoformat(patient["additionalData"][0]["value"])
+    mrn = next((data["value"] for data in patient["additionalData"] if data["name"] == "Medical Record Number"), None)
+    phone = patient["phone"]
+    return PatientInfo(
+        name=name,
+        date_of_birth=dob.strftime("%m/%d/%Y") if rng.random() < 0.5 else dob.strftime("%B %d, %Y"),
+        phone=f"({phone[:3]}) {phone[3:6]}-{phone[6:]}" if rng.random() < 0.8 else None,
+        medical_record_number=mrn if rng.random() < 0.5 else None,
+        email=patient.get("email") if rng.random() < 0.5 else None,
+    )
+
+
+def percentiles(samples: List[float]) -> Tuple[float, float]:
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[int(len(ordered) * 0.99) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patients = [synthetic_patient(rng, number) for number in range(args.patients)]
+    index = PatientIndex()
+    started = time.perf_counter()
+    index.add_patients(patients)
+    build = time.perf_counter() - started
+    print(f"Patients:                 {len(index)}")
+    print(f"Build (s):                {build:.2f} ({build / len(index) * 1e6:.1f}us per patient)")
+
+    known = [(patient["_id"], describe(rng, patient)) for patient in rng.sample(patients, args.queries)]
+    novel = [(None, describe(rng, synthetic_patient(rng, -1))) for _ in range(args.queries)]
+
+    lookup_times, match_times, candidate_counts = [], [], []
+    matched_right = known_wrong = novel_wrong = 0
+    for expected, info in known + novel:
+        query = PatientRecord.from_info(info)
+        started = time.perf_counter()
+        candidates = index.candidates(query)
+        lookup_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        match = index.best_match(query)
+        match_times.append(time.perf_counter() - started)
+        candidate_counts.append(len(candidates))
+        if match is not None and match.patient_id == expected:
+            matched_right += 1
+        elif match is not None and expected is not None:
+            known_wrong += 1
+        elif match is not None:
+            novel_wrong += 1
+
+    lookup_p50, lookup_p99 = percentiles(lookup_times)
+    match_p50, match_p99 = percentiles(match_times)
+    print(f"Candidate lookup (us):    p50 {lookup_p50 * 1e6:.1f}  p99 {lookup_p99 * 1e6:.1f}")
+    print(f"Lookup + scoring (us):    p50 {match_p50 * 1e6:.1f}  p99 {match_p99 * 1e6:.1f}")
+    print(f"Candidates per lookup:    mean {statistics.mean(candidate_counts):.1f}  max {max(candidate_counts)}")
+    print(f"Known matched correctly:  {matched_right}/{len(known)} ({matched_right / len(known):.1%})")
+    lookups = len(known) + len(novel)
+    print(f"Wrong matches:            {known_wrong + novel_wrong}/{lookups} ({(known_wrong + novel_wrong) / lookups:.2%})")
+    print(f"  known to another:       {known_wrong}/{len(known)}")
+    print(f"  novel to existing:      {novel_wrong}/{len(novel)}")
+
+    started = time.perf_counter()
+    scans = 20
+    for _, info in known[:scans]:
+        [patient for patient in patients if patient["name"] == info.name]
+    print(f"Full name scan (us):      {(time.perf_counter() - started) / scans * 1e6:.0f} per lookup")
+
+    started = time.perf_counter()
+    for number in range(1000):
+        index.upsert(PatientRecord.from_patient(synthetic_patient(rng, args.patients + number)))
+    print(f"Incremental upsert (us):  {(time.perf_counter() - started) / 1000 * 1e6:.1f}")
+
+
+if __name__ == "__main__":
+    main()
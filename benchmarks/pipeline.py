@@ -0,0 +1,164 @@
+"""
+End-to-end pipeline timing and output parity, offline.
+
+The synthetic referral corpus (benchmarks/referral_corpus.py) is served from a
+local HTTP server and every referral goes through the full /api/process-pdf
+pipeline against an in-memory Convex (api/local_convex.py). Agent calls go
+through the cassette layer (api/agent_cassette.py):
+
+    --mode record   calls the real models (OPENAI_API_KEY) and stores outputs
+    --mode replay   serves the stored outputs; no network, no cost
+
+Replaying is deterministic, so after an optimization the same run should give
+the same outputs: --save writes them, --compare diffs against a saved file.
+Cases run one at a time by default so the taxonomy grows in the same order
+(and agent inputs hash the same) on every run. The event-loop watchdog runs
+throughout and its worst lag and stall count are reported, as is the hit rate
+of speculative rule evaluation when it is on (TAXO_RULE_SPECULATION=1).
+
+Usage:
+    python -m benchmarks.pipeline --mode record [--count 12] [--cassettes benchmarks/cassettes]
+    python -m benchmarks.pipeline --mode replay [--latency recorded|0|SECONDS] [--save baseline.json]
+    python -m benchmarks.pipeline --mode replay --compare baseline.json
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import logging
+import statistics
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.referral_corpus import generate_corpus
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def case_outputs(convex, case_id: str) -> dict:
+    """What the pipeline wrote for a case, without ids or timestamps."""
+    case = convex.get(case_id)
+    patient = convex.get(case["patientId"]) if case.get("patientId") else None
+    classification = next(iter(convex.where("caseClassifications", caseId=case_id)), None)
+    names = {}
+    if classification:
+        for key in ("specialtyId", "treatmentTypeId", "procedureId"):
+            names[key[:-2]] = convex.get(classification[key])["name"]
+    return {
+        "status": case.get("status"),
+        "eligibility": case.get("eligibilityStatus"),
+        "provider": case.get("provider"),
+        "patient": {key: patient.get(key) for key in ("name", "email", "phone")} if patient else None,
+        "classification": names,
+        "rules": {check["ruleTitle"]: check["status"] for check in convex.where("ruleChecks", caseId=case_id)},
+    }
+
+
+def compare(baseline: Dict[str, dict], outputs: Dict[str, dict]) -> List[str]:
+    differences = []
+    for name in sorted(set(baseline) | set(outputs)):
+        before, after = baseline.get(name), outputs.get(name)
+        if before == after:
+            continue
+        if before is None or after is None:
+            differences.append(f"{name}: only in {'baseline' if after is None else 'this run'}")
+            continue
+        for key in sorted(set(before) | set(after)):
+            if before.get(key) != after.get(key):
+                differences.append(f"{name}: {key} {before.get(key)!r} -> {after.get(key)!r}")
+    return differences
+
+
+async def run_corpus(base_url: str, names: List[str], concurrency: int) -> Dict[str, dict]:
+    from api.case_context import CaseContext
+    from api.convex_client import set_convex_client
+    from api.index import _process_pdf
+    from api.local_convex import InMemoryConvex
+    from api.loop_watchdog import watchdog
+    from api.rule_speculation import ENABLED as SPECULATION_ENABLED, stats as speculation_stats
+
+    watchdog.start()
+    convex = InMemoryConvex()
+    set_convex_client(convex)
+    case_ids = {name: convex.add_case([f"{base_url}/{name}"]) for name in names}
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = {}
+
+    async def process(name: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await _process_pdf(CaseContext(case_ids[name]))
+            except Exception as exc:
+                print(f"  {name}: failed: {exc!r}")
+            timings[name] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*[process(name) for name in names])
+    wall = time.perf_counter() - started
+
+    durations = list(timings.values())
+    print(f"Cases:            {len(names)}")
+    print(f"Wall time (s):    {wall:.2f}")
+    print(f"Per case p50 (s): {statistics.median(durations):.2f}")
+    print(f"Per case max (s): {max(durations):.2f}")
+    lag = watchdog.stats()["lag"]
+    print(f"Loop lag max (ms): {lag['max_ms']:.0f}  stalls: {watchdog.stall_count}")
+    watchdog.stop()
+    if SPECULATION_ENABLED:
+        print(f"Speculation:      {speculation_stats.to_dict()}")
+    return {name: case_outputs(convex, case_id) for name, case_id in case_ids.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--cassettes", default="benchmarks/cassettes")
+    parser.add_argument("--latency", default="0", help="replay delay: 'recorded' or seconds")
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--save", help="write the outputs to this JSON file")
+    parser.add_argument("--compare", help="diff the outputs against this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from api.agent_cassette import CassetteConfig, set_cassette
+
+    cassette = set_cassette(CassetteConfig(
+        mode=args.mode,
+        directory=args.cassettes,
+        latency=None if args.latency == "recorded" else float(args.latency),
+    ))
+
+    with tempfile.TemporaryDirectory() as directory:
+        names = generate_corpus(directory, args.count, args.seed)
+        handler = functools.partial(QuietHandler, directory=directory)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            outputs = asyncio.run(run_corpus(f"http://127.0.0.1:{server.server_port}", names, args.concurrency))
+        finally:
+            server.shutdown()
+
+    print(f"Cassette:         {cassette.stats()}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(outputs, f, indent=2, sort_keys=True)
+        print(f"Saved outputs to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            differences = compare(json.load(f), outputs)
+        print(f"Parity:           {'identical' if not differences else f'{len(differences)} differences'}")
+        for difference in differences:
+            print(f"  {difference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Generate a corpus of synthetic referral PDFs with PyMuPDF.
+
+Each referral is a faxed letter: a fax banner and footer on every page, patient
+demographics, the referring provider, the requested procedure with its CPT and
+ICD-10 codes, clinical history, a medication table and page numbers. The
+corpus is fully determined by --seed, so the same referrals (and therefore the
+same agent inputs) come out on every machine, which is what lets recorded
+agent calls be replayed against it.
+
+Usage:
+    python -m benchmarks.referral_corpus OUTPUT_DIR [--count 12] [--seed 7]
+"""
+import argparse
+import os
+import random
+from typing import List
+
+PROCEDURES = [
+    {
+        "name": "Cataract extraction with intraocular lens",
+        "cpt": "66984", "icd": "H25.11", "diagnosis": "Age-related nuclear cataract, right eye",
+        "specialty": "Ophthalmology",
+        "history": ["progressive blurred vision in the right eye", "glare when driving at night", "best corrected acuity 20/80 OD"],
+    },
+    {
+        "name": "Selective laser trabeculoplasty",
+        "cpt": "65855", "icd": "H40.1131", "diagnosis": "Primary open-angle glaucoma, bilateral, mild stage",
+        "specialty": "Ophthalmology",
+        "history": ["intraocular pressure 26 mmHg OU on latanoprost", "early superior arcuate field defect", "intolerant of timolol"],
+    },
+    {
+        "name": "Knee arthroscopy with partial meniscectomy",
+        "cpt": "29881", "icd": "M23.221", "diagnosis": "Derangement of posterior horn of medial meniscus, right knee",
+        "specialty": "Orthopedics",
+        "history": ["mechanical locking of the right knee for 4 months", "MRI shows complex medial meniscus tear", "failed 8 weeks of physical therapy"],
+    },
+    {
+        "name": "Screening colonoscopy",
+        "cpt": "45378", "icd": "Z12.11", "diagnosis": "Encounter for screening for malignant neoplasm of colon",
+        "specialty": "Gastroenterology",
+        "history": ["age 52 with no prior screening", "father diagnosed with colon cancer at 61", "no rectal bleeding or weight loss"],
+    },
+    {
+        "name": "Transthoracic echocardiogram",
+        "cpt": "93306", "icd": "I34.0", "diagnosis": "Nonrheumatic mitral valve insufficiency",
+        "specialty": "Cardiology",
+        "history": ["new grade 3/6 holosystolic murmur at the apex", "exertional dyspnea climbing one flight of stairs", "ECG shows left atrial enlargement"],
+    },
+    {
+        "name": "MRI brain with and without contrast",
+        "cpt": "70553", "icd": "G43.909", "diagnosis": "Migraine, unspecified, not intractable",
+        "specialty": "Neurology",
+        "history": ["change in headache pattern over 3 months", "new visual aura lasting 40 minutes", "normal neurological examination"],
+    },
+]
+
+FIRST_NAMES = ["Maria", "James", "Aisha", "Chen", "Olga", "Samuel", "Priya", "Diego", "Fatima", "Noah", "Grace", "Tomasz"]
+LAST_NAMES = ["Alvarez", "Okafor", "Lindqvist", "Nakamura", "Petrova", "Haddad", "Brennan", "Kowalski", "Mensah", "Duarte"]
+INSURERS = ["Blue Cross Blue Shield", "Aetna", "UnitedHealthcare", "Medicare Part B", "Cigna"]
+MEDICATIONS = [("Lisinopril", "10 mg", "daily"), ("Metformin", "500 mg", "twice daily"), ("Atorvastatin", "20 mg", "nightly"),
+               ("Latanoprost", "0.005%", "one drop nightly"), ("Ibuprofen", "400 mg", "as needed"), ("Levothyroxine", "75 mcg", "daily")]
+CLINICS = ["Riverside Family Medicine", "Northgate Primary Care", "Lakeview Internal Medicine", "Harbor Community Health"]
+
+LINE_HEIGHT = 14
+TOP, BOTTOM = 70, 780
+
+
+def referral_lines(rng: random.Random, number: int) -> List[str]:
+    procedure = PROCEDURES[number % len(PROCEDURES)]
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    provider = f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}, MD"
+    lines = [
+        "REFERRAL FOR SPECIALIST EVALUATION",
+        "",
+        f"Date: 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        f"To: {procedure['specialty']} Department",
+        f"Referring provider: {provider}",
+        f"Referring clinic: {rng.choice(CLINICS)}  NPI {rng.randint(10**9, 10**10 - 1)}",
+        "",
+        "PATIENT INFORMATION",
+        f"Patient name: {first} {last}",
+        f"Date of birth: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1940, 2000)}",
+        f"Sex: {rng.choice(['Female', 'Male'])}",
+        f"Phone: ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+        f"Email: {first.lower()}.{last.lower()}@example.com",
+        f"MRN: {rng.randint(10**6, 10**7 - 1)}",
+        f"Address: {rng.randint(10, 9999)} Oak Street, Springfield, IL {rng.randint(60000, 62999)}",
+        f"Insurance: {rng.choice(INSURERS)}  Member ID {rng.choice('ABCDEFGH')}{rng.randint(10**8, 10**9 - 1)}",
+        "",
+        "REQUESTED SERVICE",
+        f"Procedure: {procedure['name']}",
+        f"CPT: {procedure['cpt']}",
+        f"Diagnosis: {procedure['diagnosis']}",
+        f"ICD-10: {procedure['icd']}",
+        f"Urgency: {rng.choice(['Routine', 'Routine', 'Urgent'])}",
+        "",
+        "CLINICAL HISTORY",
+    ]
+    lines += [f"- {finding.capitalize()}." for finding in procedure["history"]]
+    # Filler progress notes so referrals span one to several pages
+    for visit in range(rng.randint(2, 10)):
+        lines += ["", f"Progress note, visit {visit + 1}:"]
+        lines += [
+            " ".join(rng.choice(["patient", "reports", "stable", "symptoms", "since", "last", "visit", "denies", "fever",
+                                 "pain", "improved", "with", "medication", "follow", "up", "recommended"]) for _ in range(14))
+            for _ in range(rng.randint(3, 8))
+        ]
+    lines += ["", "CURRENT MEDICATIONS", "| Medication | Dose | Frequency |", "| --- | --- | --- |"]
+    lines += [f"| {name} | {dose} | {frequency} |" for name, dose, frequency in rng.sample(MEDICATIONS, 3)]
+    lines += ["", "Please evaluate and treat as appropriate.", f"Signed: {provider}"]
+    return lines
+
+
+def make_referral(path: str, number: int, seed: int = 7) -> None:
+    import pymupdf
+
+    rng = random.Random(seed * 10_000 + number)
+    lines = referral_lines(rng, number)
+    per_page = (BOTTOM - TOP) // LINE_HEIGHT
+    pages = [lines[start:start + per_page] for start in range(0, len(lines), per_page)]
+
+    document = pymupdf.open()
+    for page_number, page_lines in enumerate(pages):
+        page = document.new_page()
+        page.insert_text((40, 36), f"FAX FROM: {CLINICS[number % len(CLINICS)]}  (555) 010-{2000 + number:04d}  Page {page_number + 1}", fontsize=8)
+        for index, line in enumerate(page_lines):
+            page.insert_text((50, TOP + index * LINE_HEIGHT), line, fontsize=10)
+        page.insert_text((270, 815), f"Page {page_number + 1} of {len(pages)}", fontsize=8)
+    # Fixed metadata keeps the bytes identical across runs
+    document.set_metadata({"title": f"Referral {number:03d}", "creationDate": "D:20250101000000", "modDate": "D:20250101000000"})
+    document.save(path, garbage=3, deflate=True, no_new_id=True)
+
+
+def generate_corpus(directory: str, count: int = 12, seed: int = 7) -> List[str]:
+    """Write `count` referral PDFs to `directory` and return their file names."""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for number in range(count):
+        name = f"referral-{number:03d}.pdf"
+        make_referral(os.path.join(directory, name), number, seed)
+        names.append(name)
+    return names
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    names = generate_corpus(args.output_dir, args.count, args.seed)
+    print(f"Wrote {len(names)} referrals to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
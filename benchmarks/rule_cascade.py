@@ -0,0 +1,128 @@
+"""
+Compare the rule-evaluation cascade with the single-model path.
+
+Every rule of every sample is evaluated with the single model used in
+production (rule_processor_agent) and with the cascade, and the script
+reports status agreement, latency, escalation rate and estimated cost.
+Calls go to the real models (OPENAI_API_KEY) but nothing touches Convex.
+
+Samples file (JSON):
+    [{"document": "path/to/referral.pdf" | "path/to/referral.md",
+      "rules": [{"title": "...", "description": "..."}]}]
+
+Usage:
+    python -m benchmarks.rule_cascade samples.json [--models gpt-4.1-mini,gpt-5-mini] [--min-confidence 0.8]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List, Tuple
+
+from api.agent_runner import run_agent
+from api.taxo_agents.rule_processor_agent import build_rule_input, rule_processor_agent, run_rule_cascade
+
+# USD per 1M (input, output) tokens; update when pricing changes
+PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5": (1.25, 10.00),
+}
+
+
+def run_cost(result) -> float:
+    usage = result.context_wrapper.usage
+    input_price, output_price = PRICES.get(str(result.last_agent.model), (0.0, 0.0))
+    return (usage.input_tokens * input_price + usage.output_tokens * output_price) / 1_000_000
+
+
+def load_document(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        import pymupdf4llm
+
+        from api.document_compaction import compact_pages
+
+        pages = [chunk["text"] for chunk in pymupdf4llm.to_markdown(path, page_chunks=True)]
+        return compact_pages(pages)[0]
+    with open(path) as f:
+        return f.read()
+
+
+async def timed(coro) -> Tuple[object, float]:
+    started = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - started
+
+
+async def evaluate(rule_input: str, models: List[str], min_confidence: float) -> dict:
+    (single, single_s), ((cascade_output, attempts), cascade_s) = await asyncio.gather(
+        timed(run_agent(rule_processor_agent, rule_input)),
+        timed(run_rule_cascade(rule_input, models, min_confidence)),
+    )
+    return {
+        "single_status": single.final_output.status,
+        "cascade_status": cascade_output.status,
+        "single_s": single_s,
+        "cascade_s": cascade_s,
+        "single_cost": run_cost(single),
+        "cascade_cost": sum(run_cost(attempt) for attempt in attempts),
+        "escalated": len(attempts) > 1,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples")
+    parser.add_argument("--models", default=None, help="comma-separated tiers, cheapest first")
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    models = args.models.split(",") if args.models else None
+    with open(args.samples) as f:
+        samples = json.load(f)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(rule_input: str) -> dict:
+        async with semaphore:
+            return await evaluate(rule_input, models, args.min_confidence)
+
+    inputs = []
+    for sample in samples:
+        document = load_document(sample["document"])
+        for rule in sample["rules"]:
+            inputs.append(build_rule_input(document, rule["title"], rule["description"]))
+    rows = await asyncio.gather(*[bounded(rule_input) for rule_input in inputs])
+    if not rows:
+        print("No rules to evaluate")
+        return
+
+    agreement = sum(row["single_status"] == row["cascade_status"] for row in rows) / len(rows)
+    escalation = sum(row["escalated"] for row in rows) / len(rows)
+    print(f"Rules evaluated:   {len(rows)}")
+    print(f"Status agreement:  {agreement:.1%}")
+    print(f"Escalation rate:   {escalation:.1%}")
+    print(f"{'':<18}{'single':>12}{'cascade':>12}")
+    for label, key in (("latency p50 (s)", "_s"), ("cost total ($)", "_cost")):
+        single = [row["single" + key] for row in rows]
+        cascade = [row["cascade" + key] for row in rows]
+        if key == "_s":
+            print(f"{label:<18}{statistics.median(single):>12.2f}{statistics.median(cascade):>12.2f}")
+            print(f"{'latency max (s)':<18}{max(single):>12.2f}{max(cascade):>12.2f}")
+        else:
+            print(f"{label:<18}{sum(single):>12.4f}{sum(cascade):>12.4f}")
+
+    disagreements = [row for row in rows if row["single_status"] != row["cascade_status"]]
+    for row in disagreements:
+        print(f"  disagreement: single={row['single_status'].value} cascade={row['cascade_status'].value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
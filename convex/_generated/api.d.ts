@@ -15,8 +15,11 @@ import type {
 } from "convex/server";
 import type * as case_classifications from "../case_classifications.js";
 import type * as cases from "../cases.js";
+import type * as documents from "../documents.js";
+import type * as eligibility_conditions from "../eligibility_conditions.js";
 import type * as hierarchicalData from "../hierarchicalData.js";
 import type * as patients from "../patients.js";
+import type * as procedure_signatures from "../procedure_signatures.js";
 import type * as procedures from "../procedures.js";
 import type * as processDocumentDirect from "../processDocumentDirect.js";
 import type * as rules from "../rules.js";
@@ -34,8 +37,11 @@ import type * as treatments from "../treatments.js";
 declare const fullApi: ApiFromModules<{
   case_classifications: typeof case_classifications;
   cases: typeof cases;
+  documents: typeof documents;
+  eligibility_conditions: typeof eligibility_conditions;
   hierarchicalData: typeof hierarchicalData;
   patients: typeof patients;
+  procedure_signatures: typeof procedure_signatures;
   procedures: typeof procedures;
   processDocumentDirect: typeof processDocumentDirect;
   rules: typeof rules;
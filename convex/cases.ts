@@ -1,7 +1,9 @@
 import { v } from 'convex/values';
 
 import { api } from './_generated/api';
+import type { Id } from './_generated/dataModel';
 import { action, mutation, query } from './_generated/server';
+import type { QueryCtx } from './_generated/server';
 
 // Create a new case
 export const createCase = mutation({
@@ -139,46 +141,64 @@ export const getAllCases = query({
   },
 });
 
+// Load a case with its documents, activity logs and patient information
+async function loadCaseWithDocuments(ctx: QueryCtx, caseId: Id<'cases'>) {
+  const caseData = await ctx.db.get(caseId);
+  if (!caseData) return null;
+
+  const documents = await ctx.db
+    .query('documents')
+    .withIndex('by_case', (q) => q.eq('caseId', caseId))
+    .collect();
+
+  const activityLogs = await ctx.db
+    .query('activityLogs')
+    .withIndex('by_case', (q) => q.eq('caseId', caseId))
+    .order('desc')
+    .collect();
+
+  // Fetch patient information
+  let patient = null;
+  if (caseData.patientId) {
+    patient = await ctx.db.get(caseData.patientId);
+  }
+  for (const document of documents) {
+    const documentUrl = await ctx.storage.getUrl(
+      document.storageId as string
+    );
+    if (!documentUrl) {
+      throw new Error('Could not get document URL from storage');
+    }
+    document.fileUrl = documentUrl;
+  }
+  return {
+    ...caseData,
+    patient,
+    documents,
+    activityLogs,
+  };
+}
+
 // Get a single case with its documents and patient information
 export const getCaseWithDocuments = query({
   args: {
     caseId: v.id('cases'),
   },
   handler: async (ctx, args) => {
-    const caseData = await ctx.db.get(args.caseId);
-    if (!caseData) return null;
-
-    const documents = await ctx.db
-      .query('documents')
-      .withIndex('by_case', (q) => q.eq('caseId', args.caseId))
-      .collect();
-
-    const activityLogs = await ctx.db
-      .query('activityLogs')
-      .withIndex('by_case', (q) => q.eq('caseId', args.caseId))
-      .order('desc')
-      .collect();
+    return await loadCaseWithDocuments(ctx, args.caseId);
+  },
+});
 
-    // Fetch patient information
-    let patient = null;
-    if (caseData.patientId) {
-      patient = await ctx.db.get(caseData.patientId);
-    }
-    for (const document of documents) {
-      const documentUrl = await ctx.storage.getUrl(
-        document.storageId as string
-      );
-      if (!documentUrl) {
-        throw new Error('Could not get document URL from storage');
-      }
-      document.fileUrl = documentUrl;
-    }
-    return {
-      ...caseData,
-      patient,
-      documents,
-      activityLogs,
-    };
+// Get many cases with their documents in one round-trip (batch processing)
+export const getCasesWithDocuments = query({
+  args: {
+    caseIds: v.array(v.id('cases')),
+  },
+  handler: async (ctx, args) => {
+    const cases = await Promise.all(
+      args.caseIds.map((caseId) => loadCaseWithDocuments(ctx, caseId))
+    );
+    return cases.filter((caseData) => caseData !== null);
   },
 });
 
@@ -273,6 +293,17 @@ export const scheduleDocumentProcessing = mutation({
     if (!documents) {
       throw new Error('Documents not found');
     }
+    // In worker mode the Python worker pulls queued documents itself. Queue
+    // them only now that all of the case's documents are uploaded, so the
+    // worker never claims part of a case.
+    if (process.env.DOCUMENT_PROCESSING_MODE === 'worker') {
+      for (const document of documents) {
+        if (document.status === 'uploaded') {
+          await ctx.db.patch(document._id, { status: 'queued' });
+        }
+      }
+      return;
+    }
     await ctx.scheduler.runAfter(
       0,
       api.processDocumentDirect.processDocumentDirectly,
@@ -312,6 +343,35 @@ export const getCaseRuleChecks = query({
   },
 });
 
+// Historical outcomes of rules by title: how often each was evaluated and
+// how often it denied, over its most recent checks
+export const getRuleOutcomeStats = query({
+  args: {
+    ruleTitles: v.array(v.string()),
+    window: v.optional(v.number()),
+  },
+  handler: async (ctx, args) => {
+    const window = args.window ?? 200;
+    return await Promise.all(
+      args.ruleTitles.map(async (ruleTitle) => {
+        const checks = await ctx.db
+          .query('ruleChecks')
+          .withIndex('by_rule_title', (q) => q.eq('ruleTitle', ruleTitle))
+          .order('desc')
+          .take(window);
+        const evaluated = checks.filter((check) =>
+          ['valid', 'needs_more_information', 'deny'].includes(check.status)
+        );
+        return {
+          ruleTitle,
+          evaluated: evaluated.length,
+          denied: evaluated.filter((check) => check.status === 'deny').length,
+        };
+      })
+    );
+  },
+});
+
 // Update rule check with processing results
 export const updateRuleCheck = mutation({
   args: {
@@ -361,6 +421,61 @@ export const updateRuleCheck = mutation({
   },
 });
 
+// Update many rule checks of a case with processing results in one mutation.
+// Unknown rule titles are reported back instead of failing the whole batch.
+export const updateRuleChecks = mutation({
+  args: {
+    caseId: v.id('cases'),
+    results: v.array(
+      v.object({
+        ruleTitle: v.string(),
+        status: v.string(),
+        reasoning: v.string(),
+        requiredAdditionalInfo: v.optional(v.array(v.string())),
+      })
+    ),
+  },
+  handler: async (ctx, args) => {
+    const now = new Date().toISOString();
+    const ruleChecks = await ctx.db
+      .query('ruleChecks')
+      .withIndex('by_case', (q) => q.eq('caseId', args.caseId))
+      .collect();
+    const ruleChecksByTitle = new Map(
+      ruleChecks.map((check) => [check.ruleTitle, check])
+    );
+
+    const updated = [];
+    const missing = [];
+    for (const result of args.results) {
+      const ruleCheckToUpdate = ruleChecksByTitle.get(result.ruleTitle);
+      if (!ruleCheckToUpdate) {
+        missing.push(result.ruleTitle);
+        continue;
+      }
+
+      await ctx.db.patch(ruleCheckToUpdate._id, {
+        status: result.status,
+        reasoning: result.reasoning,
+        requiredAdditionalInfo: result.requiredAdditionalInfo || [],
+        processedAt: now,
+        updatedAt: now,
+      });
+
+      await ctx.db.insert('activityLogs', {
+        caseId: args.caseId,
+        action: 'rule_processed',
+        details: `Rule "${result.ruleTitle}" processed with status: ${result.status}`,
+        performedBy: 'ai_agent',
+        timestamp: now,
+      });
+      updated.push(ruleCheckToUpdate._id);
+    }
+
+    return { updated, missing };
+  },
+});
+
 // Remove rule check from a case
 export const removeRuleCheck = mutation({
   args: {
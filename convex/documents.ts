@@ -0,0 +1,180 @@
+import { v } from 'convex/values';
+
+import type { Doc } from './_generated/dataModel';
+import { mutation } from './_generated/server';
+import type { MutationCtx } from './_generated/server';
+
+// Claim documents for a worker: queued documents first, then documents whose
+// worker's lease expired. Documents are queued by cases.scheduleDocumentProcessing
+// once all of a case's uploads are in; documents left "uploaded" (e.g. from
+// before worker mode was enabled) are never claimed. A claim takes the claimable
+// documents of each case it touches together, so a case is never split across
+// claims and processed twice; `limit` bounds the documents picked before that.
+// Claimed documents move to "processing" under a lease; a document that keeps
+// losing its lease is marked failed after `maxAttempts` claims. Mutations are
+// transactional, so two workers never claim the same document.
+export const claimDocuments = mutation({
+  args: {
+    workerId: v.string(),
+    limit: v.number(),
+    leaseMs: v.number(),
+    maxAttempts: v.optional(v.number()),
+  },
+  handler: async (ctx, args) => {
+    const now = Date.now();
+    const maxAttempts = args.maxAttempts ?? 3;
+    const reclaimable = (document: Doc<'documents'>) =>
+      document.status === 'processing' &&
+      document.leaseExpiresAt !== undefined &&
+      document.leaseExpiresAt <= now &&
+      (document.attempts ?? 0) < maxAttempts;
+
+    const queued = await ctx.db
+      .query('documents')
+      .withIndex('by_status', (q) => q.eq('status', 'queued'))
+      .take(args.limit);
+
+    const candidates = [...queued];
+    if (candidates.length < args.limit) {
+      const processing = await ctx.db
+        .query('documents')
+        .withIndex('by_status', (q) => q.eq('status', 'processing'))
+        .collect();
+      for (const document of processing) {
+        if (candidates.length >= args.limit) break;
+        if (document.leaseExpiresAt === undefined || document.leaseExpiresAt > now) continue;
+        if ((document.attempts ?? 0) >= maxAttempts) {
+          await ctx.db.patch(document._id, {
+            status: 'failed',
+            error: `Lease expired ${document.attempts} times`,
+            leaseOwner: undefined,
+            leaseExpiresAt: undefined,
+          });
+          continue;
+        }
+        candidates.push(document);
+      }
+    }
+
+    const picked = new Set(candidates.map((document) => document._id));
+    for (const caseId of new Set(candidates.map((document) => document.caseId))) {
+      const siblings = await ctx.db
+        .query('documents')
+        .withIndex('by_case', (q) => q.eq('caseId', caseId))
+        .collect();
+      for (const document of siblings) {
+        if (picked.has(document._id)) continue;
+        if (document.status === 'queued' || reclaimable(document)) {
+          candidates.push(document);
+          picked.add(document._id);
+        }
+      }
+    }
+
+    const claimed = [];
+    for (const document of candidates) {
+      const attempts = (document.attempts ?? 0) + 1;
+      await ctx.db.patch(document._id, {
+        status: 'processing',
+        leaseOwner: args.workerId,
+        leaseExpiresAt: now + args.leaseMs,
+        attempts,
+      });
+      claimed.push({ ...document, status: 'processing', attempts });
+    }
+    return claimed;
+  },
+});
+
+// Extend the leases a worker still holds, so a long-running case keeps its
+// documents. Returns the ids of the documents whose lease was extended.
+export const renewLeases = mutation({
+  args: {
+    documentIds: v.array(v.id('documents')),
+    workerId: v.string(),
+    leaseMs: v.number(),
+  },
+  handler: async (ctx, args) => {
+    const leaseExpiresAt = Date.now() + args.leaseMs;
+    const renewed = [];
+    for (const documentId of args.documentIds) {
+      const document = await ctx.db.get(documentId);
+      if (!document || document.status !== 'processing' || document.leaseOwner !== args.workerId) {
+        continue;
+      }
+      await ctx.db.patch(documentId, { leaseExpiresAt });
+      renewed.push(documentId);
+    }
+    return renewed;
+  },
+});
+
+// Record the outcome of a claimed document. Ignored (returns false) if the
+// worker no longer holds the lease, e.g. it expired and another worker took over.
+// "skipped" documents were claimed with their case but not read by the pipeline;
+// `error` then says why.
+export const completeDocument = mutation({
+  args: {
+    documentId: v.id('documents'),
+    workerId: v.string(),
+    status: v.union(v.literal('processed'), v.literal('failed'), v.literal('skipped')),
+    error: v.optional(v.string()),
+  },
+  handler: async (ctx, args) => {
+    const document = await ctx.db.get(args.documentId);
+    if (!document || document.leaseOwner !== args.workerId) {
+      return false;
+    }
+    await recordOutcome(ctx, document, args.status, args.error);
+    return true;
+  },
+});
+
+// Record the outcome of a case pushed to /api/process-pdf (see
+// processDocumentDirect.ts) on its unclaimed documents, like the worker does:
+// the pipeline reads the case's first document, so that one is processed (or
+// failed with `error`) and the others are skipped.
+export const completeCaseDocuments = mutation({
+  args: {
+    caseId: v.id('cases'),
+    error: v.optional(v.string()),
+  },
+  handler: async (ctx, args) => {
+    const documents = await ctx.db
+      .query('documents')
+      .withIndex('by_case', (q) => q.eq('caseId', args.caseId))
+      .collect();
+    for (const [index, document] of documents.entries()) {
+      if (document.status !== 'uploaded' && document.status !== 'queued') continue;
+      if (index === 0) {
+        await recordOutcome(ctx, document, args.error ? 'failed' : 'processed', args.error);
+      } else {
+        await recordOutcome(ctx, document, 'skipped', "Only the case's first document is processed");
+      }
+    }
+  },
+});
+
+async function recordOutcome(
+  ctx: MutationCtx,
+  document: Doc<'documents'>,
+  status: 'processed' | 'failed' | 'skipped',
+  error?: string
+) {
+  await ctx.db.patch(document._id, {
+    status,
+    error,
+    leaseOwner: undefined,
+    leaseExpiresAt: undefined,
+    processedAt: new Date().toISOString(),
+  });
+  await ctx.db.insert('activityLogs', {
+    caseId: document.caseId,
+    action: `document_${status}`,
+    details: error
+      ? `Document ${document.fileName} ${status}: ${error}`
+      : `Document processed: ${document.fileName}`,
+    performedBy: 'system',
+    timestamp: new Date().toISOString(),
+  });
+}
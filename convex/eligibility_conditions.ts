@@ -0,0 +1,58 @@
+import { v } from 'convex/values';
+
+import { mutation, query } from './_generated/server';
+
+// Get the conditions derived from a procedure's policy text, if that exact
+// policy version has been analysed before
+export const getConditions = query({
+  args: {
+    procedureId: v.id('procedures'),
+    policyHash: v.string(),
+  },
+  handler: async (ctx, args) => {
+    return await ctx.db
+      .query('eligibilityConditions')
+      .withIndex('by_procedure_policy', (q) =>
+        q.eq('procedureId', args.procedureId).eq('policyHash', args.policyHash)
+      )
+      .first();
+  },
+});
+
+// Store (or replace) the conditions derived from a procedure's policy text
+export const saveConditions = mutation({
+  args: {
+    procedureId: v.id('procedures'),
+    policyHash: v.string(),
+    isEligible: v.boolean(),
+    conditions: v.array(
+      v.object({
+        condition: v.string(),
+        description: v.string(),
+      })
+    ),
+  },
+  handler: async (ctx, args) => {
+    const now = new Date().toISOString();
+    const existing = await ctx.db
+      .query('eligibilityConditions')
+      .withIndex('by_procedure_policy', (q) =>
+        q.eq('procedureId', args.procedureId).eq('policyHash', args.policyHash)
+      )
+      .first();
+
+    if (existing) {
+      await ctx.db.patch(existing._id, {
+        isEligible: args.isEligible,
+        conditions: args.conditions,
+        updatedAt: now,
+      });
+      return existing._id;
+    }
+    return await ctx.db.insert('eligibilityConditions', {
+      ...args,
+      createdAt: now,
+      updatedAt: now,
+    });
+  },
+});
@@ -82,6 +82,43 @@ export const findPatientByMRN = query({
   },
 });
 
+// Patients updated after the cursor (`since`, `afterCreationTime`), oldest
+// first, for incrementally syncing the Python-side patient matching index.
+// Patients are ordered by (updatedAt, _creationTime), the by_updated index
+// order, so a page boundary inside a run of equal updatedAt values neither
+// skips nor repeats patients. Without `afterCreationTime`, patients updated
+// at `since` itself are included.
+export const getPatientsUpdatedSince = query({
+  args: {
+    since: v.string(),
+    afterCreationTime: v.optional(v.number()),
+    limit: v.number(),
+  },
+  handler: async (ctx, args) => {
+    const afterCreationTime = args.afterCreationTime;
+    if (afterCreationTime === undefined) {
+      return await ctx.db
+        .query('patients')
+        .withIndex('by_updated', (q) => q.gte('updatedAt', args.since))
+        .order('asc')
+        .take(args.limit);
+    }
+    const tied = await ctx.db
+      .query('patients')
+      .withIndex('by_updated', (q) =>
+        q.eq('updatedAt', args.since).gt('_creationTime', afterCreationTime)
+      )
+      .order('asc')
+      .take(args.limit);
+    const later = await ctx.db
+      .query('patients')
+      .withIndex('by_updated', (q) => q.gt('updatedAt', args.since))
+      .order('asc')
+      .take(args.limit - tied.length);
+    return [...tied, ...later];
+  },
+});
+
 // Search patients by name (fuzzy search)
 export const searchPatientsByName = query({
   args: {
@@ -0,0 +1,75 @@
+import { v } from 'convex/values';
+
+import { mutation, query } from './_generated/server';
+
+// Get the stored classification for a procedure signature, with its
+// specialty, treatment type and procedure. Returns null if any of them
+// has since been deleted.
+export const getBySignature = query({
+  args: { signature: v.string() },
+  handler: async (ctx, args) => {
+    const entry = await ctx.db
+      .query('procedureSignatures')
+      .withIndex('by_signature', (q) => q.eq('signature', args.signature))
+      .first();
+    if (!entry) return null;
+
+    const [specialty, treatmentType, procedure] = await Promise.all([
+      ctx.db.get(entry.specialtyId),
+      ctx.db.get(entry.treatmentTypeId),
+      ctx.db.get(entry.procedureId),
+    ]);
+    if (!specialty || !treatmentType || !procedure) return null;
+
+    return { ...entry, specialty, treatmentType, procedure };
+  },
+});
+
+// Record the outcome of an AI classification for a procedure signature
+export const recordClassification = mutation({
+  args: {
+    signature: v.string(),
+    procedureName: v.string(),
+    specialtyId: v.id('specialties'),
+    treatmentTypeId: v.id('treatmentTypes'),
+    procedureId: v.id('procedures'),
+  },
+  handler: async (ctx, args) => {
+    const now = new Date().toISOString();
+    const entry = await ctx.db
+      .query('procedureSignatures')
+      .withIndex('by_signature', (q) => q.eq('signature', args.signature))
+      .first();
+
+    if (!entry) {
+      return await ctx.db.insert('procedureSignatures', {
+        ...args,
+        hits: 1,
+        conflicts: 0,
+        createdAt: now,
+        updatedAt: now,
+      });
+    }
+
+    const agrees =
+      entry.procedureId === args.procedureId &&
+      entry.procedureName === args.procedureName;
+    if (agrees) {
+      await ctx.db.patch(entry._id, { hits: entry.hits + 1, updatedAt: now });
+    } else if (entry.conflicts + 1 > entry.hits) {
+      // The newer classification now outweighs the stored one: replace it
+      await ctx.db.patch(entry._id, {
+        ...args,
+        hits: 1,
+        conflicts: 0,
+        updatedAt: now,
+      });
+    } else {
+      await ctx.db.patch(entry._id, {
+        conflicts: entry.conflicts + 1,
+        updatedAt: now,
+      });
+    }
+    return entry._id;
+  },
+});
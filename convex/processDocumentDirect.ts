@@ -46,11 +46,19 @@ export const processDocumentDirectly = action({
   handler: async (ctx, args) => {
     try {
       await extractPatientFromPDF(args.caseId);
-      return '';
     } catch (error) {
       console.error('Direct document processing failed:', error);
+      await ctx.runMutation(api.documents.completeCaseDocuments, {
+        caseId: args.caseId,
+        error: error instanceof Error ? error.message : String(error),
+      });
 
       throw error;
     }
+    // Record the outcome on the documents, as the worker does
+    await ctx.runMutation(api.documents.completeCaseDocuments, {
+      caseId: args.caseId,
+    });
+    return '';
   },
 });
@@ -28,7 +28,8 @@ export default defineSchema({
     .index('by_email', ['email'])
     .index('by_phone', ['phone'])
     .index('by_name', ['name'])
-    .index('by_created', ['createdAt']),
+    .index('by_created', ['createdAt'])
+    .index('by_updated', ['updatedAt']),
 
   cases: defineTable({
     // Basic case information
@@ -65,7 +66,14 @@ export default defineSchema({
     fileSize: v.number(),
     uploadedAt: v.string(),
     extractedData: v.optional(v.any()), // JSON data extracted from document
-    status: v.string(), // uploaded, processing, processed, failed
+    status: v.string(), // uploaded, queued, processing, processed, failed, skipped
+
+    // Worker lease (pull-based processing, see documents.ts)
+    leaseOwner: v.optional(v.string()), // id of the worker processing the document
+    leaseExpiresAt: v.optional(v.number()), // ms since epoch; an expired lease can be reclaimed
+    attempts: v.optional(v.number()), // times the document has been claimed
+    error: v.optional(v.string()), // last processing error
+    processedAt: v.optional(v.string()),
   })
     .index('by_case', ['caseId'])
     .index('by_status', ['status']),
@@ -162,6 +170,36 @@ export default defineSchema({
     .index('by_treatment_type', ['treatmentTypeId'])
     .index('by_procedure', ['procedureId']),
 
+  // Procedure signatures - remembers how referrals carrying the same
+  // procedure codes were classified so repeat referrals can skip the LLM
+  procedureSignatures: defineTable({
+    signature: v.string(), // normalized CPT/HCPCS codes, e.g. "proc:66170,66180"
+    procedureName: v.string(), // normalized procedure name from the last AI classification
+    specialtyId: v.id('specialties'),
+    treatmentTypeId: v.id('treatmentTypes'),
+    procedureId: v.id('procedures'),
+    hits: v.number(), // classifications that agreed with the stored one
+    conflicts: v.number(), // classifications that disagreed
+    createdAt: v.string(),
+    updatedAt: v.string(),
+  }).index('by_signature', ['signature']),
+
+  // Eligibility conditions derived from a procedure's policy text, cached so
+  // the policy is analysed once per (procedure, policy version), not per case
+  eligibilityConditions: defineTable({
+    procedureId: v.id('procedures'),
+    policyHash: v.string(), // sha256 of the policy text the conditions came from
+    isEligible: v.boolean(), // whether the policy covers the procedure at all
+    conditions: v.array(
+      v.object({
+        condition: v.string(),
+        description: v.string(),
+      })
+    ),
+    createdAt: v.string(),
+    updatedAt: v.string(),
+  }).index('by_procedure_policy', ['procedureId', 'policyHash']),
+
   // Rule Checks - tracks the status of each rule for a case (stores rule copy, not reference)
   ruleChecks: defineTable({
     caseId: v.id('cases'),
@@ -172,7 +210,7 @@ export default defineSchema({
     originalRuleId: v.optional(v.id('rules')), // Reference to original rule for audit purposes
 
     // Processing results
-    status: v.string(), // "pending", "valid", "needs_more_information", "deny"
+    status: v.string(), // "pending", "valid", "needs_more_information", "deny", "not_evaluated"
     notes: v.optional(v.string()), // Additional notes about why the rule passed/failed
     reasoning: v.optional(v.string()), // Detailed reasoning from AI processing
     requiredAdditionalInfo: v.optional(v.array(v.string())), // List of additional info needed
@@ -46,6 +46,8 @@ function getBadgeClass(status: string): string {
       return 'bg-red-500 text-white border-red-500';
     case 'pending':
       return 'bg-blue-500 text-white border-blue-500 animate-pulse';
+    case 'not_evaluated':
+      return 'bg-gray-400 text-white border-gray-400';
     default:
       return '';
   }
@@ -0,0 +1,13 @@
+import pytest
+
+from api.convex_client import set_convex_client
+from api.local_convex import InMemoryConvex
+
+
+@pytest.fixture
+def convex():
+    """An in-memory Convex installed as `convex_client` for the test."""
+    client = InMemoryConvex()
+    set_convex_client(client)
+    yield client
+    set_convex_client(None)
@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from agents import Agent, Runner
+from pydantic import BaseModel
+
+from api.agent_cassette import Cassette, CassetteConfig, CassetteMissError, cassette_key
+
+
+class Answer(BaseModel):
+    value: int
+
+
+agent = Agent(name="Test Agent", instructions="Answer.", output_type=Answer, model="gpt-5-mini")
+
+
+def test_key_changes_with_input_and_instructions():
+    key = cassette_key(agent, "a")
+    assert key == cassette_key(agent, "a")
+    assert key != cassette_key(agent, "b")
+    assert key != cassette_key(agent.clone(instructions="Answer briefly."), "a")
+
+
+def test_recording_is_replayed(tmp_path, monkeypatch):
+    calls = []
+
+    async def run(agent, input):
+        calls.append(input)
+        return SimpleNamespace(final_output=Answer(value=42))
+
+    monkeypatch.setattr(Runner, "run", run)
+    recorder = Cassette(CassetteConfig(mode="record", directory=str(tmp_path)))
+    asyncio.run(recorder.run(agent, "question"))
+    assert recorder.recorded == 1
+
+    player = Cassette(CassetteConfig(mode="replay", directory=str(tmp_path), latency=0))
+    result = asyncio.run(player.run(agent, "question"))
+    assert result.final_output == Answer(value=42)
+    assert calls == ["question"]
+    assert player.stats()["hits"] == 1
+
+
+def test_replay_miss_raises(tmp_path):
+    player = Cassette(CassetteConfig(mode="replay", directory=str(tmp_path), latency=0))
+    with pytest.raises(CassetteMissError):
+        asyncio.run(player.run(agent, "never recorded"))
+    assert player.misses == 1
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("TAXO_CASSETTE_MODE", "replay-ish")
+    with pytest.raises(ValueError):
+        CassetteConfig.from_env()
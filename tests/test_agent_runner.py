@@ -0,0 +1,113 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import api.agent_runner as agent_runner
+from api.agent_runner import BREAKER_FAILURE_THRESHOLD, CircuitBreaker, CircuitOpenError, run_agent
+
+
+def _agent(name):
+    return SimpleNamespace(name=name, model=f"model-{name}")
+
+
+def _open(breaker, model="m"):
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(model)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker()
+    _open(breaker)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("m")
+
+
+def test_half_open_lets_a_single_trial_through(monkeypatch):
+    breaker = CircuitBreaker()
+    _open(breaker)
+    breaker.opened_at -= agent_runner.BREAKER_COOLDOWN
+    assert breaker.before_call("m") is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("m")
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.before_call("m") is False
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker()
+    _open(breaker)
+    breaker.opened_at -= agent_runner.BREAKER_COOLDOWN
+    assert breaker.before_call("m")
+    breaker.record_failure("m")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("m")
+
+
+def test_trial_without_verdict_frees_the_slot(monkeypatch):
+    agent = _agent("cancelled-trial")
+    breaker = agent_runner._breakers.setdefault(agent.model, CircuitBreaker())
+    _open(breaker, agent.model)
+    breaker.opened_at -= agent_runner.BREAKER_COOLDOWN
+
+    async def slow(agent, input):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(agent_runner, "_run_once", slow)
+
+    async def main():
+        call = asyncio.ensure_future(run_agent(agent, "x"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(CircuitOpenError):
+            await run_agent(agent, "y")
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+
+    asyncio.run(main())
+    assert not breaker.trial_in_flight
+    assert breaker.before_call(agent.model)
+
+
+def test_losing_primary_is_cancelled_and_censored(monkeypatch):
+    agent = _agent("hedged")
+    stats = agent_runner._stats.setdefault(agent.name, agent_runner.AgentStats())
+    stats.primary_latencies.extend([0.01] * agent_runner.HEDGE_MIN_SAMPLES)
+    attempts, cancelled = [], []
+
+    async def run_once(agent, input):
+        attempts.append(input)
+        number = len(attempts)
+        try:
+            await asyncio.sleep(0.2 if number == 1 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return number
+
+    monkeypatch.setattr(agent_runner, "_run_once", run_once)
+
+    async def main():
+        started = time.perf_counter()
+        result = await run_agent(agent, "x", timeout=5)
+        caller_latency = time.perf_counter() - started
+        await asyncio.sleep(0)
+        return result, caller_latency
+
+    result, caller_latency = asyncio.run(main())
+    assert result == 2
+    assert cancelled == [1]
+    assert stats.hedges_won == 1 and stats.primary_censored == 1
+    assert caller_latency < 0.15
+    assert stats.primary_latencies[-1] < 0.15
+
+
+def test_hedge_delay_follows_first_attempts_not_hedged_latencies():
+    stats = agent_runner.AgentStats()
+    stats.latencies.extend([0.01] * agent_runner.HEDGE_MIN_SAMPLES)
+    assert stats.hedge_delay() is None
+
+    stats.primary_latencies.extend([1.0] * agent_runner.HEDGE_MIN_SAMPLES)
+    assert stats.hedge_delay() == 1.0
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+
+from api import index
+from api.case_context import load_cases
+from api.index import BatchRequest, _process_batch
+
+
+def reject_invalid_ids(convex, monkeypatch):
+    """Make getCasesWithDocuments fail on a malformed id, like argument validation in Convex."""
+    query = convex.query
+
+    def strict_query(name, args=None):
+        if name == "cases:getCasesWithDocuments" and any(not case_id.startswith("cases:") for case_id in args["caseIds"]):
+            raise ValueError("invalid id")
+        return query(name, args)
+
+    monkeypatch.setattr(convex, "query", strict_query)
+
+
+def test_load_cases_chunks_and_isolates_invalid_ids(convex, monkeypatch):
+    reject_invalid_ids(convex, monkeypatch)
+    case_ids = [convex.add_case([f"http://docs/{number}.pdf"]) for number in range(5)]
+    empty = convex.add_case([])
+    queried = []
+    query = convex.query
+    monkeypatch.setattr(convex, "query", lambda name, args=None: queried.append(args) or query(name, args))
+
+    cases, errors = asyncio.run(load_cases(case_ids + ["bogus", empty, "cases:999"], chunk_size=2))
+
+    assert set(cases) == set(case_ids)
+    assert set(errors) == {"bogus", empty, "cases:999"}
+    assert errors["bogus"] == "invalid id"
+    assert errors[empty] == "Case or documents not found"
+    assert max(len(args["caseIds"]) for args in queried) <= 2
+
+
+def test_batch_reports_unloadable_cases_per_case(convex, monkeypatch):
+    reject_invalid_ids(convex, monkeypatch)
+    case_id = convex.add_case(["http://docs/a.pdf"])
+    processed = []
+
+    async def fake_process_pdf(context, emit=None):
+        processed.append(context.case_id)
+
+    monkeypatch.setattr(index, "_process_pdf", fake_process_pdf)
+    monkeypatch.setattr("api.taxo_agents.classify_agent.load_taxonomy", lambda: {})
+
+    async def run():
+        return [json.loads(line) async for line in _process_batch(BatchRequest(case_ids=[case_id, "bogus"]))]
+
+    rows = {row["case_id"]: row for row in asyncio.run(run())}
+    assert rows[case_id]["status"] == "processed"
+    assert rows["bogus"] == {"case_id": "bogus", "status": "failed", "error": "invalid id"}
+    assert processed == [case_id]
+
+
+def test_disconnect_does_not_wait_for_running_conversions(convex, monkeypatch):
+    case_ids = [convex.add_case([f"http://docs/{number}.pdf"]) for number in range(2)]
+
+    async def fake_process_pdf(context, emit=None):
+        if context.case_id == case_ids[0]:
+            return
+        # A conversion that keeps its executor thread busy
+        await asyncio.get_running_loop().run_in_executor(context.executor, time.sleep, 1)
+
+    monkeypatch.setattr(index, "_process_pdf", fake_process_pdf)
+    monkeypatch.setattr("api.taxo_agents.classify_agent.load_taxonomy", lambda: {})
+
+    async def disconnect_after_first_line():
+        lines = _process_batch(BatchRequest(case_ids=case_ids))
+        first = json.loads(await lines.__anext__())
+        started = time.perf_counter()
+        await lines.aclose()
+        return first, time.perf_counter() - started
+
+    first, closing = asyncio.run(disconnect_after_first_line())
+    assert first["case_id"] == case_ids[0]
+    assert closing < 0.5
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from api import index
+from api.case_context import CaseContext
+from api.index import _process_rules
+from api.taxo_agents.rule_processor_agent import RuleProcessingOutput, RuleStatus
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    calls = []
+
+    async def fake_get_file_as_string(url, session=None, executor=None):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return "# Referral"
+
+    monkeypatch.setattr("api.taxo_agents.struture_agent.get_file_as_string", fake_get_file_as_string)
+    return calls
+
+
+def test_file_content_is_converted_once_per_context(convex, conversions):
+    context = CaseContext(convex.add_case(["http://docs/a.pdf"]))
+
+    async def main():
+        return await asyncio.gather(*[context.get_file_content() for _ in range(3)])
+
+    assert asyncio.run(main()) == ["# Referral"] * 3
+    assert conversions == ["http://docs/a.pdf"]
+
+
+def test_case_and_rule_checks_are_fetched_once(convex, monkeypatch):
+    case_id = convex.add_case(["http://docs/a.pdf"])
+    queries = []
+    query = convex.query
+    monkeypatch.setattr(convex, "query", lambda name, args=None: queries.append(name) or query(name, args))
+    context = CaseContext(case_id)
+    context.get_case(), context.get_case(), context.get_rule_checks(), context.get_rule_checks()
+    assert queries == ["cases:getCaseWithDocuments", "cases:getCaseRuleChecks"]
+
+
+def test_process_rules_emits_document_converted_once(convex, conversions, monkeypatch):
+    case_id = convex.add_case(["http://docs/a.pdf"])
+    convex.insert("ruleChecks", {"caseId": case_id, "ruleTitle": "r", "ruleDescription": "d", "status": "pending"})
+
+    async def fake_process_rule(file_content, case_id, rule_check, writer=None, precomputed=None):
+        output = RuleProcessingOutput(status=RuleStatus.VALID, reasoning="ok", required_additional_info=[])
+        writer.add(rule_check["ruleTitle"], output)
+        return output
+
+    monkeypatch.setattr(index, "process_rule", fake_process_rule)
+    events = []
+    context = CaseContext(case_id, short_circuit=False)
+
+    async def main():
+        emit = lambda event, data: events.append(event)
+        await _process_rules(context, emit=emit)
+        await _process_rules(context, emit=emit)
+
+    asyncio.run(main())
+    assert events == ["document_converted", "rule_result", "rule_result"]
+
+
+def test_process_rules_queries_convex_off_the_loop(convex, conversions, monkeypatch):
+    case_id = convex.add_case(["http://docs/a.pdf"])
+    for title in ("a", "b"):
+        convex.insert("ruleChecks", {"caseId": case_id, "ruleTitle": title, "ruleDescription": "d", "status": "pending"})
+
+    async def fake_process_rule(file_content, case_id, rule_check, writer=None, precomputed=None):
+        return RuleProcessingOutput(status=RuleStatus.VALID, reasoning="ok", required_additional_info=[])
+
+    monkeypatch.setattr(index, "process_rule", fake_process_rule)
+    threads = {}
+    query = convex.query
+
+    def recording_query(name, args=None):
+        threads[name] = threading.get_ident()
+        return query(name, args)
+
+    monkeypatch.setattr(convex, "query", recording_query)
+
+    async def main():
+        await _process_rules(CaseContext(case_id, short_circuit=True))
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert {"cases:getCaseRuleChecks", "cases:getRuleOutcomeStats"} <= set(threads)
+    assert [name for name, thread in threads.items() if thread == loop_thread] == []
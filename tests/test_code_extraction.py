@@ -0,0 +1,71 @@
+from api.classification_cache import lookup_classification, record_classification
+from api.code_extraction import ExtractedCodes, extract_codes, normalize_icd10, procedure_signature
+
+REFERRAL = """
+Patient: Jane Doe, 123 Main St, Springfield 62704. Phone 555-201-7788.
+Member ID 98765.
+
+CPT: 66984, 0191T
+HCPCS: J3490
+
+Diagnosis codes:
+- H25.11 age-related nuclear cataract
+- ICD-10 H4011X1
+
+History of E11.9 noted by PCP.
+"""
+
+
+def test_extract_codes_reads_labelled_codes_only():
+    codes = extract_codes(REFERRAL)
+    assert codes.cpt == ["0191T", "66984"]
+    assert codes.hcpcs == ["J3490"]
+    assert codes.icd10 == ["E11.9", "H25.11", "H40.11X1"]
+
+
+def test_bare_numbers_without_a_label_are_not_cpt_codes():
+    codes = extract_codes("ZIP 62704, member 98765, fax 27447")
+    assert codes.is_empty()
+
+
+def test_normalize_icd10_adds_the_dot():
+    assert normalize_icd10("h4011x1") == "H40.11X1"
+    assert normalize_icd10("E11") == "E11"
+
+
+def test_signature_uses_procedure_codes_only():
+    codes = ExtractedCodes(cpt=["66984"], hcpcs=["J3490"], icd10=["H25.11"])
+    assert procedure_signature(codes) == "proc:66984,J3490"
+    assert procedure_signature(codes.model_copy(update={"icd10": ["Z00.0"]})) == "proc:66984,J3490"
+    assert procedure_signature(ExtractedCodes(icd10=["H25.11"])) is None
+
+
+def _taxonomy(convex):
+    specialty = convex.insert("specialties", {"name": "Ophthalmology"})
+    treatment = convex.insert("treatmentTypes", {"name": "Surgery", "specialtyId": specialty})
+    procedure = convex.insert("procedures", {"name": "Cataract surgery", "treatmentTypeId": treatment})
+    return specialty, treatment, procedure
+
+
+def test_signature_is_trusted_after_enough_agreeing_classifications(convex):
+    specialty, treatment, procedure = _taxonomy(convex)
+    codes = ExtractedCodes(cpt=["66984"])
+
+    record_classification(codes, "Cataract Surgery", specialty, treatment, procedure)
+    assert lookup_classification(codes) is None  # one hit is not enough
+
+    record_classification(codes, "cataract surgery!", specialty, treatment, procedure)
+    entry = lookup_classification(codes)
+    assert entry["procedureId"] == procedure
+    assert entry["confidence"] == 1.0
+    assert entry["procedure"]["name"] == "Cataract surgery"
+
+
+def test_conflicting_classifications_lower_confidence(convex):
+    specialty, treatment, procedure = _taxonomy(convex)
+    other = convex.insert("procedures", {"name": "Phaco", "treatmentTypeId": treatment})
+    codes = ExtractedCodes(cpt=["66984"])
+    for _ in range(3):
+        record_classification(codes, "Cataract surgery", specialty, treatment, procedure)
+    record_classification(codes, "Phaco", specialty, treatment, other)
+    assert lookup_classification(codes) is None  # 3 / (3 + 1) < 0.9
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+from api import convex_client as convex_module
+from api.convex_client import convex_client, set_convex_client
+
+HEAVY_MODULES = ("agents", "convex", "pymupdf4llm", "pymupdf")
+
+
+def test_importing_the_app_does_not_load_heavy_dependencies():
+    script = (
+        "import sys, api.index; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_health_answers_without_touching_convex(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from api.index import app
+
+    def fail():
+        raise AssertionError("Convex client built")
+
+    monkeypatch.setattr(convex_module, "get_convex_client", fail)
+    response = TestClient(app).get("/api/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_convex_proxy_routes_to_the_override():
+    class Fake:
+        def query(self, name, args=None):
+            return name
+
+    set_convex_client(Fake())
+    try:
+        assert convex_client.query("cases:getCase") == "cases:getCase"
+    finally:
+        set_convex_client(None)
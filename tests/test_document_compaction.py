@@ -0,0 +1,47 @@
+from api.document_compaction import CompactionConfig, compact_markdown, compact_pages
+
+HEADER = "ACME Clinic fax 555-0100  received 2024-01-0{page} 10:1{page}"
+
+
+def page(number: int, body: str) -> str:
+    return f"{HEADER.format(page=number)}\n\n{body}\n\nPage {number} of 3"
+
+
+def test_repeated_headers_and_page_numbers_are_removed():
+    pages = [page(number, f"Body of page {number}.") for number in (1, 2, 3)]
+    text, report = compact_pages(pages, CompactionConfig())
+    assert text.count("ACME Clinic") == 1
+    assert "Page 2 of 3" not in text
+    assert all(f"Body of page {number}." in text for number in (1, 2, 3))
+    assert report.repeated_lines_removed == 2
+    assert report.page_number_lines_removed == 3
+
+
+def test_bare_codes_and_mrns_in_the_body_survive():
+    body = "Patient MRN:\n4482913\n\nCPT codes:\n99213\n27447\n\nPlan: proceed."
+    pages = [page(1, body), page(2, "Notes.\n12\nmore notes"), page(3, "End.")]
+    text, report = compact_pages(pages, CompactionConfig())
+    for value in ("4482913", "99213", "27447", "\n12\n"):
+        assert value in text
+    assert report.page_number_lines_removed == 3
+
+
+def test_bare_code_on_an_edge_line_is_not_a_page_number():
+    text, report = compact_markdown("CPT\n\n99213", CompactionConfig())
+    assert "99213" in text
+    assert report.page_number_lines_removed == 0
+
+
+def test_disabled_returns_the_pages_unchanged():
+    pages = ["a  b\n\n\n\n", "3"]
+    text, report = compact_pages(pages, CompactionConfig(enabled=False))
+    assert text == "".join(pages)
+    assert report.tokens_after == report.tokens_before
+
+
+def test_tables_and_whitespace_are_compacted_and_budget_applies():
+    markdown = "| a   | b   |\n|-----|:---:|\n| 1   | 2   |\n\n\n\ntext   with   spaces"
+    text, _ = compact_markdown(markdown, CompactionConfig())
+    assert text == "|a|b|\n|-|-|\n|1|2|\n\ntext with spaces"
+    text, report = compact_markdown("x" * 400, CompactionConfig(max_tokens=10))
+    assert report.truncated and text.startswith("x" * 40) and "truncated" in text
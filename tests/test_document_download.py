@@ -0,0 +1,62 @@
+import importlib
+
+import pytest
+
+structure = importlib.import_module("api.taxo_agents.struture_agent")
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, declared_size=None):
+        self.body = body
+        self.headers = {"Content-Length": str(declared_size)} if declared_size is not None else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, stream=False):
+        return self.response
+
+
+def _pdf(text: str) -> bytes:
+    import pymupdf
+
+    document = pymupdf.open()
+    document.new_page().insert_text((50, 50), text)
+    return document.tobytes()
+
+
+def test_declared_size_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(structure, "MAX_DOCUMENT_BYTES", 10)
+    with pytest.raises(structure.DocumentTooLargeError):
+        structure._download_pages("url", FakeSession(FakeResponse(b"", declared_size=11)))
+
+
+def test_streamed_size_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(structure, "MAX_DOCUMENT_BYTES", 10)
+    monkeypatch.setattr(structure, "DOWNLOAD_CHUNK_BYTES", 4)
+    with pytest.raises(structure.DocumentTooLargeError):
+        structure._download_pages("url", FakeSession(FakeResponse(b"x" * 11)))
+
+
+@pytest.mark.parametrize("spool_threshold", [1, 10**9])
+def test_pages_are_converted_from_memory_or_spool(monkeypatch, spool_threshold):
+    monkeypatch.setattr(structure, "SPOOL_THRESHOLD", spool_threshold)
+    monkeypatch.setattr(structure, "DOWNLOAD_CHUNK_BYTES", 512)
+    pages = structure._download_pages("url", FakeSession(FakeResponse(_pdf("Referral for glaucoma"))))
+    assert len(pages) == 1
+    assert "glaucoma" in pages[0]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from api import index
+from api.document_worker import DocumentWorker
+
+
+@pytest.fixture
+def stage(monkeypatch):
+    """Replace the pipeline with a stage that outlives a few leases."""
+    runs = []
+
+    async def process_pdf(context, emit=None):
+        runs.append(context.case_id)
+        await asyncio.sleep(0.1)
+        if context.case_id in failing:
+            raise RuntimeError("conversion failed")
+
+    failing = set()
+    monkeypatch.setattr(index, "_process_pdf", process_pdf)
+    return runs, failing
+
+
+def _queued_case(convex, urls):
+    """A case whose uploads are complete and queued for the worker."""
+    case_id = convex.add_case(urls)
+    convex.mutation("cases:scheduleDocumentProcessing", {"caseId": case_id})
+    return case_id
+
+
+def _statuses(convex, case_id):
+    return [document["status"] for document in convex.where("documents", caseId=case_id)]
+
+
+def test_leases_are_renewed_while_a_case_runs(convex, stage):
+    case_id = _queued_case(convex, ["http://docs/a.pdf"])
+    worker = DocumentWorker(worker_id="w1", lease_seconds=0.03)
+    stolen = []
+
+    async def main():
+        run = asyncio.ensure_future(worker.run(once=True))
+        while not stage[0]:
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.06)
+        stolen.extend(convex.mutation("documents:claimDocuments", {"workerId": "w2", "limit": 10, "leaseMs": 1000}))
+        await run
+
+    asyncio.run(main())
+    assert stolen == []
+    assert _statuses(convex, case_id) == ["processed"]
+
+
+def test_only_the_processed_document_is_completed(convex, stage):
+    case_id = _queued_case(convex, ["http://docs/a.pdf", "http://docs/b.pdf"])
+    worker = DocumentWorker(worker_id="w1")
+    asyncio.run(worker.run(once=True))
+    assert stage[0] == [case_id]
+    assert _statuses(convex, case_id) == ["processed", "skipped"]
+
+
+def test_failed_case_fails_its_document(convex, stage):
+    case_id = _queued_case(convex, ["http://docs/a.pdf"])
+    stage[1].add(case_id)
+    worker = DocumentWorker(worker_id="w1")
+    asyncio.run(worker.run(once=True))
+    assert worker.failed == 1
+    document = convex.where("documents", caseId=case_id)[0]
+    assert document["status"] == "failed" and document["error"] == "conversion failed"
+
+
+def test_documents_are_claimed_only_once_queued(convex, stage):
+    legacy = convex.add_case(["http://docs/old.pdf"])
+    worker = DocumentWorker(worker_id="w1")
+    asyncio.run(worker.run(once=True))
+    assert stage[0] == []
+    assert _statuses(convex, legacy) == ["uploaded"]
+
+
+def test_a_case_is_claimed_whole(convex):
+    case_id = _queued_case(convex, ["http://docs/a.pdf", "http://docs/b.pdf", "http://docs/c.pdf"])
+    claimed = convex.mutation("documents:claimDocuments", {"workerId": "w1", "limit": 1, "leaseMs": 1000})
+    assert [document["caseId"] for document in claimed] == [case_id] * 3
@@ -0,0 +1,94 @@
+import asyncio
+import importlib
+
+import pytest
+
+import api.eligibility as eligibility
+from api.taxo_agents.conditions import ConditionCheckOutput, Conditions
+from api.taxo_agents.condtion_status import ConditionsStatus
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    eligibility._condition_checks.clear()
+    yield
+    eligibility._condition_checks.clear()
+
+
+def _status(status):
+    return ConditionsStatus(condition="c", status=status, description="d")
+
+
+def test_policy_text_ignores_rule_order():
+    first = [{"ruleTitle": "B", "ruleDescription": "b"}, {"ruleTitle": "A", "ruleDescription": "a"}]
+    second = list(reversed(first))
+    assert eligibility.policy_text(first) == eligibility.policy_text(second) == "- A: a\n- B: b"
+    assert eligibility.policy_hash(eligibility.policy_text(first)) == eligibility.policy_hash(eligibility.policy_text(second))
+
+
+def test_eligibility_status():
+    eligible = ConditionCheckOutput(is_eligible=True, conditions=[])
+    assert eligibility.eligibility_status(eligible, [_status("met"), _status("Met")]) == eligibility.ELIGIBLE
+    assert eligibility.eligibility_status(eligible, [_status("met"), _status("not_met")]) == eligibility.NOT_ELIGIBLE
+    assert eligibility.eligibility_status(eligible, [_status("met"), _status("requires_clarification")]) == eligibility.NEEDS_REVIEW
+    assert eligibility.eligibility_status(ConditionCheckOutput(is_eligible=False, conditions=[]), []) == eligibility.NOT_ELIGIBLE
+
+
+def test_condition_check_is_analysed_once_and_stored(convex, monkeypatch):
+    calls = []
+
+    async def condition_check(procedure, policy):
+        calls.append(policy)
+        await asyncio.sleep(0.01)
+        return ConditionCheckOutput(is_eligible=True, conditions=[Conditions(condition="IOP > 21", description="d")])
+
+    monkeypatch.setattr(eligibility, "condition_check", condition_check)
+    procedure = {"_id": "procedures:1", "name": "Trabeculectomy"}
+
+    async def main():
+        return await asyncio.gather(*[eligibility.get_condition_check(procedure, "- A: a") for _ in range(3)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [cached for _, cached in results] == [False] * 3
+
+    # A fresh process finds the analysis in Convex
+    eligibility._condition_checks.clear()
+    check, cached = asyncio.run(eligibility.get_condition_check(procedure, "- A: a"))
+    assert cached and check.conditions[0].condition == "IOP > 21"
+    assert len(calls) == 1
+
+
+def test_failed_batch_needs_clarification(monkeypatch):
+    async def condition_status(referral, batch):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(eligibility, "condition_status", condition_status)
+    conditions = [Conditions(condition=f"c{number}", description="d") for number in range(3)]
+    statuses = asyncio.run(eligibility.evaluate_conditions("referral", conditions, batch_size=2))
+    assert [status.condition for status in statuses] == ["c0", "c1", "c2"]
+    assert {status.status for status in statuses} == {"requires_clarification"}
+
+
+class _BrokenContext:
+    case_id = "cases:1"
+
+    def get_classification(self):
+        raise RuntimeError("convex down")
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("TAXO_ELIGIBILITY_ENABLED", raising=False)
+    assert importlib.reload(eligibility).ENABLED is False
+    assert asyncio.run(eligibility.check_eligibility(_BrokenContext())) is None
+
+
+def test_convex_failure_marks_needs_review(convex, monkeypatch):
+    monkeypatch.setattr(eligibility, "ENABLED", True)
+    case_id = convex.insert("cases", {"status": "classified"})
+    context = _BrokenContext()
+    context.case_id = case_id
+
+    result = asyncio.run(eligibility.check_eligibility(context))
+    assert result.status == eligibility.NEEDS_REVIEW
+    assert convex.get(case_id)["eligibilityStatus"] == eligibility.NEEDS_REVIEW
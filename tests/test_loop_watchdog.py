@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import pytest
+
+from api.loop_watchdog import LagHistogram, LoopStallError, LoopWatchdog, strict_loop
+
+
+def test_lag_histogram_buckets():
+    histogram = LagHistogram()
+    for lag_ms in (0.5, 3, 3, 10_000):
+        histogram.record(lag_ms)
+    stats = histogram.to_dict()
+    assert stats["samples"] == 4
+    assert stats["max_ms"] == 10_000
+    assert stats["buckets"]["le_1ms"] == 1
+    assert stats["buckets"]["le_5ms"] == 2
+    assert stats["buckets"]["gt_5000ms"] == 1
+
+
+def test_strict_loop_fails_on_blocking_call():
+    async def blocking():
+        async with strict_loop(threshold_ms=50):
+            time.sleep(0.2)
+
+    with pytest.raises(LoopStallError):
+        asyncio.run(blocking())
+
+
+def test_strict_loop_passes_when_loop_stays_free():
+    async def free():
+        async with strict_loop(threshold_ms=50):
+            await asyncio.sleep(0.2)
+
+    asyncio.run(free())
+
+
+def test_check_judges_only_stalls_since_the_request_started():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.05, strict=True)
+
+    async def main():
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.02)
+            time.sleep(0.2)
+            await asyncio.sleep(0.05)
+            assert watchdog.stall_count >= 1
+            with pytest.raises(LoopStallError):
+                watchdog.check()
+
+            stalls_before = watchdog.stall_count
+            await asyncio.sleep(0.1)
+            watchdog.check(since=stalls_before)
+        finally:
+            watchdog.stop()
+
+    asyncio.run(main())
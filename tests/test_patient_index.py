@@ -0,0 +1,74 @@
+import pytest
+
+import api.patient_index as patient_index_module
+from api.patient_index import PatientIndex, PatientRecord, find_matching_patient
+from api.taxo_agents.patient_extractor_agent import PatientInfo
+
+
+def _patient(convex, name, dob, phone=None, updated_at=None):
+    fields = {"name": name, "phone": phone, "additionalData": [{"name": "Date of Birth", "value": dob}]}
+    if updated_at is not None:
+        fields["updatedAt"] = updated_at
+    return convex.insert("patients", fields)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = PatientIndex(refresh_interval=0)
+    monkeypatch.setattr(patient_index_module, "ENABLED", True)
+    monkeypatch.setattr(patient_index_module, "patient_index", index)
+    return index
+
+
+def test_matches_despite_typos_and_reordering():
+    index = PatientIndex()
+    index.add_patients([
+        {"_id": "patients:1", "name": "Margaret Johnson", "phone": "5550102000", "additionalData": [{"name": "Date of Birth", "value": "1950-03-04"}]},
+        {"_id": "patients:2", "name": "Margaret Johnson", "additionalData": [{"name": "Date of Birth", "value": "1962-11-30"}]},
+    ])
+    match = index.best_match(PatientRecord.from_info(PatientInfo(name="JONHSON, Margaret", date_of_birth="03/04/1950", phone="(555) 010-2000")))
+    assert match is not None and match.patient_id == "patients:1"
+
+    assert index.best_match(PatientRecord.from_info(PatientInfo(name="Margaret Johnson", date_of_birth="01/01/1970"))) is None
+
+
+def test_refresh_pages_through_patients_sharing_an_updated_at(convex, index, monkeypatch):
+    monkeypatch.setattr(patient_index_module, "PAGE_SIZE", 2)
+    for number in range(5):
+        _patient(convex, f"Patient {number}", "1950-01-01", updated_at="2026-01-01T00:00:00")
+    index.refresh(force=True)
+    assert len(index) == 5
+
+    for number in range(5, 8):
+        _patient(convex, f"Patient {number}", "1950-01-01", updated_at="2026-01-01T00:00:00")
+    index.refresh(force=True)
+    assert len(index) == 8
+
+
+def test_first_lookup_loads_in_the_background(convex, index):
+    _patient(convex, "Margaret Johnson", "1950-03-04")
+    info = PatientInfo(name="Margaret Johnson", date_of_birth="1950-03-04")
+    assert find_matching_patient(info) is None
+    index._warm_up.join()
+    assert index.synced
+    assert find_matching_patient(info) is not None
+
+
+def test_deleted_patients_are_dropped(convex, index):
+    patient_id = _patient(convex, "Margaret Johnson", "1950-03-04")
+    index.refresh(force=True)
+    del convex.tables["patients"][patient_id]
+
+    assert find_matching_patient(PatientInfo(name="Margaret Johnson", date_of_birth="1950-03-04")) is None
+    assert len(index) == 0
+
+
+def test_full_resync_drops_deleted_patients(convex, index):
+    kept = _patient(convex, "Margaret Johnson", "1950-03-04")
+    deleted = _patient(convex, "Robert Smith", "1948-07-21")
+    index.refresh(force=True)
+    del convex.tables["patients"][deleted]
+
+    index.resync_interval = 0
+    index.refresh(force=True)
+    assert set(index._records) == {kept}
@@ -0,0 +1,60 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+rpa = importlib.import_module("api.taxo_agents.rule_processor_agent")
+RuleStatus = rpa.RuleStatus
+
+
+def _scored(status, confidence):
+    return rpa.ScoredRuleProcessingOutput(status=status, reasoning="r", confidence=confidence)
+
+
+def test_empty_models_setting_falls_back_to_defaults():
+    assert rpa.parse_cascade_models("") == rpa.DEFAULT_CASCADE_MODELS
+    assert rpa.parse_cascade_models(" , ") == rpa.DEFAULT_CASCADE_MODELS
+    assert rpa.parse_cascade_models("a, b") == ["a", "b"]
+
+
+def test_should_escalate():
+    assert not rpa.should_escalate(_scored(RuleStatus.VALID, 0.9), 0.8)
+    assert rpa.should_escalate(_scored(RuleStatus.VALID, 0.5), 0.8)
+    assert rpa.should_escalate(_scored(RuleStatus.DENY, 1.0), 0.8)
+    assert rpa.should_escalate(rpa.RuleProcessingOutput(status=RuleStatus.VALID, reasoning="r"), 0.8)
+
+
+def _fake_run_agent(monkeypatch, answers):
+    calls = []
+
+    async def run_agent(agent, input):
+        calls.append(agent.model)
+        answer = answers[agent.model]
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(final_output=answer)
+
+    monkeypatch.setattr(rpa, "run_agent", run_agent)
+    return calls
+
+
+def test_confident_cheap_tier_decides(monkeypatch):
+    calls = _fake_run_agent(monkeypatch, {"cheap": _scored(RuleStatus.VALID, 0.95)})
+    output, attempts = asyncio.run(rpa.run_rule_cascade("", models=["cheap", "gpt-5-mini"], min_confidence=0.8))
+    assert output.status == RuleStatus.VALID
+    assert calls == ["cheap"] and len(attempts) == 1
+
+
+def test_uncertain_or_failed_tier_escalates(monkeypatch):
+    final = rpa.RuleProcessingOutput(status=RuleStatus.DENY, reasoning="final")
+    calls = _fake_run_agent(monkeypatch, {"cheap": _scored(RuleStatus.VALID, 0.3), "mid": RuntimeError("down"), "gpt-5-mini": final})
+    output, attempts = asyncio.run(rpa.run_rule_cascade("", models=["cheap", "mid", "gpt-5-mini"], min_confidence=0.8))
+    assert output is final
+    assert calls == ["cheap", "mid", "gpt-5-mini"] and len(attempts) == 2
+
+
+def test_final_tier_failure_raises(monkeypatch):
+    _fake_run_agent(monkeypatch, {"gpt-5-mini": RuntimeError("down")})
+    with pytest.raises(RuntimeError):
+        asyncio.run(rpa.run_rule_cascade("", models=["gpt-5-mini"]))
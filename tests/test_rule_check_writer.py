@@ -0,0 +1,86 @@
+import asyncio
+
+from api.rule_check_writer import NOT_EVALUATED, RuleCheckWriter
+from api.taxo_agents.rule_processor_agent import RuleProcessingOutput, RuleStatus
+
+
+def output(status: RuleStatus = RuleStatus.VALID) -> RuleProcessingOutput:
+    return RuleProcessingOutput(status=status, reasoning="because", required_additional_info=[])
+
+
+def case_with_rules(convex, *titles: str) -> str:
+    case_id = convex.add_case(["http://docs/a.pdf"])
+    for title in titles:
+        convex.insert("ruleChecks", {"caseId": case_id, "ruleTitle": title, "ruleDescription": "d", "status": "pending"})
+    return case_id
+
+
+def statuses(convex, case_id: str) -> dict:
+    return {check["ruleTitle"]: check["status"] for check in convex.where("ruleChecks", caseId=case_id)}
+
+
+def count_mutations(convex, monkeypatch) -> list:
+    names = []
+    mutation = convex.mutation
+    monkeypatch.setattr(convex, "mutation", lambda name, args=None: names.append(name) or mutation(name, args))
+    return names
+
+
+def test_results_are_written_in_one_mutation_on_close(convex, monkeypatch):
+    case_id = case_with_rules(convex, "a", "b", "c")
+    names = count_mutations(convex, monkeypatch)
+
+    async def main():
+        async with RuleCheckWriter(case_id, flush_interval=60) as writer:
+            writer.add("a", output())
+            writer.add("b", output(RuleStatus.DENY))
+            writer.skip("c", "already denied")
+
+    asyncio.run(main())
+    assert names == ["cases:updateRuleChecks"]
+    assert statuses(convex, case_id) == {"a": "valid", "b": "deny", "c": NOT_EVALUATED}
+
+
+def test_timer_flushes_while_the_writer_is_open(convex, monkeypatch):
+    case_id = case_with_rules(convex, "a")
+
+    async def main():
+        async with RuleCheckWriter(case_id, flush_interval=0.01) as writer:
+            writer.add("a", output())
+            await asyncio.sleep(0.05)
+            assert statuses(convex, case_id) == {"a": "valid"}
+            return writer.flushes
+
+    assert asyncio.run(main()) == 1
+
+
+def test_failed_bulk_write_falls_back_to_one_mutation_per_rule(convex, monkeypatch):
+    case_id = case_with_rules(convex, "a", "b")
+    mutation = convex.mutation
+
+    def flaky(name, args=None):
+        if name == "cases:updateRuleChecks":
+            raise ConnectionError("down")
+        return mutation(name, args)
+
+    monkeypatch.setattr(convex, "mutation", flaky)
+
+    async def main():
+        async with RuleCheckWriter(case_id, flush_interval=60) as writer:
+            writer.add("a", output())
+            writer.add("b", output(RuleStatus.NEEDS_MORE_INFO))
+
+    asyncio.run(main())
+    assert statuses(convex, case_id) == {"a": "valid", "b": "needs_more_information"}
+
+
+def test_newer_result_replaces_older_one(convex):
+    case_id = case_with_rules(convex, "a")
+
+    async def main():
+        async with RuleCheckWriter(case_id, flush_interval=60) as writer:
+            writer.add("a", output(RuleStatus.DENY))
+            writer.add("a", output())
+
+    asyncio.run(main())
+    assert statuses(convex, case_id) == {"a": "valid"}
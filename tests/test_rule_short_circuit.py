@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from api import rule_short_circuit
+from api.case_context import CaseContext
+
+
+def _check(title, description="short"):
+    return {"ruleTitle": title, "ruleDescription": description}
+
+
+def test_order_rules_by_deny_likelihood_per_rule_cost(monkeypatch):
+    likelihoods = {"often": 0.5, "rarely": 0.05, "often but long": 0.5}
+    monkeypatch.setattr(rule_short_circuit, "rule_deny_likelihoods", lambda titles: likelihoods)
+    checks = [_check("rarely"), _check("often but long", "x" * 4000), _check("often")]
+    ordered = rule_short_circuit.order_rules(checks)
+    assert [check["ruleTitle"] for check in ordered] == ["often", "rarely", "often but long"]
+
+
+def test_evaluate_until_deny_cancels_the_rest():
+    started = []
+
+    async def evaluate(rule_check):
+        started.append(rule_check["ruleTitle"])
+        if rule_check["ruleTitle"] == "deny":
+            return SimpleNamespace(status="deny")
+        await asyncio.sleep(1)
+        return SimpleNamespace(status="valid")
+
+    checks = [_check("deny"), _check("slow"), _check("later")]
+    denied, skipped = asyncio.run(rule_short_circuit.evaluate_until_deny(checks, evaluate, concurrency=2))
+    assert denied["ruleTitle"] == "deny"
+    assert [check["ruleTitle"] for check in skipped] == ["slow", "later"]
+    assert started == ["deny", "slow"]
+
+
+def test_no_deadline_unless_configured():
+    context = CaseContext("cases:1")
+    context.start_clock()
+    assert context.deadline is None and context.remaining() is None
+
+    bounded = CaseContext("cases:1", deadline_seconds=30)
+    bounded.start_clock()
+    assert 0 < bounded.remaining() <= 30
@@ -0,0 +1,83 @@
+import asyncio
+import importlib
+
+import pytest
+
+from api import rule_short_circuit
+from api.rule_speculation import RuleSpeculation, predict_procedure
+
+rpa = importlib.import_module("api.taxo_agents.rule_processor_agent")
+
+PROCEDURES = [
+    {"_id": "procedures:1", "name": "Cataract Surgery"},
+    {"_id": "procedures:2", "name": "Laser Cataract Surgery"},
+    {"_id": "procedures:3", "name": "Trabeculectomy"},
+]
+
+
+def test_predicts_the_longest_mentioned_procedure(convex):
+    assert predict_procedure("Referred for laser cataract surgery, left eye.", PROCEDURES) == ("procedures:2", "name")
+    assert predict_procedure("Referred for cataract surgery.", PROCEDURES) == ("procedures:1", "name")
+    # One-word names are too ambiguous to count
+    assert predict_procedure("History of trabeculectomy.", PROCEDURES) is None
+
+
+@pytest.fixture
+def rules(convex, monkeypatch):
+    for title in ("A rule", "B rule", "C rule"):
+        rule_id = convex.insert("rules", {"title": title, "description": f"{title} description"})
+        convex.insert("procedureRules", {"procedureId": "procedures:1", "ruleId": rule_id})
+    evaluated = []
+
+    async def evaluate_rule(file_content, rule_name, rule_description):
+        evaluated.append(rule_name)
+        await asyncio.sleep(0.01)
+        return rpa.RuleProcessingOutput(status=rpa.RuleStatus.VALID, reasoning=f"speculated {rule_name}")
+
+    monkeypatch.setattr(rpa, "evaluate_rule", evaluate_rule)
+    monkeypatch.setattr(rule_short_circuit, "rule_deny_likelihoods", lambda titles: {title: 0.1 for title in titles})
+    return convex.where("rules"), evaluated
+
+
+def _rule_check(rule):
+    return {"originalRuleId": rule["_id"], "ruleTitle": rule["title"], "ruleDescription": rule["description"]}
+
+
+def test_hit_hands_results_to_rule_checks(rules):
+    stored, evaluated = rules
+
+    async def main():
+        speculation = RuleSpeculation.start("cases:1", "Referred for cataract surgery.", {"procedures": PROCEDURES})
+        assert await speculation.resolve("procedures:1")
+        outputs = [await speculation.result_for(_rule_check(rule)) for rule in stored]
+        changed = await speculation.result_for({**_rule_check(stored[0]), "ruleDescription": "edited"})
+        speculation.close()
+        return outputs, changed
+
+    outputs, changed = asyncio.run(main())
+    assert [output.reasoning for output in outputs] == ["speculated A rule", "speculated B rule", "speculated C rule"]
+    assert changed is None
+    assert sorted(evaluated) == ["A rule", "B rule", "C rule"]
+
+
+def test_miss_discards_results(rules):
+    stored, _ = rules
+
+    async def main():
+        speculation = RuleSpeculation.start("cases:1", "Referred for cataract surgery.", {"procedures": PROCEDURES})
+        assert not await speculation.resolve("procedures:3")
+        return await speculation.result_for(_rule_check(stored[0]))
+
+    assert asyncio.run(main()) is None
+
+
+def test_short_circuit_speculates_on_the_first_batch_only(rules):
+    _, evaluated = rules
+
+    async def main():
+        speculation = RuleSpeculation.start("cases:1", "Referred for cataract surgery.", {"procedures": PROCEDURES}, first_batch=2)
+        await speculation.resolve("procedures:1")
+        speculation.close()
+
+    asyncio.run(main())
+    assert sorted(evaluated) == ["A rule", "B rule"]
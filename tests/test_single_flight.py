@@ -0,0 +1,85 @@
+import asyncio
+
+from api.single_flight import SingleFlight, documents_fingerprint
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*[flight.do("case", work) for _ in range(5)])
+
+    assert asyncio.run(main()) == [1] * 5
+    assert len(calls) == 1
+
+
+def test_key_is_released_after_completion():
+    async def main():
+        flight = SingleFlight()
+        first = await flight.do("case", lambda: asyncio.sleep(0, result="a"))
+        assert not flight.is_running("case")
+        second = await flight.do("case", lambda: asyncio.sleep(0, result="b"))
+        return first, second
+
+    assert asyncio.run(main()) == ("a", "b")
+
+
+def test_force_starts_a_new_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    async def main():
+        flight = SingleFlight()
+        await asyncio.gather(flight.do("case", work), flight.do("case", work, force=True))
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_attached_callers_receive_the_exception():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("case", fail), flight.do("case", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    async def main():
+        flight = SingleFlight()
+        done = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            done.set()
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("case", work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("case", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, done.is_set()
+
+    assert asyncio.run(main()) == ("ok", True)
+
+
+def test_documents_fingerprint_ignores_order_and_tracks_content():
+    a = {"_id": "documents:1", "storageId": "s1", "fileSize": 10}
+    b = {"_id": "documents:2", "storageId": "s2", "fileSize": 20}
+    assert documents_fingerprint([a, b]) == documents_fingerprint([b, a])
+    assert documents_fingerprint([a, b]) != documents_fingerprint([a, {**b, "storageId": "s3"}])
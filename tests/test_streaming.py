@@ -0,0 +1,87 @@
+import asyncio
+
+from api import index
+from api.case_context import CaseContext
+from api.index import _run_in_flight, _stream_events
+from api.single_flight import EventFanout
+
+
+def test_fanout_replays_history_to_late_subscribers():
+    fanout = EventFanout()
+    early, late = [], []
+    fanout.subscribe(lambda event, data: early.append(event))
+    fanout.emit("a", {})
+    unsubscribe = fanout.subscribe(lambda event, data: late.append(event))
+    fanout.emit("b", {})
+    unsubscribe()
+    fanout.emit("c", {})
+    assert early == ["a", "b", "c"]
+    assert late == ["a", "b"]
+
+
+def _context(convex) -> CaseContext:
+    return CaseContext(convex.add_case(["http://docs/a.pdf"]))
+
+
+async def _stage(context, emit):
+    emit("document_converted", {})
+    await asyncio.sleep(0.02)
+    emit("rule_result", {"rule_title": "r"})
+    return "done"
+
+
+def test_every_caller_of_a_flight_gets_all_events(convex):
+    context = _context(convex)
+    calls = []
+
+    async def stage(context, emit):
+        calls.append(1)
+        return await _stage(context, emit)
+
+    async def main():
+        plain = asyncio.ensure_future(_run_in_flight("process-pdf", context, stage))
+        await asyncio.sleep(0.005)
+        events = []
+        late = await _run_in_flight("process-pdf", context, stage, emit=lambda event, data: events.append(event))
+        await plain
+        return late, events
+
+    result, events = asyncio.run(main())
+    assert result == "done"
+    assert events == ["document_converted", "rule_result"]
+    assert calls == [1]
+    assert not index._flight_events
+
+
+def test_stream_attached_to_another_stream_gets_stage_events(convex):
+    context = _context(convex)
+
+    async def collect():
+        async def run(emit):
+            await _run_in_flight("process-rules", context, _stage, emit=emit)
+        return [chunk.split("\n", 1)[0] async for chunk in _stream_events(run)]
+
+    async def main():
+        return await asyncio.gather(collect(), collect())
+
+    first, second = asyncio.run(main())
+    expected = ["event: document_converted", "event: rule_result", "event: done"]
+    assert first == expected
+    assert second == expected
+
+
+def test_flight_events_are_released_when_every_caller_left(convex):
+    context = _context(convex)
+
+    async def main():
+        caller = asyncio.ensure_future(_run_in_flight("process-pdf", context, _stage))
+        await asyncio.sleep(0.001)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        assert index._flight_events
+        # The shared run carries on without its caller and cleans up after itself
+        while index._flight_events:
+            await asyncio.sleep(0.005)
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert not index._flight_events